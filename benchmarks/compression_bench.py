@@ -0,0 +1,158 @@
+"""
+Measures the bytes on the wire and the latency of ask() and list_documents()
+with and without request/response compression, against a local stand-in
+server that emulates a bandwidth-limited link.
+
+    PYTHONPATH=. python benchmarks/compression_bench.py --bandwidth-mbps 20
+"""
+import argparse
+import gzip
+import json
+import statistics
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import chatbees as cb
+from chatbees.server_models.doc_api import (
+    AnswerReference,
+    AskResponse,
+    DocumentMetadata,
+    DocumentType,
+    ListDocsResponse,
+)
+from chatbees.utils.compression import zstd
+from chatbees.utils.config import Config
+
+
+class Stats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def reset(self):
+        with self.lock:
+            self.bytes_in = self.bytes_out = 0
+
+
+def make_handler(stats: Stats, bandwidth_bps: float, list_body: bytes,
+                 ask_body: bytes):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, *args):
+            pass
+
+        def _throttle(self, nbytes: int):
+            if bandwidth_bps > 0:
+                time.sleep(nbytes * 8 / bandwidth_bps)
+
+        def do_POST(self):
+            raw = self.rfile.read(int(self.headers['Content-Length']))
+            self._throttle(len(raw))
+            encoding = self.headers.get('Content-Encoding')
+            if encoding == 'gzip':
+                body = gzip.decompress(raw)
+            elif encoding == 'zstd':
+                body = zstd.decompress(raw)
+            else:
+                body = raw
+            json.loads(body)
+
+            out = list_body if self.path == '/docs/list' else ask_body
+            accepted = self.headers.get('Accept-Encoding', '')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            if 'gzip' in accepted:
+                out = gzip.compress(out, compresslevel=6)
+                self.send_header('Content-Encoding', 'gzip')
+            self.send_header('Content-Length', str(len(out)))
+            self.end_headers()
+            self._throttle(len(out))
+            self.wfile.write(out)
+            with stats.lock:
+                stats.bytes_in += len(raw)
+                stats.bytes_out += len(out)
+
+    return Handler
+
+
+def build_bodies(ndocs: int):
+    docs = [
+        DocumentMetadata(
+            name=f'filings/2024/company-{i:05d}-10k.pdf',
+            url=f'https://example.com/filings/2024/company-{i:05d}-10k.pdf',
+            type=DocumentType.FILE)
+        for i in range(ndocs)
+    ]
+    list_resp = ListDocsResponse(
+        documents=docs, doc_names=[d.name for d in docs])
+    ask_resp = AskResponse(
+        answer='The company reported revenue growth of 32% year over year.',
+        refs=[AnswerReference(doc_name=docs[i].name, page_num=i,
+                              sample_text='Revenue increased primarily due to '
+                                          'growth in product revenue. ' * 8)
+              for i in range(5)],
+        request_id='req', conversation_id='conv')
+    return (list_resp.model_dump_json().encode(),
+            ask_resp.model_dump_json().encode())
+
+
+def run(col: cb.Collection, history, iterations: int):
+    latencies = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        col.list_documents()
+        chat = col.chat()
+        chat.history_messages = list(history)
+        chat.ask('How did revenue change compared to last year?')
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--bandwidth-mbps', type=float, default=20)
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--docs', type=int, default=2000)
+    parser.add_argument('--history', type=int, default=20)
+    args = parser.parse_args()
+
+    stats = Stats()
+    list_body, ask_body = build_bodies(args.docs)
+    handler = make_handler(
+        stats, args.bandwidth_mbps * 1_000_000, list_body, ask_body)
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    cb.init(api_key='bench', account_id='bench')
+    Config.base_url = f'http://127.0.0.1:{server.server_port}'
+    col = cb.collection('bench')
+    history = [
+        (f'question {i} about the filing?',
+         'A long answer that quotes several paragraphs of the filing. ' * 10)
+        for i in range(args.history)
+    ]
+
+    modes = [('none', None, None), ('gzip', 'gzip', Config.accept_encoding)]
+    if zstd is not None:
+        modes.append(('zstd', 'zstd', Config.accept_encoding))
+    print(f"{'mode':6} {'sent/iter':>10} {'recv/iter':>10} "
+          f"{'p50 ms':>8} {'p95 ms':>8}")
+    for name, request_compression, accept_encoding in modes:
+        cb.configure_compression(request_compression,
+                                 accept_encoding=accept_encoding)
+        run(col, history, 2)
+        stats.reset()
+        latencies = sorted(run(col, history, args.iterations))
+        p50 = statistics.median(latencies) * 1000
+        p95 = latencies[int(len(latencies) * 0.95) - 1] * 1000
+        print(f"{name:6} {stats.bytes_in // args.iterations:>10} "
+              f"{stats.bytes_out // args.iterations:>10} "
+              f"{p50:>8.1f} {p95:>8.1f}")
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""
+Measures the CPU time and memory of turning search() and ask() response
+bodies into result objects: the previous path (json() + model_validate +
+a SearchReference copy per ref), the current default path
+(model_validate_json) and the fast path (SearchRecord/AskRecord built from
+json()). No network is involved.
+
+    PYTHONPATH=. python benchmarks/result_objects_bench.py --refs 20
+"""
+import argparse
+import json
+import timeit
+import tracemalloc
+
+from chatbees.client_models.search import AskRecord, SearchRecord
+from chatbees.server_models.doc_api import (
+    AnswerReference,
+    AskResponse,
+    SearchReference,
+)
+from chatbees.server_models.search_api import SearchResponse
+
+
+def previous_search(body: bytes):
+    resp = SearchResponse.model_validate(json.loads(body))
+    return [SearchReference(doc_name=ref.doc_name, page_num=ref.page_num,
+                            sample_text=ref.sample_text) for ref in resp.refs]
+
+
+def default_search(body: bytes):
+    return SearchResponse.model_validate_json(body).refs
+
+
+def fast_search(body: bytes):
+    return [SearchRecord.from_json(ref) for ref in json.loads(body)['refs']]
+
+
+def previous_ask(body: bytes):
+    return AskResponse.model_validate(json.loads(body))
+
+
+def default_ask(body: bytes):
+    return AskResponse.model_validate_json(body)
+
+
+def fast_ask(body: bytes):
+    return AskRecord.from_json(json.loads(body))
+
+
+def retained_bytes(fn, body: bytes, count: int) -> float:
+    """
+    Average bytes still allocated per result while `count` results are held.
+    """
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    results = [fn(body) for _ in range(count)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del results
+    return (after - before) / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--refs', type=int, default=5)
+    parser.add_argument('--text-bytes', type=int, default=200)
+    parser.add_argument('--number', type=int, default=20000)
+    args = parser.parse_args()
+
+    refs = [AnswerReference(doc_name=f'doc{i}.pdf', page_num=i,
+                            sample_text='x' * args.text_bytes)
+            for i in range(args.refs)]
+    bodies = {
+        'search': SearchResponse(refs=refs).model_dump_json().encode(),
+        'ask': AskResponse(answer='a' * 400, refs=refs, request_id='r',
+                           conversation_id='c').model_dump_json().encode(),
+    }
+    cases = [
+        ('search', 'previous', previous_search),
+        ('search', 'default', default_search),
+        ('search', 'fast', fast_search),
+        ('ask', 'previous', previous_ask),
+        ('ask', 'default', default_ask),
+        ('ask', 'fast', fast_ask),
+    ]
+    print(f"{'op':8} {'path':10} {'us/call':>9} {'bytes/result':>13}")
+    for op, path, fn in cases:
+        body = bodies[op]
+        seconds = min(timeit.repeat(lambda: fn(body), number=args.number,
+                                    repeat=3))
+        memory = retained_bytes(fn, body, 2000)
+        print(f"{op:8} {path:10} {seconds / args.number * 1e6:>9.2f} "
+              f"{memory:>13.0f}")
+
+
+if __name__ == '__main__':
+    main()
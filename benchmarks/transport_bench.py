@@ -0,0 +1,178 @@
+"""
+Compares the requests (HTTP/1.1 pool) and httpx (HTTP/2 multiplexed)
+transports under concurrency against local stand-in servers that answer
+search() after a fixed service latency. Reports throughput, latency and the
+number of TCP connections the client opened.
+
+    PYTHONPATH=. python benchmarks/transport_bench.py --concurrency 64
+
+Requires `pip install httpx[http2]`.
+"""
+import argparse
+import socket
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import h2.config
+import h2.connection
+import h2.events
+
+import chatbees as cb
+from chatbees.server_models.doc_api import AnswerReference
+from chatbees.server_models.search_api import SearchResponse
+from chatbees.utils.config import Config
+
+BODY = SearchResponse(refs=[
+    AnswerReference(doc_name=f'doc{i}', page_num=i, sample_text='text ' * 40)
+    for i in range(5)
+]).model_dump_json().encode()
+
+
+class Http1Server:
+    def __init__(self, latency: float):
+        self.connections = 0
+        outer = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def setup(self):
+                super().setup()
+                outer.connections += 1
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers['Content-Length']))
+                time.sleep(latency)
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(BODY)))
+                self.end_headers()
+                self.wfile.write(BODY)
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.request_queue_size = 1024
+        self.port = self.server.server_port
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+
+
+class H2Server:
+    """
+    A minimal HTTP/2 server with prior knowledge (h2c). Streams are answered
+    concurrently after `latency` seconds.
+    """
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.connections = 0
+        self.sock = socket.socket()
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind(('127.0.0.1', 0))
+        self.sock.listen(128)
+        self.port = self.sock.getsockname()[1]
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def _accept(self):
+        while True:
+            try:
+                conn, _ = self.sock.accept()
+            except OSError:
+                return
+            self.connections += 1
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    def _serve(self, sock: socket.socket):
+        conn = h2.connection.H2Connection(
+            h2.config.H2Configuration(client_side=False))
+        lock = threading.Lock()
+        conn.initiate_connection()
+        sock.sendall(conn.data_to_send())
+
+        def respond(stream_id):
+            time.sleep(self.latency)
+            with lock:
+                conn.send_headers(stream_id, [
+                    (':status', '200'),
+                    ('content-type', 'application/json'),
+                    ('content-length', str(len(BODY))),
+                ])
+                conn.send_data(stream_id, BODY, end_stream=True)
+                sock.sendall(conn.data_to_send())
+
+        while True:
+            data = sock.recv(65536)
+            if not data:
+                return
+            with lock:
+                events = conn.receive_data(data)
+                for event in events:
+                    if isinstance(event, h2.events.DataReceived):
+                        conn.acknowledge_received_data(
+                            event.flow_controlled_length, event.stream_id)
+                    elif isinstance(event, h2.events.StreamEnded):
+                        threading.Thread(target=respond,
+                                         args=(event.stream_id,)).start()
+                sock.sendall(conn.data_to_send())
+
+    def close(self):
+        self.sock.close()
+
+
+def run(port: int, concurrency: int, requests_per_worker: int):
+    Config.base_url = f'http://127.0.0.1:{port}'
+    col = cb.collection('bench')
+
+    def worker(_):
+        latencies = []
+        for _ in range(requests_per_worker):
+            start = time.perf_counter()
+            col.search('what is the meaning of life?')
+            latencies.append(time.perf_counter() - start)
+        return latencies
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as executor:
+        latencies = sorted(
+            x for xs in executor.map(worker, range(concurrency)) for x in xs)
+    elapsed = time.perf_counter() - start
+    return elapsed, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--concurrency', type=int, default=64)
+    parser.add_argument('--requests', type=int, default=20,
+                        help='requests per concurrent worker')
+    parser.add_argument('--latency-ms', type=float, default=20)
+    args = parser.parse_args()
+    cb.init(api_key='bench', account_id='bench')
+
+    latency = args.latency_ms / 1000
+    cases = [
+        ('requests/http1', Http1Server(latency),
+         cb.RequestsTransport(pool_maxsize=args.concurrency)),
+        ('httpx/http2', H2Server(latency),
+         cb.HttpxTransport(http2=True, http1=False)),
+    ]
+    print(f"{'transport':16} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} "
+          f"{'sockets':>8}")
+    for name, server, transport in cases:
+        cb.configure_transport(transport)
+        elapsed, latencies = run(server.port, args.concurrency, args.requests)
+        p50 = statistics.median(latencies) * 1000
+        p99 = latencies[int(len(latencies) * 0.99) - 1] * 1000
+        print(f"{name:16} {len(latencies) / elapsed:>8.0f} {p50:>8.1f} "
+              f"{p99:>8.1f} {server.connections:>8}")
+        server.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -2,7 +2,22 @@ from .client.collection_management import *
 from .client.admin_management import *
 from .client_models.collection import *
 from .client_models.chat import *
+from .client_models.crawl import *
+from .client_models.search import *
+from .client_models.extraction import *
+from .client_models.feedback import *
+from .client_models.ingest_queue import *
+from .client_models.transcription import *
 from .server_models.doc_api import *
 from .server_models.ingestion_type import *
 
+from .utils.adaptive_concurrency import *
+from .utils.concurrency import *
+from .utils.dedup import *
+from .utils.disk_cache import *
 from .utils.exceptions import *
+from .utils.instrumentation import *
+from .utils.priority import *
+from .utils.response_cache import *
+from .utils.slow_calls import *
+from .utils.transport import *
@@ -1,19 +1,43 @@
-from typing import List
+from typing import Iterable, List, Optional
 from chatbees.server_models.admin_api import CreateApiKeyRequest, CreateApiKeyResponse
 from chatbees.server_models.ingestion_api import (
     ConnectorReference,
     ListConnectorsRequest,
     ListConnectorsResponse,
 )
+from chatbees.utils.adaptive_concurrency import AdaptiveLimiter
+from chatbees.utils.cache import cached_metadata
+from chatbees.utils.circuit_breaker import CircuitBreaker
+from chatbees.utils.compression import (
+    SUPPORTED_ACCEPT_ENCODING,
+    validate_encoding,
+)
 from chatbees.utils.config import Config
+from chatbees.utils.hedging import HEDGED_ENDPOINTS, Hedger
+from chatbees.utils.priority import PriorityScheduler
+from chatbees.utils.slow_calls import SlowCall, SlowCallRecorder
+from chatbees.utils.transport import RequestsTransport, Transport
 
-__all__ = ["init", "list_connectors"]
+__all__ = [
+    "init",
+    "configure_compression",
+    "configure_transport",
+    "configure_circuit_breaker",
+    "configure_hedging",
+    "configure_adaptive_concurrency",
+    "configure_priorities",
+    "configure_slow_call_recorder",
+    "get_slow_calls",
+    "warm_up",
+    "list_connectors",
+]
 
 
 def init(
     api_key: str,
     account_id: str,
-    namespace: str = Config.PUBLIC_NAMESPACE
+    namespace: str = Config.PUBLIC_NAMESPACE,
+    warm_up_connections: int = 0,
 ):
     """
     Initialize the ChatBees client.
@@ -22,6 +46,9 @@ def init(
         api_key (str): The API key to authenticate requests.
         account_id (str): The account ID.
         namespace (str, optional): The namespace to use.
+        warm_up_connections (int, optional): Resolve the service host and
+            open this many connections now, so the first request does not
+            pay for DNS, TCP and TLS setup. See warm_up.
     Raises:
         ValueError: If the provided config is invalid
     """
@@ -29,13 +56,284 @@ def init(
     Config.account_id = account_id
     Config.namespace = namespace
     Config.validate_setup()
+    if Config.metadata_cache is not None:
+        Config.metadata_cache.clear()
+    if warm_up_connections > 0:
+        warm_up(warm_up_connections)
+
+
+def configure_compression(
+    request_compression: str = 'gzip',
+    min_size: int = 1024,
+    accept_encoding: str = SUPPORTED_ACCEPT_ENCODING,
+):
+    """
+    Configure compression of request and response bodies.
+
+    Args:
+        request_compression (str, optional): Compress JSON request bodies with
+            'gzip' or 'zstd'. None sends them uncompressed.
+        min_size (int, optional): Request bodies smaller than min_size bytes
+            are sent uncompressed.
+        accept_encoding (str, optional): The Accept-Encoding sent with every
+            request. Responses are decompressed while they are streamed.
+            None asks for uncompressed responses.
+    Raises:
+        ValueError: If the compression is not supported
+    """
+    validate_encoding(request_compression)
+    Config.request_compression = request_compression
+    Config.compression_min_size = min_size
+    Config.accept_encoding = accept_encoding
+
+
+def configure_transport(transport: Transport):
+    """
+    Configure the transport that sends every request of the client, e.g.
+    HttpxTransport to multiplex concurrent requests over one HTTP/2
+    connection.
+
+    Args:
+        transport (Transport): The transport to use. The previous transport
+            is closed.
+    """
+    previous = Config.transport
+    Config.transport = transport
+    if previous is not transport:
+        previous.close()
+
+
+def configure_circuit_breaker(
+    failure_threshold: Optional[int] = 5,
+    reset_timeout: float = 30,
+    half_open_probes: int = 1,
+    per_collection: bool = False,
+    fallback_ttl: float = None,
+) -> Optional[CircuitBreaker]:
+    """
+    Fail requests fast with CircuitOpen while an endpoint, e.g. /docs/ask,
+    keeps failing, instead of sending every request to a degraded service.
+    State changes are emitted as "circuit_state_changed" events, see
+    add_event_listener.
+
+    Args:
+        failure_threshold (int, optional): The number of consecutive
+            failures (connection errors, timeouts, 5xx or 429 responses)
+            that open the circuit. None disables the circuit breaker.
+        reset_timeout (float, optional): Seconds an open circuit waits
+            before it lets probe requests through.
+        half_open_probes (int, optional): The number of concurrent probe
+            requests. The circuit closes if they succeed.
+        per_collection (bool, optional): Keep a circuit per endpoint and
+            collection, so one degraded collection does not fail the others.
+        fallback_ttl (float, optional): Serve the last good response of a
+            read request, e.g. ask or search with the same question, for up
+            to fallback_ttl seconds while the circuit is open. A served ask
+            response has an empty request_id and conversation_id.
+    Returns:
+        The circuit breaker, e.g. to read the state of a circuit.
+    """
+    if failure_threshold is None:
+        Config.circuit_breaker = None
+        return None
+    Config.circuit_breaker = CircuitBreaker(
+        failure_threshold=failure_threshold,
+        reset_timeout=reset_timeout,
+        half_open_probes=half_open_probes,
+        per_collection=per_collection,
+        fallback_ttl=fallback_ttl)
+    return Config.circuit_breaker
+
+
+def configure_hedging(
+    enabled: bool = True,
+    delay: float = None,
+    budget: float = 0.1,
+    percentile: float = 95,
+    endpoints: Iterable[str] = HEDGED_ENDPOINTS,
+) -> Optional[Hedger]:
+    """
+    Hedge idempotent read requests (search, list_documents,
+    describe_collection, get_ingestion and get_crawl): if a request has not
+    answered after a delay, send a duplicate and return whichever answers
+    first. This cuts the tail latency caused by occasional slow backends.
+    The number of hedges sent and won are the "hedges_sent" and "hedges_won"
+    metrics, see get_metrics.
+
+    Args:
+        enabled (bool, optional): False disables hedging.
+        delay (float, optional): Seconds to wait before sending the
+            duplicate. None waits for the observed `percentile` latency of
+            the endpoint.
+        budget (float, optional): The max extra load from hedging, e.g. 0.1
+            sends at most one hedge per 10 requests.
+        percentile (float, optional): The latency percentile used as the
+            delay if delay is None.
+        endpoints (Iterable[str], optional): The endpoints to hedge.
+    Returns:
+        The hedger, e.g. to read the hedge win rate of an endpoint.
+    """
+    previous = Config.hedger
+    Config.hedger = None
+    if enabled:
+        Config.hedger = Hedger(
+            delay=delay, budget=budget, percentile=percentile,
+            endpoints=endpoints)
+    if previous is not None:
+        previous.close()
+    return Config.hedger
+
+
+def configure_adaptive_concurrency(
+    enabled: bool = True,
+    initial: int = 8,
+    min_limit: int = 1,
+    max_limit: int = 64,
+    backoff: float = 0.5,
+    latency_tolerance: float = 2.0,
+) -> Optional[AdaptiveLimiter]:
+    """
+    Adapt the concurrency of the bulk operations (e.g. upload_documents,
+    search_collections, ask_documents, IngestQueue) to the service. The
+    limit is shared by all of them and grows by one per round of healthy
+    requests. It is cut by `backoff` on LimitExceeded, ServerError, timeouts
+    or latency spikes. The max_concurrency argument of an operation still
+    caps the operation. The current limit is the "concurrency_limit" metric,
+    see get_metrics.
+
+    Args:
+        enabled (bool, optional): False disables the limit.
+        initial (int, optional): The limit to start with.
+        min_limit (int, optional): The lowest limit.
+        max_limit (int, optional): The highest limit.
+        backoff (float, optional): The factor of the limit on overload.
+        latency_tolerance (float, optional): A latency above this multiple
+            of the baseline latency is treated as overload.
+    Returns:
+        The limiter, e.g. to read its current limit.
+    """
+    Config.concurrency_limiter = None
+    if enabled:
+        Config.concurrency_limiter = AdaptiveLimiter(
+            initial=initial, min_limit=min_limit, max_limit=max_limit,
+            backoff=backoff, latency_tolerance=latency_tolerance)
+    return Config.concurrency_limiter
+
+
+def configure_priorities(
+    enabled: bool = True,
+    max_concurrency: int = 32,
+    default_quota: int = 24,
+    bulk_quota: int = 16,
+):
+    """
+    Schedule requests by priority, so interactive requests are not starved
+    by bulk work sharing the connection pool. ask and search are
+    INTERACTIVE, uploads BULK and other requests DEFAULT, unless the caller
+    sets a priority with `priority()`. Bulk operations of the client, e.g.
+    IngestQueue and upload_documents, are BULK. `max_concurrency -
+    default_quota` slots are only used by INTERACTIVE requests.
+
+    Args:
+        enabled (bool, optional): False disables the scheduling.
+        max_concurrency (int, optional): The max requests in flight, at
+            most the connection pool size of the transport. A hedged request
+            takes a slot per copy sent.
+        default_quota (int, optional): The max DEFAULT and BULK requests in
+            flight together, less than max_concurrency.
+        bulk_quota (int, optional): The max BULK requests in flight, at
+            most default_quota.
+    """
+    Config.scheduler = None
+    if enabled:
+        Config.scheduler = PriorityScheduler(
+            max_concurrency=max_concurrency, default_quota=default_quota,
+            bulk_quota=bulk_quota)
+
+
+def configure_slow_call_recorder(
+    enabled: bool = True,
+    threshold: float = 1.0,
+    capacity: int = 100,
+    profile_rate: float = 0.0,
+) -> Optional[SlowCallRecorder]:
+    """
+    Record the calls that take longer than `threshold` seconds, with the
+    time spent serializing the request, waiting for a connection, on the
+    network, waiting for the first byte and validating the response, to
+    tell where the time of a slow ask went. See get_slow_calls.
+
+    Args:
+        enabled (bool, optional): False disables the recorder.
+        threshold (float, optional): The seconds above which a call is
+            recorded.
+        capacity (int, optional): The number of slow calls kept, older ones
+            are dropped.
+        profile_rate (float, optional): The fraction of calls run under
+            cProfile, whose profile is kept if the call is slow.
+    Returns:
+        The recorder.
+    """
+    Config.slow_call_recorder = None
+    if enabled:
+        Config.slow_call_recorder = SlowCallRecorder(
+            threshold=threshold, capacity=capacity, profile_rate=profile_rate)
+    return Config.slow_call_recorder
+
+
+def get_slow_calls() -> List[SlowCall]:
+    """
+    Returns the slow calls recorded since configure_slow_call_recorder,
+    oldest first.
+    """
+    recorder = Config.slow_call_recorder
+    if recorder is None:
+        return []
+    return recorder.records()
+
+
+def warm_up(
+    connections: int = 4,
+    dns_ttl: Optional[float] = 300,
+    keep_alive_interval: float = None,
+) -> int:
+    """
+    Prepare the client for its first requests: cache the DNS resolution of
+    the service host and open pooled connections to it.
+
+    Args:
+        connections (int, optional): The number of connections to open.
+            They are kept up to the pool size of the transport.
+        dns_ttl (float, optional): Seconds to cache DNS resolutions for new
+            connections of the default transport. None resolves the host
+            for every new connection.
+        keep_alive_interval (float, optional): Refresh the connections
+            whenever the client was idle for this many seconds, so the
+            server does not close them. None disables the refresh.
+    Returns:
+        The number of connections that were warmed up.
+    """
+    transport = Config.transport
+    if dns_ttl is not None and isinstance(transport, RequestsTransport) \
+            and transport.dns_cache is None:
+        transport = RequestsTransport(
+            pool_maxsize=transport.pool_maxsize, dns_ttl=dns_ttl)
+        configure_transport(transport)
+    url = Config.get_base_url()
+    warmed = transport.warm_up(url, connections)
+    if keep_alive_interval is not None:
+        transport.start_keep_alive(url, connections, keep_alive_interval)
+    return warmed
 
 
 def list_connectors() -> List[ConnectorReference]:
-    url = f'{Config.get_base_url()}/connectors/list'
-    req = ListConnectorsRequest()
-    resp = Config.post(
-        url=url,
-        data=req.model_dump_json(),
-    )
-    return ListConnectorsResponse.model_validate(resp.json()).connectors
+    def load() -> List[ConnectorReference]:
+        url = f'{Config.get_base_url()}/connectors/list'
+        req = ListConnectorsRequest()
+        resp = Config.post(
+            url=url,
+            data=req.model_dump_json(),
+        )
+        return ListConnectorsResponse.model_validate(resp.json()).connectors
+
+    return list(cached_metadata(("list_connectors",), load))
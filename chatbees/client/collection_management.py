@@ -1,10 +1,22 @@
-from typing import List
+from typing import Callable, Dict, Iterable, List, Optional, Sequence
 
 from chatbees.client_models.collection import (
     Collection,
     describe_response_to_collection,
 )
+from chatbees.client_models.feedback import FeedbackBuffer
+from chatbees.client_models.search import (
+    FederatedSearchResponse,
+    merge_ranked,
+)
+from chatbees.utils.cache import TTLCache, cached_metadata, invalidate_metadata
+from chatbees.utils.concurrency import Outcome, fan_out
 from chatbees.utils.config import Config
+from chatbees.utils.disk_cache import DiskCache
+from chatbees.utils.journal import Journal
+from chatbees.utils.priority import bulk_priority
+from chatbees.utils.response_cache import ResponseCache
+from chatbees.utils.semantic_cache import SemanticCache
 
 from chatbees.server_models.collection_api import (
     CreateCollectionRequest,
@@ -23,6 +35,17 @@ __all__ = [
     "list_collections",
     "delete_collection",
     "describe_collection",
+    "search_collections",
+    "create_collections",
+    "configure_collections",
+    "delete_collections",
+    "describe_collections",
+    "configure_metadata_cache",
+    "configure_semantic_cache",
+    "configure_document_cache",
+    "configure_response_cache",
+    "invalidate_response_cache",
+    "configure_feedback_buffer",
 ]
 
 
@@ -43,6 +66,7 @@ def create_collection(col: Collection) -> Collection:
         description=col.description,
         public_read=col.public_read)
     Config.post(url=url, data=req.model_dump_json())
+    invalidate_metadata(col.name)
     return col
 
 
@@ -78,6 +102,7 @@ def configure_collection(
         req.description = description
     url = f'{Config.get_base_url()}/collections/configure'
     Config.post(url=url, data=req.model_dump_json())
+    invalidate_metadata(collection_name)
 
 
 def list_collections() -> List[str]:
@@ -87,10 +112,13 @@ def list_collections() -> List[str]:
     Returns:
         List[Collection]: A list of collection objects.
     """
-    url = f'{Config.get_base_url()}/collections/list'
-    req = ListCollectionsRequest(namespace_name=Config.namespace)
-    resp = Config.post(url=url, data=req.model_dump_json())
-    return ListCollectionsResponse.model_validate(resp.json()).names
+    def load() -> List[str]:
+        url = f'{Config.get_base_url()}/collections/list'
+        req = ListCollectionsRequest(namespace_name=Config.namespace)
+        resp = Config.post(url=url, data=req.model_dump_json())
+        return ListCollectionsResponse.model_validate(resp.json()).names
+
+    return list(cached_metadata(("list_collections",), load))
 
 
 def delete_collection(collection_name: str):
@@ -105,6 +133,9 @@ def delete_collection(collection_name: str):
         collection_name=collection_name)
     url = f'{Config.get_base_url()}/collections/delete'
     Config.post(url=url, data=req.model_dump_json())
+    invalidate_metadata(collection_name)
+    invalidate_response_cache(collection_name)
+    Collection(name=collection_name)._invalidate_semantic_cache()
 
 
 def describe_collection(collection_name: str) -> Collection:
@@ -116,11 +147,332 @@ def describe_collection(collection_name: str) -> Collection:
     Returns:
         Collection: A collection
     """
+    def load() -> DescribeCollectionResponse:
+        req = DescribeCollectionRequest(
+            namespace_name=Config.namespace,
+            collection_name=collection_name)
+        url = f'{Config.get_base_url()}/collections/describe'
+        return DescribeCollectionResponse.model_validate(
+            Config.post(url=url, data=req.model_dump_json()).json())
 
-    req = DescribeCollectionRequest(
-        namespace_name=Config.namespace,
-        collection_name=collection_name)
-    url = f'{Config.get_base_url()}/collections/describe'
-    resp = DescribeCollectionResponse.model_validate(
-        Config.post(url=url, data=req.model_dump_json()).json())
-    return describe_response_to_collection(collection_name, resp)
+    resp = cached_metadata(("describe_collection", collection_name), load)
+    # Callers may mutate the returned collection, never hand out the cached
+    # response itself.
+    return describe_response_to_collection(
+        collection_name, resp.model_copy(deep=True))
+
+
+def search_collections(
+    collection_names: List[str],
+    question: str,
+    top_k: int = 5,
+    timeout: float = 10,
+    max_concurrency: int = 16,
+) -> FederatedSearchResponse:
+    """
+    Searches multiple collections concurrently and merges the results into a
+    single ranked top_k with reciprocal rank fusion.
+
+    Args:
+        collection_names (List[str]): The collections to search.
+        question (str): Question in plain text.
+        top_k (int): The number of merged references to return. Each
+            collection is searched for its own top_k.
+        timeout (float): Seconds to wait for each collection. Collections that
+            fail or time out are reported in failed_collections, so one slow
+            collection does not stall the whole query.
+        max_concurrency (int): The max number of concurrent searches.
+    Returns:
+        FederatedSearchResponse: The merged references, each tagged with
+            its collection name.
+    """
+    names = list(dict.fromkeys(collection_names))
+    if not names:
+        return FederatedSearchResponse(refs=[])
+
+    def search(name: str):
+        return Collection(name=name).search(question, top_k, timeout=timeout)
+
+    results = {}
+    failed = {}
+    for outcome in fan_out(search, names, max_concurrency, timeout=timeout):
+        if outcome.ok:
+            results[outcome.item] = outcome.value
+        else:
+            failed[outcome.item] = repr(outcome.error)
+    # Merge in the caller's order so ties are deterministic
+    results = {name: results[name] for name in names if name in results}
+    return FederatedSearchResponse(
+        refs=merge_ranked(results, top_k), failed_collections=failed)
+
+
+def create_collections(
+    cols: List[Collection],
+    max_concurrency: int = 16,
+    journal: str = None,
+) -> Dict[str, Outcome]:
+    """
+    Create collections concurrently.
+
+    Args:
+        cols (List[Collection]): The collections to create.
+        max_concurrency (int): The max number of concurrent requests.
+        journal (str): Optional file that records the created collections.
+            Rerunning with the same journal skips them, e.g. to resume
+            after the process was interrupted.
+    Returns:
+        Dict[str, Outcome]: The outcome of every collection by name, in the
+            given order. A failed outcome holds the error, e.g.
+            CollectionAlreadyExists.
+    """
+    cols = {col.name: col for col in cols}
+    return _run_bulk(
+        "create", lambda name: create_collection(cols[name]), cols,
+        max_concurrency, journal, resumed_value=cols.get)
+
+
+def configure_collections(
+    collection_names: List[str],
+    public_read: bool = None,
+    description: str = None,
+    max_concurrency: int = 16,
+    journal: str = None,
+) -> Dict[str, Outcome]:
+    """
+    Configure collections concurrently with the same settings.
+
+    Args:
+        collection_names (List[str]): The names of the collections.
+        public_read (bool): Enable/disable public_read for the collections.
+        description (str): Update the description for the collections.
+        max_concurrency (int): The max number of concurrent requests.
+        journal (str): Optional file that records the configured
+            collections. Rerunning with the same journal skips them.
+    Returns:
+        Dict[str, Outcome]: The outcome of every collection by name, in the
+            given order. A failed outcome holds the error, e.g.
+            CollectionNotFound.
+    """
+    def configure(name: str):
+        configure_collection(
+            name, public_read=public_read, description=description)
+
+    return _run_bulk(
+        "configure", configure, collection_names, max_concurrency, journal)
+
+
+def delete_collections(
+    collection_names: List[str],
+    max_concurrency: int = 16,
+    journal: str = None,
+) -> Dict[str, Outcome]:
+    """
+    Delete collections concurrently.
+
+    Args:
+        collection_names (List[str]): The names of the collections.
+        max_concurrency (int): The max number of concurrent requests.
+        journal (str): Optional file that records the deleted collections.
+            Rerunning with the same journal skips them.
+    Returns:
+        Dict[str, Outcome]: The outcome of every collection by name, in the
+            given order. A failed outcome holds the error, e.g.
+            CollectionNotFound.
+    """
+    return _run_bulk(
+        "delete", delete_collection, collection_names, max_concurrency,
+        journal)
+
+
+def describe_collections(
+    collection_names: List[str], max_concurrency: int = 16,
+) -> Dict[str, Outcome]:
+    """
+    Describe collections concurrently.
+
+    Args:
+        collection_names (List[str]): The names of the collections.
+        max_concurrency (int): The max number of concurrent requests.
+    Returns:
+        Dict[str, Outcome]: The outcome of every collection by name, in the
+            given order. The value of a successful outcome is the
+            Collection, a failed outcome holds the error, e.g.
+            CollectionNotFound.
+    """
+    return _run_bulk(
+        "describe", describe_collection, collection_names, max_concurrency)
+
+
+def _run_bulk(
+    op: str,
+    fn: Callable[[str], object],
+    collection_names: Iterable[str],
+    max_concurrency: int,
+    journal: str = None,
+    resumed_value: Callable[[str], object] = lambda name: None,
+) -> Dict[str, Outcome]:
+    names = list(dict.fromkeys(collection_names))
+    outcomes = {}
+    log = None
+    if journal is not None:
+        log = Journal(journal)
+        done = {record["collection_name"] for record in log.records()
+                if record.get("op") == op and record.get("ok")}
+        for name in names:
+            if name in done:
+                outcomes[name] = Outcome(name, value=resumed_value(name))
+
+    pending = [name for name in names if name not in outcomes]
+    with bulk_priority():
+        for outcome in fan_out(fn, pending, max_concurrency):
+            outcomes[outcome.item] = outcome
+            if log is not None:
+                log.append({
+                    "op": op,
+                    "collection_name": outcome.item,
+                    "ok": outcome.ok,
+                    "error": None if outcome.ok else repr(outcome.error),
+                })
+    return {name: outcomes[name] for name in names}
+
+
+def configure_metadata_cache(
+    ttl: float, stale_ttl: float = 0, max_size: int = 1024):
+    """
+    Cache the results of describe_collection, list_collections and
+    list_connectors in memory. The cache is invalidated by the collection
+    APIs in this client, changes made by other clients become visible after
+    the ttl expires.
+
+    Args:
+        ttl (float): Seconds a cached result is fresh. 0 disables the cache.
+        stale_ttl (float): Seconds an expired result may still be returned
+            while it is refreshed in the background.
+        max_size (int): The max number of cached results.
+    """
+    if ttl <= 0:
+        Config.metadata_cache = None
+        return
+    Config.metadata_cache = TTLCache(
+        ttl=ttl, stale_ttl=stale_ttl, max_size=max_size)
+
+
+def configure_semantic_cache(
+    embed: Optional[Callable[[str], Sequence[float]]],
+    threshold: float = 0.92,
+    max_entries: int = 1024,
+    ttl: float = None,
+    max_partitions: int = 64,
+) -> Optional[SemanticCache]:
+    """
+    Serve Collection.ask() and Collection.search() from a local cache when a
+    previous question was similar enough, e.g. "how do I reset my password"
+    and "password reset?". Requires numpy. Chats are never cached. A cached
+    AskResponse has an empty request_id and conversation_id, as they belong
+    to the request that was cached.
+
+    Args:
+        embed (Callable): A local embedding function that maps a question to
+            a vector. None disables the cache.
+        threshold (float): The min cosine similarity of a cached question.
+        max_entries (int): The max number of cached questions per collection.
+        ttl (float): Seconds a cached response can be used, never expires if
+            None.
+        max_partitions (int): The max number of cached collections and
+            ask/search parameters, the least recently used is evicted.
+    Returns:
+        The cache, e.g. to read its hit-rate stats.
+    """
+    if embed is None:
+        Config.semantic_cache = None
+        return None
+    Config.semantic_cache = SemanticCache(
+        embed, threshold=threshold, max_entries=max_entries,
+        max_partitions=max_partitions, ttl=ttl)
+    return Config.semantic_cache
+
+
+def configure_document_cache(
+    path: Optional[str], max_bytes: int = 256 * 1024 * 1024):
+    """
+    Cache document summaries and outlines/FAQs in a SQLite file on local
+    disk. All processes on the host that configure the same path share the
+    cache. Cached results are invalidated when this client uploads or
+    deletes the document.
+
+    Args:
+        path (str): The cache file, e.g. ~/.cache/chatbees/documents.db.
+            None disables the cache.
+        max_bytes (int): The max size of the cached results. The least
+            recently used results are evicted beyond it.
+    """
+    if path is None:
+        Config.document_cache = None
+        return
+    Config.document_cache = DiskCache(path, max_bytes=max_bytes)
+
+
+def configure_response_cache(
+    cache: Optional[ResponseCache], ttl: Optional[float] = 300):
+    """
+    Cache search and ask responses, and document summaries and
+    outlines/FAQs unless configure_document_cache() is used. Pass a
+    MemoryCache for a cache per process, or a DiskCache to share the cache
+    between all processes on the host, e.g. the workers of a web server.
+    Cached responses of a collection are invalidated when this client
+    uploads or deletes a document, indexes or deletes an ingestion or crawl,
+    configures its chat or deletes it. A
+    cached AskResponse has an empty request_id and conversation_id.
+
+    Args:
+        cache (ResponseCache): The cache. None disables the cache.
+        ttl (float): Seconds a cached search or ask response is used, never
+            expires if None.
+    """
+    Config.response_cache = cache
+    Config.response_cache_ttl = ttl
+
+
+def invalidate_response_cache(collection_name: str):
+    """
+    Drop the cached responses of a collection, e.g. after another client
+    changed its documents.
+
+    Args:
+        collection_name (str): The name of the collection.
+    """
+    Collection(name=collection_name)._invalidate_response_cache()
+
+
+def configure_feedback_buffer(
+    enabled: bool = True,
+    max_batch: int = 50,
+    flush_interval: float = 1.0,
+    max_concurrency: int = 8,
+) -> Optional[FeedbackBuffer]:
+    """
+    Send the feedback of Collection.create_or_update_feedback() from a
+    background thread instead of waiting for the service. Feedback is sent
+    in batches of up to `max_batch` requests or every `flush_interval`
+    seconds, and only the latest feedback for a request_id is sent. Pending
+    feedback is sent before the interpreter exits.
+
+    Args:
+        enabled (bool): False sends the pending feedback and disables the
+            buffer.
+        max_batch (int): The number of pending requests that triggers a send.
+        flush_interval (float): The max seconds feedback waits to be sent.
+        max_concurrency (int): The max number of concurrent requests.
+    Returns:
+        The buffer, e.g. to flush() it or read its failures.
+    """
+    previous = Config.feedback_buffer
+    Config.feedback_buffer = None
+    if previous is not None:
+        previous.close()
+    if not enabled:
+        return None
+    Config.feedback_buffer = FeedbackBuffer(
+        max_batch=max_batch, flush_interval=flush_interval,
+        max_concurrency=max_concurrency)
+    return Config.feedback_buffer
@@ -1,10 +1,23 @@
+import json
 import os
-from typing import List, Dict, Tuple, Any, Union, Optional
+import struct
+import time
+from typing import (
+    List, Dict, Tuple, Any, Union, Optional, Iterable, Iterator, Callable,
+)
 from urllib import request
 
 from pydantic import BaseModel
 
 from chatbees.client_models.chat import Chat
+from chatbees.client_models.crawl import CrawlDiff, CrawlPages
+from chatbees.client_models.extraction import ExtractionResult
+from chatbees.client_models.feedback import send_feedback
+from chatbees.client_models.search import AskRecord, SearchRecord
+from chatbees.client_models.transcription import (
+    SegmentTiming,
+    SegmentedTranscription,
+)
 from chatbees.server_models.doc_api import (
     CrawlStatus,
     AskResponse,
@@ -63,13 +76,25 @@ from chatbees.server_models.feedback_api import (
     UnregisteredUser,
     CreateOrUpdateFeedbackRequest,
 )
-from chatbees.utils.ask import ask
+from chatbees.utils.ask import ask, post_ask
+from chatbees.utils.audio import split_audio, stitch_transcripts, wav_file
+from chatbees.utils.cache import invalidate_metadata
+from chatbees.utils.concurrency import Outcome, fan_out
 from chatbees.utils.config import Config
+from chatbees.utils.dedup import find_duplicate_files
 from chatbees.utils.file_upload import (
+    MAX_FILE_BYTES,
+    MultipartBody,
     is_url,
+    read_at_most,
+    stream_size,
     validate_file,
+    validate_size,
     validate_url_file,
 )
+from chatbees.utils.instrumentation import metrics
+from chatbees.utils.priority import bulk_priority
+from chatbees.utils.slow_calls import phase, traced
 
 __all__ = ["Collection"]
 
@@ -100,25 +125,116 @@ class Collection(BaseModel):
                             contain scheme (http or https) prefix.
         :return:
         """
-        url = f'{Config.get_base_url()}/docs/add'
-        req = AddDocRequest(namespace_name=Config.namespace,
-                            collection_name=self.name)
         if is_url(path_or_url):
             validate_url_file(path_or_url)
             with request.urlopen(path_or_url) as f:
-                fname = os.path.basename(path_or_url)
-                Config.post(
-                    url=url, files={'file': (fname, f)},
-                    data={'request': req.model_dump_json()})
+                self.upload_fileobj(
+                    os.path.basename(path_or_url), f, size=f.length)
         else:
             # Handle tilde "~/blah"
             path_or_url = os.path.expanduser(path_or_url)
             validate_file(path_or_url)
             with open(path_or_url, 'rb') as f:
-                fname = os.path.basename(path_or_url)
-                Config.post(
-                    url=url, files={'file': (fname, f)},
-                    data={'request': req.model_dump_json()})
+                self.upload_fileobj(os.path.basename(path_or_url), f)
+
+    def upload_bytes(self, name: str, data: Union[bytes, bytearray, memoryview]):
+        """
+        Uploads an in-memory document into this collection, e.g. generated
+        HTML, without writing it to a file. The data is sent as it is, without
+        being copied.
+
+        :param name: The document name, e.g. report.pdf.
+        :param data: The content of the document.
+        """
+        data = memoryview(data).cast('B')
+        validate_size(name, data.nbytes)
+        self._upload_file(name, data)
+
+    def upload_fileobj(self, name: str, fileobj, size: int = None):
+        """
+        Uploads a document from a binary file-like object into this
+        collection, reading it in chunks while it is sent. The object is read
+        from its current position to its end.
+
+        :param name: The document name, e.g. report.pdf.
+        :param fileobj: A readable binary stream, e.g. an open file.
+        :param size: The bytes to read from the stream. Defaults to the bytes
+                     left in a seekable stream. An unseekable stream of
+                     unknown size is read into memory first, since the size
+                     of the request must be known.
+        """
+        if size is None:
+            size = stream_size(fileobj)
+        if size is None:
+            data = read_at_most(fileobj, MAX_FILE_BYTES + 1)
+            validate_size(name, len(data))
+            self._upload_file(name, data)
+            return
+        validate_size(name, size)
+        self._upload_file(name, fileobj, size)
+
+    def upload_documents(
+        self,
+        paths_or_urls: Iterable[str],
+        max_concurrency: int = 8,
+        deduplicate: bool = False,
+        canonical: Callable[[List[str]], str] = None,
+    ) -> Dict[str, Outcome]:
+        """
+        Uploads local or web documents into this collection concurrently. A
+        failed upload does not stop the others.
+
+        :param paths_or_urls: Local file paths or URLs of documents.
+        :param max_concurrency: the max number of concurrent uploads
+        :param deduplicate: if True, local files with identical content are
+                            uploaded once, under the name of the first of
+                            them. See find_duplicate_files.
+        :param canonical: optional function that picks the path to upload
+                          from a group of duplicate paths
+        :return: The outcome of every upload by path or URL. The Outcome.value
+                 of a duplicate that was not uploaded is the path uploaded in
+                 its place, or its error is the error of that upload.
+        """
+        duplicate_of = {}
+        if deduplicate:
+            paths_or_urls = list(paths_or_urls)
+            groups = find_duplicate_files(
+                [path for path in paths_or_urls if not is_url(path)],
+                max_concurrency)
+            for group in groups:
+                kept = group[0] if canonical is None else canonical(group)
+                if kept not in group:
+                    raise ValueError(f"canonical returned {kept}, which is "
+                                     f"not one of {group}")
+                for path in group:
+                    if path != kept:
+                        duplicate_of[path] = kept
+            metrics.incr("upload_duplicates", len(duplicate_of))
+            paths_or_urls = [path for path in paths_or_urls
+                             if path not in duplicate_of]
+
+        with bulk_priority():
+            out = {outcome.item: outcome for outcome in fan_out(
+                self.upload_document, paths_or_urls, max_concurrency)}
+        for path, kept in duplicate_of.items():
+            error = out[kept].error
+            out[path] = Outcome(path, error=error) if error is not None \
+                else Outcome(path, value=kept)
+        return out
+
+    def _upload_file(self, fname: str, content, size: int = None):
+        url = f'{Config.get_base_url()}/docs/add'
+        req = AddDocRequest(namespace_name=Config.namespace,
+                            collection_name=self.name)
+        body = MultipartBody({'request': req.model_dump_json()}, 'file',
+                             fname, content, size)
+        Config.post(url=url, data=body, headers={
+            'Content-Type': body.content_type,
+            'Content-Length': str(len(body)),
+        })
+        self._invalidate_semantic_cache()
+        self._invalidate_response_cache()
+        self._invalidate_document_cache(fname)
 
     def delete_document(self, doc_name: str):
         """
@@ -133,6 +249,9 @@ class Collection(BaseModel):
             doc_name=doc_name,
         )
         Config.post(url=url, data=req.model_dump_json())
+        self._invalidate_semantic_cache()
+        self._invalidate_response_cache()
+        self._invalidate_document_cache(doc_name)
 
     def list_documents(self) -> List[DocumentMetadata]:
         """
@@ -156,6 +275,12 @@ class Collection(BaseModel):
         :param doc_name: the document to summarize
         :return: A summary of the document
         """
+        cache_key = self._document_cache_key(doc_name, 'summary')
+        if cache_key is not None:
+            cached = self._document_cache().get(cache_key)
+            if cached is not None:
+                return cached.decode('utf-8')
+
         url = f'{Config.get_base_url()}/docs/summary'
         req = SummaryRequest(
             namespace_name=Config.namespace,
@@ -164,6 +289,10 @@ class Collection(BaseModel):
         )
         resp = Config.post(url=url, data=req.model_dump_json())
         resp = SummaryResponse.model_validate(resp.json())
+        if cache_key is not None:
+            self._document_cache().put(
+                cache_key, resp.summary.encode('utf-8'),
+                tag=self._document_cache_tag(doc_name))
         return resp.summary
 
     def extract_relevant_texts(
@@ -201,6 +330,49 @@ class Collection(BaseModel):
         resp = ExtractRelevantTextsResponse.model_validate(resp.json())
         return resp.relevant_texts
 
+    def extract_bulk(
+        self,
+        doc_names: Iterable[str],
+        queries: List[Tuple[ExtractType, str]],
+        max_concurrency: int = 8,
+    ) -> Iterator[ExtractionResult]:
+        """
+        Runs every (extract_type, input_texts) query against every document
+        concurrently, and yields the results as they complete. doc_names can
+        be a generator, documents are only pulled as workers free up, so large
+        jobs run in bounded memory. Write the results to a
+        CsvExtractionSink or ParquetExtractionSink to keep them off the heap.
+
+        A failed extraction yields a result with `error` set instead of
+        raising, so one bad document does not abort the job.
+
+        :param doc_names: the documents to extract
+        :param queries: the (extract type, input texts) pairs to extract
+        :param max_concurrency: the max number of concurrent extractions
+        :return: An iterator of ExtractionResult, in completion order
+        """
+        def extract(task: Tuple[str, Tuple[ExtractType, str]]) -> str:
+            doc_name, (extract_type, input_texts) = task
+            return self.extract_relevant_texts(doc_name, extract_type, input_texts)
+
+        tasks = ((doc_name, query) for doc_name in doc_names for query in queries)
+        outcomes = fan_out(extract, tasks, max_concurrency)
+        while True:
+            # Extractions are submitted as the fan-out advances. The consumer
+            # runs between the yields, keep it at its own priority.
+            with bulk_priority():
+                outcome = next(outcomes, None)
+            if outcome is None:
+                return
+            doc_name, (extract_type, input_texts) = outcome.item
+            yield ExtractionResult(
+                doc_name=doc_name,
+                extract_type=extract_type,
+                input_texts=input_texts,
+                relevant_texts=outcome.value,
+                error=None if outcome.ok else repr(outcome.error),
+            )
+
     def get_document_outline_faq(self, doc_name: str) -> OutlineFAQResponse:
         """
         Returns the Outlines and FAQs of the document.
@@ -208,6 +380,12 @@ class Collection(BaseModel):
         :param doc_name: the document
         :return: The Outlines and FAQs of the document
         """
+        cache_key = self._document_cache_key(doc_name, 'outline_faq')
+        if cache_key is not None:
+            cached = self._document_cache().get(cache_key)
+            if cached is not None:
+                return OutlineFAQResponse.model_validate_json(cached)
+
         url = f'{Config.get_base_url()}/docs/get_outline_faq'
         req = OutlineFAQRequest(
             namespace_name=Config.namespace,
@@ -215,7 +393,45 @@ class Collection(BaseModel):
             doc_name=doc_name,
         )
         resp = Config.post(url=url, data=req.model_dump_json())
-        return OutlineFAQResponse.model_validate(resp.json())
+        outline_faq = OutlineFAQResponse.model_validate(resp.json())
+        if cache_key is not None:
+            self._document_cache().put(
+                cache_key, outline_faq.model_dump_json().encode('utf-8'),
+                tag=self._document_cache_tag(doc_name))
+        return outline_faq
+
+    def warm_document_cache(
+        self,
+        doc_names: List[str] = None,
+        outline_faq: bool = True,
+        max_concurrency: int = 8,
+    ) -> Dict[str, str]:
+        """
+        Fills the document cache with the summaries, and optionally the
+        outlines and FAQs, of the documents in parallel. Requires
+        configure_document_cache() or configure_response_cache().
+
+        :param doc_names: the documents to warm up, all documents if None
+        :param outline_faq: whether to also cache the outlines and FAQs
+        :param max_concurrency: the max number of concurrent requests
+        :return: the documents that failed to warm up, and the error
+        """
+        if self._document_cache() is None:
+            raise ValueError("The document cache is not configured")
+        if doc_names is None:
+            doc_names = [doc.name for doc in self.list_documents()]
+        tasks = [(doc_name, self.summarize_document) for doc_name in doc_names]
+        if outline_faq:
+            tasks += [(doc_name, self.get_document_outline_faq)
+                      for doc_name in doc_names]
+
+        failed = {}
+        with bulk_priority():
+            for outcome in fan_out(
+                    lambda t: t[1](t[0]), tasks, max_concurrency):
+                if not outcome.ok:
+                    failed[outcome.item[0]] = repr(outcome.error)
+        return failed
 
     def transcribe_audio(
         self, path_or_url: str, lang: str, access_token: str = None,
@@ -248,6 +464,66 @@ class Collection(BaseModel):
 
         return TranscribeAudioResponse.model_validate(resp.json())
 
+    def transcribe_audio_segmented(
+        self,
+        path: str,
+        lang: str,
+        segment_seconds: float = 120,
+        overlap_seconds: float = 2,
+        max_concurrency: int = 4,
+    ) -> SegmentedTranscription:
+        """
+        Transcribe a long local audio file. The audio is split into
+        overlapping segments near silences, the segments are transcribed
+        concurrently, and the transcripts are stitched in order with the
+        overlaps de-duplicated. This is not limited by the upload size limit
+        of transcribe_audio.
+
+        WAV files are split natively, other formats require ffmpeg on PATH.
+
+        :param path: Local file path of the audio file.
+        :param lang: the language of the audio file
+        :param segment_seconds: the max length of a segment, including overlap
+        :param overlap_seconds: the overlap between consecutive segments
+        :param max_concurrency: the max number of concurrent transcriptions
+        :return: The stitched transcript, and the timing of every segment
+        """
+        url = f'{Config.get_base_url()}/docs/transcribe_audio'
+        req = TranscribeAudioRequest(namespace_name=Config.namespace,
+                                     collection_name=self.name, lang=lang)
+        fpath = os.path.expanduser(path)
+        stem = os.path.splitext(os.path.basename(fpath))[0]
+
+        def transcribe(segment) -> Tuple[str, float]:
+            start = time.perf_counter()
+            fname = f'{stem}.part{segment.index:04d}.wav'
+            resp = Config.post(
+                url=url, files={'file': (fname, segment.read())},
+                data={'request': req.model_dump_json()})
+            transcript = TranscribeAudioResponse.model_validate(
+                resp.json()).transcript
+            return transcript, time.perf_counter() - start
+
+        results = {}
+        with wav_file(fpath) as wav_path:
+            # Segments are read as they are sent, at most max_concurrency of
+            # them are in memory
+            segments = split_audio(wav_path, segment_seconds, overlap_seconds)
+            for outcome in fan_out(transcribe, segments, max_concurrency):
+                if not outcome.ok:
+                    raise outcome.error
+                results[outcome.item.index] = outcome.value
+
+        transcript = stitch_transcripts(
+            segments, [results[seg.index][0] for seg in segments])
+        return SegmentedTranscription(
+            transcript=transcript,
+            segments=[
+                SegmentTiming(index=seg.index, start=seg.start, end=seg.end,
+                              elapsed=results[seg.index][1])
+                for seg in segments
+            ])
+
     def ask(
         self, question: str, top_k: int = 5, doc_name: str = None,
     ) -> AskResponse:
@@ -261,40 +537,160 @@ class Collection(BaseModel):
             - answer: A plain-text answer to the given question
             - references: A list of most relevant document references in the
                           collection
+            The request_id and conversation_id are empty if the answer was
+            served from the response or semantic cache.
         """
-        return ask(Config.namespace, self.name, question, top_k, doc_name)
+        response_key = self._response_cache_key('ask', top_k, doc_name, question)
+        cached = self._get_cached_response(response_key)
+        if cached is not None:
+            return AskResponse.model_validate_json(cached)
+
+        def load() -> AskResponse:
+            resp = ask(Config.namespace, self.name, question, top_k, doc_name)
+            if response_key is not None:
+                value = _without_request_ids(resp).model_dump_json()
+                self._put_cached_response(response_key, value.encode('utf-8'))
+            return resp
+
+        cache = Config.semantic_cache
+        if cache is None:
+            return load()
+        partition = self._semantic_cache_partition('ask', top_k, doc_name)
+        resp, hit = cache.get_or_load(partition, question, load)
+        if hit:
+            return _without_request_ids(resp)
+        # The cache keeps the response, the caller gets a copy
+        return resp.model_copy(deep=True)
+
+    def ask_documents(
+        self,
+        question: str,
+        doc_names: Iterable[str],
+        top_k: int = 5,
+        max_concurrency: int = 8,
+        stop_when: Callable[[str, AskResponse], bool] = None,
+        timeout: float = None,
+    ) -> Iterator[Outcome]:
+        """
+        Asks the question of every document separately and concurrently, e.g.
+        to compare an answer across filings.
 
-    def search(self, question: str, top_k: int = 5) -> List[SearchReference]:
+        :param question: Question in plain text.
+        :param doc_names: the documents to ask, each ask is scoped to one
+        :param top_k: the top k relevant contexts to get answer from.
+        :param max_concurrency: the max number of concurrent asks
+        :param stop_when: optional predicate of a document and its answer.
+                          The asks that have not started are cancelled once
+                          it returns True.
+        :param timeout: optional seconds an ask may take, its outcome is a
+                        TimeoutError after it
+        :return: An iterator of Outcome as the asks complete. Outcome.item is
+                 the document, and Outcome.value its AskResponse.
+        """
+        outcomes = fan_out(
+            lambda doc_name: self.ask(question, top_k, doc_name),
+            doc_names, max_concurrency, timeout)
+        try:
+            for outcome in outcomes:
+                if stop_when is not None and outcome.ok and \
+                        stop_when(outcome.item, outcome.value):
+                    # Cancel the pending asks before returning the last one
+                    outcomes.close()
+                    yield outcome
+                    return
+                yield outcome
+        finally:
+            outcomes.close()
+
+    def search(
+        self, question: str, top_k: int = 5, timeout: float = None,
+    ) -> List[SearchReference]:
         """
         Semantic search
 
         :param question: Question in plain text.
         :param top_k: the top k relevant contexts to get answer from.
+        :param timeout: optional timeout in seconds for the search request.
+        :return: A list of most relevant document references in the collection
+        """
+        response_key = self._response_cache_key('search', top_k, question)
+        cached = self._get_cached_response(response_key)
+        if cached is not None:
+            return SearchResponse.model_validate_json(cached).refs
+
+        def load() -> List[SearchReference]:
+            with traced(Config.slow_call_recorder, '/docs/search'):
+                resp = self._post_search(question, top_k, timeout)
+                # SearchReference is AnswerReference, the validated refs are
+                # returned as they are instead of being copied.
+                with phase('validate'):
+                    refs = SearchResponse.model_validate_json(
+                        resp.content).refs
+            if response_key is not None:
+                self._put_cached_response(response_key, resp.content)
+            return refs
+
+        cache = Config.semantic_cache
+        if cache is None:
+            return load()
+        partition = self._semantic_cache_partition('search', top_k)
+        refs, _ = cache.get_or_load(partition, question, load)
+        # The cache keeps the refs, the caller gets copies
+        return [ref.model_copy() for ref in refs]
+
+    def search_fast(
+        self, question: str, top_k: int = 5, timeout: float = None,
+    ) -> List[SearchRecord]:
+        """
+        Semantic search returning compact immutable records built straight
+        from the response JSON, skipping pydantic validation. The records take
+        about half the memory of SearchReference models, which matters when
+        many results are held. Call to_model() on a record for a
+        SearchReference. The semantic cache is not used.
+
+        :param question: Question in plain text.
+        :param top_k: the top k relevant contexts to get answer from.
+        :param timeout: optional timeout in seconds for the search request.
         :return: A list of most relevant document references in the collection
         """
+        resp = self._post_search(question, top_k, timeout)
+        return [SearchRecord.from_json(ref) for ref in resp.json()['refs']]
+
+    def ask_fast(
+        self, question: str, top_k: int = 5, doc_name: str = None,
+    ) -> AskRecord:
+        """
+        Ask returning a compact immutable record built straight from the
+        response JSON, skipping pydantic validation. The record takes about
+        half the memory of an AskResponse. Call to_model() for an
+        AskResponse. The semantic cache is not used.
+
+        :param question: Question in plain text.
+        :param top_k: the top k relevant contexts to get answer from.
+        :param doc_name: if specified, ask is scoped to the given document only.
+        :return: The answer and the most relevant document references
+        """
+        resp = post_ask(Config.namespace, self.name, question, top_k, doc_name)
+        return AskRecord.from_json(resp.json())
+
+    def _post_search(self, question: str, top_k: int, timeout: float):
         url = f'{Config.get_base_url()}/docs/search'
 
-        req = SearchRequest(
-            namespace_name=Config.namespace,
-            collection_name=self.name,
-            question=question,
-            top_k=top_k
-        )
+        with phase('serialize'):
+            req = SearchRequest(
+                namespace_name=Config.namespace,
+                collection_name=self.name,
+                question=question,
+                top_k=top_k
+            )
+            data = req.model_dump_json()
 
-        resp = Config.post(
+        return Config.post(
             url=url,
-            data=req.model_dump_json(),
-            enforce_api_key=False
+            data=data,
+            enforce_api_key=False,
+            timeout=timeout,
         )
-        resp = SearchResponse.model_validate(resp.json())
-
-        return [
-            SearchReference(
-                doc_name=ref.doc_name,
-                page_num=ref.page_num,
-                sample_text=ref.sample_text
-            ) for ref in resp.refs
-        ]
 
     def chat(self, doc_name: str = None) -> Chat:
         """
@@ -376,6 +772,7 @@ class Collection(BaseModel):
             type=ingestion_type,
             spec=ingestion_spec.model_dump())
         Config.post(url=url, data=req.model_dump_json())
+        invalidate_metadata(self.name)
 
     def get_ingestion(self, ingestion_id: str) -> IngestionStatus:
         """
@@ -407,6 +804,8 @@ class Collection(BaseModel):
             collection_name=self.name,
             ingestion_id=ingestion_id)
         Config.post(url=url, data=req.model_dump_json())
+        self._invalidate_semantic_cache()
+        self._invalidate_response_cache()
 
     def delete_ingestion(self, ingestion_type: IngestionType):
         """
@@ -421,6 +820,8 @@ class Collection(BaseModel):
             collection_name=self.name,
             type=ingestion_type)
         Config.post(url=url, data=req.model_dump_json())
+        self._invalidate_semantic_cache()
+        self._invalidate_response_cache()
 
     def delete_periodic_ingestion(self, ingestion_type: IngestionType):
         """
@@ -435,6 +836,7 @@ class Collection(BaseModel):
             collection_name=self.name,
             type=ingestion_type)
         Config.post(url=url, data=req.model_dump_json())
+        invalidate_metadata(self.name)
 
     def get_crawl(
         self, crawl_id: str,
@@ -447,15 +849,41 @@ class Collection(BaseModel):
             - crawl status: the status of crawl
             - page stats: A dict of page urls and stats
         """
+        resp = self._post_get_crawl(crawl_id)
+        crawl_resp = GetCrawlResponse.model_validate(resp.json())
+        return crawl_resp.crawl_status, crawl_resp.crawl_result
+
+    def get_crawl_pages(self, crawl_id: str) -> CrawlPages:
+        """
+        Get the result of a crawl without decoding all pages up front. Use it
+        for large crawls, e.g. to iterate only the failed pages or to compute
+        a compact summary.
+
+        :param crawl_id: the id of the crawl
+        :return: The crawl status and an iterable of CrawlPage
+        """
+        return CrawlPages(self._post_get_crawl(crawl_id).text)
+
+    def diff_crawls(self, old_crawl_id: str, new_crawl_id: str) -> CrawlDiff:
+        """
+        Compare two crawls of the same root_url.
+
+        :param old_crawl_id: the id of the older crawl
+        :param new_crawl_id: the id of the newer crawl
+        :return: The added, removed, newly failed, recovered and changed pages
+        """
+        old = self.get_crawl_pages(old_crawl_id).summary()
+        new = self.get_crawl_pages(new_crawl_id).summary()
+        return old.diff(new)
+
+    def _post_get_crawl(self, crawl_id: str):
         url = f'{Config.get_base_url()}/docs/get_crawl'
         req = GetCrawlRequest(
             namespace_name=Config.namespace,
             collection_name=self.name,
             crawl_id=crawl_id,
         )
-        resp = Config.post(url=url, data=req.model_dump_json())
-        crawl_resp = GetCrawlResponse.model_validate(resp.json())
-        return crawl_resp.crawl_status, crawl_resp.crawl_result
+        return Config.post(url=url, data=req.model_dump_json())
 
     def index_crawl(self, crawl_id: str):
 
@@ -471,6 +899,8 @@ class Collection(BaseModel):
             crawl_id=crawl_id,
         )
         Config.post(url=url, data=req.model_dump_json())
+        self._invalidate_semantic_cache()
+        self._invalidate_response_cache()
 
     def delete_crawl(self, root_url: str):
         """
@@ -485,6 +915,8 @@ class Collection(BaseModel):
             root_url=root_url,
         )
         Config.post(url=url, data=req.model_dump_json())
+        self._invalidate_semantic_cache()
+        self._invalidate_response_cache()
 
     def configure_chat(
         self,
@@ -514,6 +946,9 @@ class Collection(BaseModel):
 
         url = f'{Config.get_base_url()}/docs/configure_chat'
         Config.post(url=url, data=req.model_dump_json())
+        invalidate_metadata(self.name)
+        self._invalidate_semantic_cache()
+        self._invalidate_response_cache()
 
         # update the local chat attributes
         self.chat_attributes = req.chat_attributes
@@ -526,14 +961,14 @@ class Collection(BaseModel):
         unregistered_user: UnregisteredUser = None,
     ):
         """
-        Provides feedback for the ask or search.
+        Provides feedback for the ask or search. The feedback is sent in the
+        background if configure_feedback_buffer() is used.
 
         :param request_id: the request_id of the ask or search
         :param thumb_down: thumb up or down
         :param text_feedback: optional text feedback
         :param unregistered_user: optional information of the unregistered user
         """
-        url = f'{Config.get_base_url()}/feedback/create_or_update'
         req = CreateOrUpdateFeedbackRequest(
             namespace_name=Config.namespace,
             collection_name=self.name,
@@ -542,8 +977,92 @@ class Collection(BaseModel):
             text_feedback=text_feedback,
             unregistered_user=unregistered_user,
         )
-        print(req.model_dump_json())
-        Config.post(url=url, data=req.model_dump_json())
+        if Config.feedback_buffer is not None:
+            Config.feedback_buffer.put(req)
+        else:
+            send_feedback(req)
+
+    def _document_cache_tag(self, doc_name: str) -> str:
+        return json.dumps(
+            [Config.account_id, Config.namespace, self.name, doc_name])
+
+    @staticmethod
+    def _document_cache():
+        # Summaries and outlines use the response cache unless a dedicated
+        # document cache is configured
+        if Config.document_cache is not None:
+            return Config.document_cache
+        return Config.response_cache
+
+    def _document_cache_key(self, doc_name: str, kind: str) -> Optional[str]:
+        cache = self._document_cache()
+        if cache is None:
+            return None
+        tag = self._document_cache_tag(doc_name)
+        # The generation changes whenever the document is uploaded or deleted
+        return json.dumps([tag, cache.generation(tag), kind])
+
+    def _invalidate_document_cache(self, doc_name: str):
+        tag = self._document_cache_tag(doc_name)
+        for cache in (Config.document_cache, Config.response_cache):
+            if cache is not None:
+                cache.bump_generation(tag)
+                cache.delete_tag(tag)
+
+    def _collection_cache_tag(self) -> str:
+        return json.dumps([Config.account_id, Config.namespace, self.name])
+
+    def _response_cache_key(self, *params) -> Optional[str]:
+        cache = Config.response_cache
+        if cache is None:
+            return None
+        tag = self._collection_cache_tag()
+        # The generation changes whenever a document of the collection or
+        # its chat configuration changes
+        return json.dumps([tag, cache.generation(tag), *params])
+
+    def _get_cached_response(self, key: Optional[str]) -> Optional[bytes]:
+        if key is None:
+            return None
+        value = Config.response_cache.get(key)
+        if value is None:
+            return None
+        # Values are prefixed with the time they were stored
+        stored_at, = struct.unpack_from('<d', value)
+        ttl = Config.response_cache_ttl
+        if ttl is not None and time.time() - stored_at > ttl:
+            return None
+        return value[8:]
+
+    def _put_cached_response(self, key: str, value: bytes):
+        Config.response_cache.put(
+            key, struct.pack('<d', time.time()) + value,
+            tag=self._collection_cache_tag())
+
+    def _invalidate_response_cache(self):
+        cache = Config.response_cache
+        if cache is None:
+            return
+        tag = self._collection_cache_tag()
+        cache.bump_generation(tag)
+        cache.delete_tag(tag)
+
+    def _semantic_cache_partition(self, *params) -> tuple:
+        return (Config.account_id, Config.namespace, self.name) + params
+
+    def _invalidate_semantic_cache(self):
+        if Config.semantic_cache is None:
+            return
+        scope = self._semantic_cache_partition()
+        Config.semantic_cache.invalidate(
+            lambda partition: partition[:len(scope)] == scope)
+
+
+def _without_request_ids(resp: AskResponse) -> AskResponse:
+    # The IDs identify this request, not the ones served from a cache
+    return resp.model_copy(
+        deep=True, update={'request_id': '', 'conversation_id': ''})
+
 
 def describe_response_to_collection(
     collection_name: str,
@@ -0,0 +1,279 @@
+import json
+import re
+from array import array
+from collections import Counter
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+from urllib.parse import urlsplit
+
+from pydantic import BaseModel
+
+from chatbees.server_models.doc_api import CrawlStatus, PageStats
+
+__all__ = ["CrawlPage", "CrawlPages", "CrawlSummary", "CrawlDiff"]
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+_OBJECT_START = re.compile(r'[ \t\n\r]*\{[ \t\n\r]*')
+_OBJECT_END = re.compile(r'[ \t\n\r]*\}')
+_MEMBER_SEPARATOR = re.compile(r'[ \t\n\r]*:[ \t\n\r]*')
+_NEXT_MEMBER = re.compile(r'[ \t\n\r]*,[ \t\n\r]*')
+# A JSON string or a bracket, used to skip over a value without decoding it
+_SKIP_TOKEN = re.compile(r'"(?:[^"\\]|\\.)*"|[{}\[\]]')
+
+
+class CrawlPage(NamedTuple):
+    """
+    The stats of a crawled page.
+    """
+    url: str
+    char_count: int
+    error_code: Optional[str] = None
+    error_msg: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error_code is None
+
+    def to_model(self) -> PageStats:
+        return PageStats(char_count=self.char_count,
+                         error_code=self.error_code,
+                         error_msg=self.error_msg)
+
+
+class _ObjectReader:
+    """
+    Reads the members of a JSON object one at a time, so a large object is
+    never decoded as a whole.
+    """
+
+    def __init__(self, text: str, pos: int = 0):
+        self.text = text
+        self.pos = pos
+        self._decoder = json.JSONDecoder()
+
+    def _skip_whitespace(self) -> str:
+        self.pos = _WHITESPACE.match(self.text, self.pos).end()
+        return self.text[self.pos:self.pos + 1]
+
+    def _expect(self, char: str):
+        if self._skip_whitespace() != char:
+            raise ValueError(f"Expecting '{char}' at position {self.pos}")
+        self.pos += 1
+
+    def begin(self):
+        self._expect('{')
+        self._first = True
+
+    def next_key(self) -> Optional[str]:
+        """
+        Returns the key of the next member, or None at the end of the object.
+        """
+        if self._skip_whitespace() == '}':
+            self.pos += 1
+            return None
+        if not self._first:
+            self._expect(',')
+        self._first = False
+        self._skip_whitespace()
+        key, self.pos = self._decoder.raw_decode(self.text, self.pos)
+        self._expect(':')
+        self._skip_whitespace()
+        return key
+
+    def peek(self) -> str:
+        return self._skip_whitespace()
+
+    def value(self):
+        value, self.pos = self._decoder.raw_decode(self.text, self.pos)
+        return value
+
+    def skip_value(self):
+        if self.peek() not in '{[':
+            self.value()
+            return
+        depth = 0
+        for m in _SKIP_TOKEN.finditer(self.text, self.pos):
+            token = m.group()
+            if token in '{[':
+                depth += 1
+            elif token in '}]':
+                depth -= 1
+                if depth == 0:
+                    self.pos = m.end()
+                    return
+        raise ValueError("Unterminated JSON value")
+
+
+class CrawlPages:
+    """
+    The result of a crawl, decoded lazily from the get_crawl response.
+    Iterating yields a CrawlPage per crawled url, decoding one page at a time
+    instead of building a PageStats model for every page up front.
+    """
+
+    def __init__(self, text: str):
+        self._text = text
+        # The position of the crawl_result object, None if there is none
+        self._result_pos = None
+        header = {}
+        reader = _ObjectReader(text)
+        reader.begin()
+        while (key := reader.next_key()) is not None:
+            if key == 'crawl_result' and reader.peek() == '{':
+                self._result_pos = reader.pos
+                reader.skip_value()
+            else:
+                header[key] = reader.value()
+        self.root_url: str = header['root_url']
+        self.created_on: int = header['created_on']
+        self.max_pages: int = header['max_pages']
+        self.crawl_status = CrawlStatus(header['crawl_status'])
+
+    def __iter__(self) -> Iterator[CrawlPage]:
+        if self._result_pos is None:
+            return
+        # The hot loop of large crawls, _ObjectReader inlined
+        text = self._text
+        decode = json.JSONDecoder().raw_decode
+        pos = _OBJECT_START.match(text, self._result_pos).end()
+        m = _OBJECT_END.match(text, pos)
+        while m is None:
+            url, pos = decode(text, pos)
+            pos = _MEMBER_SEPARATOR.match(text, pos).end()
+            stats, pos = decode(text, pos)
+            yield CrawlPage(url, stats['char_count'],
+                            stats.get('error_code'), stats.get('error_msg'))
+            m = _OBJECT_END.match(text, pos)
+            if m is None:
+                sep = _NEXT_MEMBER.match(text, pos)
+                if sep is None:
+                    raise ValueError(f"Expecting ',' at position {pos}")
+                pos = sep.end()
+
+    def failures(self) -> Iterator[CrawlPage]:
+        return (page for page in self if not page.ok)
+
+    def summary(self) -> 'CrawlSummary':
+        return CrawlSummary.from_pages(self.root_url, self.crawl_status, self)
+
+
+def _url_prefix(url: str, depth: int) -> str:
+    parts = urlsplit(url)
+    segments = [s for s in parts.path.split('/') if s][:depth]
+    return f"{parts.scheme}://{parts.netloc}/" + '/'.join(segments)
+
+
+class CrawlDiff(BaseModel):
+    root_url: str
+
+    # Pages only in the new crawl
+    added: List[str] = []
+
+    # Pages only in the old crawl
+    removed: List[str] = []
+
+    # Pages that succeeded in the old crawl and failed in the new one
+    newly_failed: List[str] = []
+
+    # Pages that failed in the old crawl and succeeded in the new one
+    recovered: List[str] = []
+
+    # Pages crawled in both with a different char count, (old, new)
+    char_count_changed: Dict[str, Tuple[int, int]] = {}
+
+
+class CrawlSummary:
+    """
+    A compact, columnar summary of a crawl. Page i has url urls[i], char
+    count char_counts[i] and error code codes[error_codes[i]], or no error
+    if error_codes[i] is -1. Only failed pages keep their error message.
+    """
+
+    def __init__(self, root_url: str, crawl_status: CrawlStatus):
+        self.root_url = root_url
+        self.crawl_status = crawl_status
+        self.urls: List[str] = []
+        self.char_counts = array('q')
+        self.error_codes = array('h')
+        self.codes: List[str] = []
+        self.failures: List[CrawlPage] = []
+        self._code_index: Dict[str, int] = {}
+
+    @classmethod
+    def from_pages(
+        cls, root_url: str, crawl_status: CrawlStatus, pages,
+    ) -> 'CrawlSummary':
+        summary = cls(root_url, crawl_status)
+        for page in pages:
+            summary._add(page)
+        return summary
+
+    def _add(self, page: CrawlPage):
+        self.urls.append(page.url)
+        self.char_counts.append(page.char_count)
+        if page.ok:
+            self.error_codes.append(-1)
+            return
+        index = self._code_index.get(page.error_code)
+        if index is None:
+            index = self._code_index[page.error_code] = len(self.codes)
+            self.codes.append(page.error_code)
+        self.error_codes.append(index)
+        self.failures.append(page)
+
+    @property
+    def pages(self) -> int:
+        return len(self.urls)
+
+    @property
+    def failed(self) -> int:
+        return len(self.failures)
+
+    @property
+    def total_chars(self) -> int:
+        return sum(self.char_counts)
+
+    def error_histogram(self) -> Dict[str, int]:
+        """
+        The number of failed pages by error code, most common first.
+        """
+        counts = Counter(i for i in self.error_codes if i >= 0)
+        return {self.codes[i]: n for i, n in counts.most_common()}
+
+    def top_failing_prefixes(
+        self, n: int = 10, depth: int = 1,
+    ) -> List[Tuple[str, int]]:
+        """
+        The url prefixes with the most failed pages, e.g.
+        https://example.com/blog with depth 1.
+
+        :param n: the number of prefixes to return
+        :param depth: the number of path segments in a prefix
+        """
+        counts = Counter(_url_prefix(page.url, depth) for page in self.failures)
+        return counts.most_common(n)
+
+    def diff(self, new: 'CrawlSummary') -> CrawlDiff:
+        """
+        Compares this crawl with a newer crawl of the same root_url.
+        """
+        if new.root_url != self.root_url:
+            raise ValueError(
+                f"Cannot diff crawls of {self.root_url} and {new.root_url}")
+        old_pages = {url: i for i, url in enumerate(self.urls)}
+        diff = CrawlDiff(root_url=self.root_url)
+        for j, url in enumerate(new.urls):
+            i = old_pages.pop(url, None)
+            if i is None:
+                diff.added.append(url)
+                continue
+            old_ok = self.error_codes[i] < 0
+            new_ok = new.error_codes[j] < 0
+            if old_ok and not new_ok:
+                diff.newly_failed.append(url)
+            elif new_ok and not old_ok:
+                diff.recovered.append(url)
+            if self.char_counts[i] != new.char_counts[j]:
+                diff.char_count_changed[url] = (
+                    self.char_counts[i], new.char_counts[j])
+        diff.removed = list(old_pages)
+        return diff
@@ -0,0 +1,137 @@
+import csv
+from typing import IO, Iterable, List, Optional
+
+from pydantic import BaseModel
+
+from chatbees.server_models.doc_api import ExtractType, ExtractedTable
+
+__all__ = [
+    "ExtractionResult",
+    "CsvExtractionSink",
+    "ParquetExtractionSink",
+]
+
+COLUMNS = ["doc_name", "extract_type", "input_texts", "relevant_texts", "error"]
+
+
+class ExtractionResult(BaseModel):
+    """
+    The outcome of one extract_relevant_texts call of a bulk extraction.
+    """
+    doc_name: str
+    extract_type: ExtractType
+    input_texts: str
+
+    # The extracted texts, None if the extraction failed
+    relevant_texts: Optional[str] = None
+
+    # The error of a failed extraction
+    error: Optional[str] = None
+
+    def table(self) -> ExtractedTable:
+        """
+        Parses the result of an EXTRACT_TABLE extraction. Tables are only
+        parsed when asked for, so results that are written straight to a sink
+        never pay for it.
+        """
+        if self.extract_type != ExtractType.EXTRACT_TABLE:
+            raise ValueError(f"{self.extract_type} does not extract a table")
+        if self.relevant_texts is None:
+            raise ValueError(f"Extraction failed: {self.error}")
+        return ExtractedTable.model_validate_json(self.relevant_texts)
+
+    def row(self) -> List[Optional[str]]:
+        return [self.doc_name, self.extract_type.value, self.input_texts,
+                self.relevant_texts, self.error]
+
+
+class CsvExtractionSink:
+    """
+    Writes extraction results to a CSV file as they arrive, one row per
+    result. Tables are written as their JSON string.
+    """
+
+    def __init__(self, path_or_file):
+        if isinstance(path_or_file, str):
+            self._file: IO = open(path_or_file, 'w', newline='', encoding='utf-8')
+            self._owns_file = True
+        else:
+            self._file = path_or_file
+            self._owns_file = False
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(COLUMNS)
+
+    def write(self, result: ExtractionResult):
+        self._writer.writerow(result.row())
+
+    def write_all(self, results: Iterable[ExtractionResult]) -> int:
+        count = 0
+        for result in results:
+            self.write(result)
+            count += 1
+        return count
+
+    def close(self):
+        if self._owns_file:
+            self._file.close()
+        else:
+            self._file.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ParquetExtractionSink:
+    """
+    Writes extraction results to a Parquet file in row groups of
+    `batch_size` results, so at most one row group is held in memory.
+    Requires pyarrow.
+    """
+
+    def __init__(self, path: str, batch_size: int = 1024):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("ParquetExtractionSink requires pyarrow, please "
+                              "`pip install pyarrow`")
+        self._pa = pa
+        self._schema = pa.schema([(name, pa.string()) for name in COLUMNS])
+        self._writer = pq.ParquetWriter(path, self._schema)
+        self._batch_size = batch_size
+        self._columns = [[] for _ in COLUMNS]
+
+    def write(self, result: ExtractionResult):
+        for column, value in zip(self._columns, result.row()):
+            column.append(value)
+        if len(self._columns[0]) >= self._batch_size:
+            self._flush()
+
+    def write_all(self, results: Iterable[ExtractionResult]) -> int:
+        count = 0
+        for result in results:
+            self.write(result)
+            count += 1
+        return count
+
+    def close(self):
+        self._flush()
+        self._writer.close()
+
+    def _flush(self):
+        if not self._columns[0]:
+            return
+        self._writer.write_table(
+            self._pa.Table.from_arrays(
+                [self._pa.array(c, type=self._pa.string()) for c in self._columns],
+                schema=self._schema))
+        self._columns = [[] for _ in COLUMNS]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,185 @@
+import atexit
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from typing import List, Tuple
+
+from chatbees.server_models.feedback_api import CreateOrUpdateFeedbackRequest
+from chatbees.utils.concurrency import fan_out
+from chatbees.utils.config import Config
+from chatbees.utils.instrumentation import metrics
+
+__all__ = ["FeedbackBuffer"]
+
+# Buffers that are not closed yet, flushed when the interpreter exits
+_open_buffers = weakref.WeakSet()
+
+
+@atexit.register
+def _close_open_buffers():
+    for buffer in list(_open_buffers):
+        buffer.close()
+
+
+def send_feedback(req: CreateOrUpdateFeedbackRequest):
+    url = f'{Config.get_base_url()}/feedback/create_or_update'
+    Config.post(url=url, data=req.model_dump_json())
+
+
+class FeedbackBuffer:
+    """
+    Sends feedback from a background thread, so recording a thumb up or down
+    does not wait for the service.
+
+    Feedback is sent once `max_batch` requests are pending, or
+    `flush_interval` seconds after the oldest pending request was added. The
+    requests of a batch are sent concurrently. A newer feedback for the same
+    request_id replaces the pending one, so only the latest is sent.
+    Pending feedback is sent when the buffer is closed, at the latest when
+    the interpreter exits.
+
+    Failed requests are reported in `failures`.
+    """
+
+    def __init__(
+        self,
+        max_batch: int = 50,
+        flush_interval: float = 1.0,
+        max_concurrency: int = 8,
+    ):
+        if max_batch < 1:
+            raise ValueError("max_batch must be at least 1")
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.max_concurrency = max_concurrency
+        self.failures: List[Tuple[CreateOrUpdateFeedbackRequest, BaseException]] = []
+        self.sent = 0
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        # (namespace, collection, request_id) -> the latest request
+        self._pending: OrderedDict[tuple, CreateOrUpdateFeedbackRequest] = \
+            OrderedDict()
+        self._oldest = None
+        self._sending = 0
+        self._flush_requested = False
+        self._closed = False
+        self._worker = threading.Thread(
+            target=self._work, daemon=True, name="chatbees-feedback")
+        self._worker.start()
+        _open_buffers.add(self)
+
+    def put(self, req: CreateOrUpdateFeedbackRequest):
+        """
+        Queues a feedback request. Replaces a pending feedback for the same
+        request_id.
+        """
+        key = (req.namespace_name, req.collection_name, req.request_id)
+        with self._changed:
+            if self._closed:
+                raise RuntimeError("FeedbackBuffer is closed")
+            if key in self._pending:
+                metrics.incr("feedback_deduplicated")
+            self._pending[key] = req
+            if len(self._pending) == 1:
+                # Starts the interval of the worker
+                self._oldest = time.monotonic()
+                self._changed.notify_all()
+            elif len(self._pending) >= self.max_batch:
+                self._changed.notify_all()
+        metrics.set_gauge("feedback_pending", self.pending)
+
+    @property
+    def pending(self) -> int:
+        """
+        The number of feedback requests queued or being sent.
+        """
+        with self._lock:
+            return len(self._pending) + self._sending
+
+    def flush(self, timeout: float = None) -> bool:
+        """
+        Sends the pending feedback now and waits until it is sent or failed.
+
+        :param timeout: Seconds to wait. Waits forever if None.
+        :return: False if the timeout expired first.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._changed:
+            self._flush_requested = True
+            self._changed.notify_all()
+            while self._pending or self._sending:
+                remaining = None
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return False
+                self._changed.wait(remaining)
+            self._flush_requested = False
+        return True
+
+    def close(self, timeout: float = None) -> bool:
+        """
+        Stops accepting feedback, sends the pending feedback and stops the
+        background thread.
+
+        :param timeout: Seconds to wait. Waits forever if None.
+        :return: False if the timeout expired before all feedback was sent.
+        """
+        with self._changed:
+            self._closed = True
+            self._changed.notify_all()
+        _open_buffers.discard(self)
+        flushed = self.flush(timeout)
+        if flushed:
+            self._worker.join()
+        return flushed
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _work(self):
+        while True:
+            with self._changed:
+                while not self._batch_ready():
+                    if self._closed and not self._pending:
+                        return
+                    wait_for = None
+                    if self._pending:
+                        wait_for = max(0.0, self._oldest + self.flush_interval
+                                       - time.monotonic())
+                    self._changed.wait(wait_for)
+                batch = []
+                while self._pending and len(batch) < self.max_batch:
+                    batch.append(self._pending.popitem(last=False)[1])
+                self._oldest = time.monotonic() if self._pending else None
+                if not self._pending:
+                    self._flush_requested = False
+                self._sending = len(batch)
+            self._send(batch)
+            with self._changed:
+                self._sending = 0
+                self._changed.notify_all()
+            metrics.set_gauge("feedback_pending", self.pending)
+
+    def _batch_ready(self) -> bool:
+        # Caller holds self._lock
+        if not self._pending:
+            return False
+        return (len(self._pending) >= self.max_batch
+                or self._flush_requested or self._closed
+                or time.monotonic() - self._oldest >= self.flush_interval)
+
+    def _send(self, batch: List[CreateOrUpdateFeedbackRequest]):
+        for outcome in fan_out(send_feedback, batch, self.max_concurrency):
+            if outcome.ok:
+                with self._lock:
+                    self.sent += 1
+                metrics.incr("feedback_sent")
+            else:
+                with self._lock:
+                    self.failures.append((outcome.item, outcome.error))
+                metrics.incr("feedback_failures")
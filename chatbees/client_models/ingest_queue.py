@@ -0,0 +1,354 @@
+import atexit
+import os
+import queue
+import threading
+import time
+import uuid
+import weakref
+from typing import Dict, List, Optional, Tuple
+
+import requests
+
+from chatbees.client_models.collection import Collection
+from chatbees.utils.circuit_breaker import is_failure
+from chatbees.utils.config import Config
+from chatbees.utils.exceptions import APIError, CircuitOpen, ServerError
+from chatbees.utils.file_upload import is_url, validate_file, validate_size
+from chatbees.utils.instrumentation import metrics
+from chatbees.utils.journal import Journal
+from chatbees.utils.priority import Priority, priority
+
+__all__ = ["IngestQueue"]
+
+# Errors that may succeed when the upload is retried, besides 429 and 5xx
+# responses
+RETRYABLE_ERRORS = (ServerError, CircuitOpen, requests.ConnectionError,
+                    requests.Timeout)
+
+PATH = "path"
+URL = "url"
+BYTES = "bytes"
+
+_STOP = object()
+
+# Queues that are not closed yet, flushed when the interpreter exits
+_open_queues = weakref.WeakSet()
+
+
+@atexit.register
+def _close_open_queues():
+    for q in list(_open_queues):
+        q.close()
+
+
+def is_retryable(error: BaseException) -> bool:
+    """
+    Whether an upload failed for a transient reason, e.g. a 429 or 5xx
+    response, rather than because of the document or the request.
+    """
+    if isinstance(error, APIError) and error.status_code is not None:
+        return is_failure(error.status_code)
+    return isinstance(error, RETRYABLE_ERRORS)
+
+
+class _Item:
+    __slots__ = ("id", "kind", "name", "source", "data")
+
+    def __init__(self, id: str, kind: str, name: str, source: str = None,
+                 data: bytes = None):
+        self.id = id
+        self.kind = kind
+        self.name = name
+        # The path or url, or the spool file of bytes in the journal dir
+        self.source = source
+        self.data = data
+
+    def record(self) -> dict:
+        return {"op": "add", "id": self.id, "kind": self.kind,
+                "name": self.name, "source": self.source}
+
+
+class IngestQueue:
+    """
+    Uploads documents into a collection from background worker threads, so
+    the producer does not wait for the uploads.
+
+    put() blocks while `max_pending` documents are waiting, applying
+    backpressure to a producer that is faster than the uploads. If
+    `journal_dir` is set, pending documents are recorded there, in-memory
+    documents included, and a new queue with the same `journal_dir` uploads
+    the documents a crashed process did not finish.
+
+    Failed uploads are retried `max_retries` times for 429 and 5xx
+    responses, open circuits, and connection errors and timeouts, and are
+    then reported in `failures`. Other errors are reported without retries.
+
+    The journal is compacted to the pending documents every `compact_every`
+    completed documents, so it does not grow with the documents uploaded.
+    """
+
+    def __init__(
+        self,
+        collection_name: str,
+        workers: int = 4,
+        max_pending: int = 100,
+        journal_dir: str = None,
+        max_retries: int = 3,
+        retry_backoff: float = 1.0,
+        compact_every: int = 1000,
+    ):
+        if workers < 1:
+            raise ValueError("workers must be at least 1")
+        if compact_every < 1:
+            raise ValueError("compact_every must be at least 1")
+        self.collection = Collection(name=collection_name)
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.failures: List[Tuple[str, BaseException]] = []
+        self.uploaded = 0
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._unfinished = 0
+        self._closed = False
+
+        self._journal_dir = None
+        self._journal = None
+        self.compact_every = compact_every
+        # The journal records of the pending documents, and the documents
+        # completed since the journal was compacted
+        self._journal_lock = threading.Lock()
+        self._records: Dict[str, dict] = {}
+        self._completed = 0
+        recovered = []
+        if journal_dir is not None:
+            self._journal_dir = os.path.expanduser(journal_dir)
+            os.makedirs(self._journal_dir, exist_ok=True)
+            self._journal = Journal(
+                os.path.join(self._journal_dir, "journal.jsonl"))
+            recovered = self._recover()
+
+        self._workers = [
+            threading.Thread(target=self._work, daemon=True,
+                             name=f"chatbees-ingest-{i}")
+            for i in range(workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+        _open_queues.add(self)
+        # Recovered documents go first. They may exceed max_pending, enqueue
+        # them from a thread so the constructor does not block.
+        if recovered:
+            self._unfinished = len(recovered)
+            threading.Thread(
+                target=lambda: [self._queue.put(item) for item in recovered],
+                daemon=True).start()
+
+    def put(self, path_or_url: str, timeout: float = None):
+        """
+        Queues a local file or the URL of a web document for upload. Blocks
+        while the queue is full.
+
+        :param path_or_url: Local file path or the URL of a document.
+        :param timeout: Seconds to wait for room in the queue, raises
+                        queue.Full after it. Waits forever if None.
+        """
+        if is_url(path_or_url):
+            item = _Item(uuid.uuid4().hex, URL,
+                         os.path.basename(path_or_url), path_or_url)
+        else:
+            path = os.path.abspath(os.path.expanduser(path_or_url))
+            validate_file(path)
+            item = _Item(uuid.uuid4().hex, PATH, os.path.basename(path), path)
+        self._submit(item, timeout)
+
+    def put_bytes(self, name: str, data: bytes, timeout: float = None):
+        """
+        Queues an in-memory document for upload. Blocks while the queue is
+        full.
+
+        :param name: The document name, e.g. report.pdf.
+        :param data: The content of the document.
+        :param timeout: Seconds to wait for room in the queue, raises
+                        queue.Full after it. Waits forever if None.
+        """
+        validate_size(name, len(data))
+        item = _Item(uuid.uuid4().hex, BYTES, name, data=bytes(data))
+        if self._journal is not None:
+            item.source = os.path.join(self._journal_dir, f"{item.id}.bin")
+            with open(item.source, 'wb') as f:
+                f.write(item.data)
+                f.flush()
+                os.fsync(f.fileno())
+        self._submit(item, timeout)
+
+    @property
+    def pending(self) -> int:
+        """
+        The number of documents queued or being uploaded.
+        """
+        with self._lock:
+            return self._unfinished
+
+    def flush(self, timeout: float = None) -> bool:
+        """
+        Waits until all queued documents are uploaded or failed.
+
+        :param timeout: Seconds to wait. Waits forever if None.
+        :return: False if the timeout expired first.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._idle:
+            while self._unfinished:
+                remaining = None
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return False
+                self._idle.wait(remaining)
+        return True
+
+    def close(self, timeout: float = None) -> bool:
+        """
+        Stops accepting documents, waits for the queued ones and stops the
+        workers. Documents still pending after the timeout stay in the
+        journal.
+
+        :param timeout: Seconds to wait. Waits forever if None.
+        :return: False if the timeout expired before all documents were
+                 uploaded.
+        """
+        with self._lock:
+            if self._closed:
+                return self._unfinished == 0
+            self._closed = True
+        _open_queues.discard(self)
+        flushed = self.flush(timeout)
+        if flushed:
+            for _ in self._workers:
+                self._queue.put(_STOP)
+            for worker in self._workers:
+                worker.join()
+            if self._journal is not None:
+                self._journal.compact([])
+        return flushed
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _submit(self, item: _Item, timeout: Optional[float]):
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("IngestQueue is closed")
+        if self._journal is not None:
+            record = item.record()
+            with self._journal_lock:
+                self._journal.append(record)
+                self._records[item.id] = record
+        self._enqueue(item, timeout)
+
+    def _enqueue(self, item: _Item, timeout: Optional[float]):
+        with self._lock:
+            self._unfinished += 1
+        try:
+            self._queue.put(item, timeout=timeout)
+        except queue.Full:
+            self._finish(item)
+            raise
+        self._update_pending_metric()
+
+    def _recover(self) -> List[_Item]:
+        items = {}
+        for record in self._journal.records():
+            if record.get("op") == "add":
+                items[record["id"]] = record
+            elif record.get("op") == "done":
+                items.pop(record["id"], None)
+        recovered = [
+            _Item(r["id"], r["kind"], r["name"], r["source"])
+            for r in items.values()
+            if r["kind"] != BYTES or os.path.exists(r["source"])
+        ]
+        # Drop the completed records
+        self._records = {item.id: item.record() for item in recovered}
+        self._journal.compact(self._records.values())
+        return recovered
+
+    def _work(self):
+        with priority(Priority.BULK):
+            self._work_items()
+
+    def _work_items(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            try:
+                self._upload(item)
+            except Exception as e:
+                with self._lock:
+                    self.failures.append((item.name, e))
+                metrics.incr("ingest_queue_failures",
+                             collection_name=self.collection.name)
+            else:
+                with self._lock:
+                    self.uploaded += 1
+            self._finish(item)
+
+    def _upload(self, item: _Item):
+        for attempt in range(self.max_retries + 1):
+            try:
+                limiter = Config.concurrency_limiter
+                if limiter is None:
+                    self._upload_once(item)
+                else:
+                    limiter.call(self._upload_once, item)
+                return
+            except Exception as e:
+                if attempt == self.max_retries or not is_retryable(e):
+                    raise
+                time.sleep(self.retry_backoff * 2 ** attempt)
+
+    def _upload_once(self, item: _Item):
+        if item.kind == BYTES:
+            if item.data is not None:
+                self.collection.upload_bytes(item.name, item.data)
+            else:
+                with open(item.source, 'rb') as f:
+                    self.collection.upload_fileobj(item.name, f)
+        else:
+            self.collection.upload_document(item.source)
+
+    def _finish(self, item: _Item):
+        if self._journal is not None:
+            self._journal_done(item)
+        if item.kind == BYTES and item.source is not None:
+            try:
+                os.remove(item.source)
+            except FileNotFoundError:
+                pass
+        item.data = None
+        with self._idle:
+            self._unfinished -= 1
+            if self._unfinished == 0:
+                self._idle.notify_all()
+        self._update_pending_metric()
+
+    def _journal_done(self, item: _Item):
+        # Appends and compactions are serialized, so a compaction keeps the
+        # records of the documents added while it runs
+        with self._journal_lock:
+            self._records.pop(item.id, None)
+            self._completed += 1
+            if self._completed >= self.compact_every:
+                self._journal.compact(self._records.values())
+                self._completed = 0
+            else:
+                self._journal.append({"op": "done", "id": item.id})
+
+    def _update_pending_metric(self):
+        metrics.set_gauge("ingest_queue_pending", self.pending,
+                          collection_name=self.collection.name)
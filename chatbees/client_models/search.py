@@ -0,0 +1,107 @@
+from typing import Dict, List, NamedTuple, Tuple
+
+from pydantic import BaseModel
+
+from chatbees.server_models.doc_api import AskResponse, SearchReference
+
+__all__ = [
+    "CollectionSearchReference",
+    "FederatedSearchResponse",
+    "SearchRecord",
+    "AskRecord",
+]
+
+# The rank constant of reciprocal rank fusion. 60 is the value from the
+# original paper, it keeps a single top-ranked list from dominating the merge.
+RRF_K = 60
+
+
+class SearchRecord(NamedTuple):
+    """
+    An immutable, compact search reference built straight from the response
+    JSON without pydantic validation. Use to_model() for a SearchReference.
+    """
+    doc_name: str
+    page_num: int
+    sample_text: str
+
+    @classmethod
+    def from_json(cls, ref: Dict) -> 'SearchRecord':
+        return cls(ref['doc_name'], ref['page_num'], ref['sample_text'])
+
+    def to_model(self) -> SearchReference:
+        return SearchReference(
+            doc_name=self.doc_name,
+            page_num=self.page_num,
+            sample_text=self.sample_text)
+
+
+class AskRecord(NamedTuple):
+    """
+    An immutable, compact answer built straight from the response JSON
+    without pydantic validation. Use to_model() for an AskResponse.
+    """
+    answer: str
+    refs: Tuple[SearchRecord, ...]
+    request_id: str
+    conversation_id: str
+
+    @classmethod
+    def from_json(cls, resp: Dict) -> 'AskRecord':
+        return cls(
+            resp['answer'],
+            tuple(SearchRecord.from_json(ref) for ref in resp['refs']),
+            resp['request_id'],
+            resp['conversation_id'])
+
+    def to_model(self) -> AskResponse:
+        return AskResponse(
+            answer=self.answer,
+            refs=[ref.to_model() for ref in self.refs],
+            request_id=self.request_id,
+            conversation_id=self.conversation_id)
+
+
+class CollectionSearchReference(SearchReference):
+    """
+    A search reference and the collection it was found in.
+    """
+    collection_name: str
+
+    # The reciprocal rank fusion score, higher is more relevant
+    score: float
+
+
+class FederatedSearchResponse(BaseModel):
+    # The merged top-k references of all collections, most relevant first
+    refs: List[CollectionSearchReference]
+
+    # Collections that failed or timed out, and the error
+    failed_collections: Dict[str, str] = {}
+
+
+def merge_ranked(
+    results: Dict[str, List[SearchReference]], top_k: int,
+) -> List[CollectionSearchReference]:
+    """
+    Merges per-collection ranked references into one ranked list with
+    reciprocal rank fusion: a reference at rank r scores 1 / (RRF_K + r).
+
+    The search API does not return relevance scores, so ranks are the only
+    signal that is comparable across collections.
+    """
+    merged = []
+    for order, (collection_name, refs) in enumerate(results.items()):
+        for rank, ref in enumerate(refs, start=1):
+            merged.append((1.0 / (RRF_K + rank), rank, order, collection_name, ref))
+    # Ties are broken by rank, then by the order of the collections
+    merged.sort(key=lambda m: (-m[0], m[1], m[2]))
+    return [
+        CollectionSearchReference(
+            doc_name=ref.doc_name,
+            page_num=ref.page_num,
+            sample_text=ref.sample_text,
+            collection_name=collection_name,
+            score=score,
+        ) for score, _, _, collection_name, ref in merged[:top_k]
+    ]
@@ -0,0 +1,24 @@
+from typing import List
+
+from pydantic import BaseModel
+
+__all__ = ["SegmentTiming", "SegmentedTranscription"]
+
+
+class SegmentTiming(BaseModel):
+    index: int
+
+    # start and end of the segment in the audio, in seconds
+    start: float
+    end: float
+
+    # seconds spent transcribing the segment
+    elapsed: float
+
+
+class SegmentedTranscription(BaseModel):
+    # the stitched transcript of the whole audio
+    transcript: str
+
+    # per-segment timing, in audio order
+    segments: List[SegmentTiming]
@@ -0,0 +1,571 @@
+"""
+An in-memory stand-in for the ChatBees service, to test integrations and
+measure client throughput and caching offline. Search and ask rank the
+uploaded documents with BM25. See `python -m chatbees.fakeserver --help`.
+"""
+import email.parser
+import email.policy
+import gzip
+import itertools
+import json
+import random
+import threading
+import time
+import uuid
+from collections import Counter
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+import shortuuid
+from pydantic import BaseModel, ValidationError
+
+from chatbees.fakeserver.index import Bm25Index, Hit, extract_text
+from chatbees.server_models.chat import ConfigureChatRequest
+from chatbees.server_models.collection_api import (
+    ChatAttributes,
+    ConfigureCollectionRequest,
+    CreateCollectionRequest,
+    DeleteCollectionRequest,
+    DescribeCollectionRequest,
+    DescribeCollectionResponse,
+    ListCollectionsRequest,
+    ListCollectionsResponse,
+    PeriodicIngest,
+)
+from chatbees.server_models.doc_api import (
+    AddDocRequest,
+    AnswerReference,
+    AskRequest,
+    AskResponse,
+    CreateCrawlRequest,
+    CreateCrawlResponse,
+    DeleteCrawlRequest,
+    DeleteDocRequest,
+    DocumentMetadata,
+    DocumentType,
+    GetCrawlRequest,
+    GetCrawlResponse,
+    IndexCrawlRequest,
+    ListDocsRequest,
+    ListDocsResponse,
+    OutlineFAQRequest,
+    OutlineFAQResponse,
+    PageStats,
+    SummaryRequest,
+    SummaryResponse,
+)
+from chatbees.server_models.feedback_api import CreateOrUpdateFeedbackRequest
+from chatbees.server_models.ingestion_api import (
+    CreateIngestionRequest,
+    CreateIngestionResponse,
+    DeleteIngestionRequest,
+    DeletePeriodicIngestionRequest,
+    GetIngestionRequest,
+    GetIngestionResponse,
+    IndexIngestionRequest,
+    UpdatePeriodicIngestionRequest,
+)
+from chatbees.server_models.ingestion_type import IngestionStatus
+from chatbees.server_models.search_api import SearchRequest, SearchResponse
+from chatbees.utils.compression import GZIP, ZSTD, zstd
+
+__all__ = ["FakeServer", "Bm25Index"]
+
+# The answer of ask() when no document matches
+NO_ANSWER = "I do not have that information."
+
+# Words of the summary of a document
+SUMMARY_WORDS = 50
+
+
+class _ApiError(Exception):
+    def __init__(self, status: int, detail: str):
+        super().__init__(detail)
+        self.status = status
+        self.detail = detail
+
+
+class _Task:
+    """
+    A crawl or an ingestion. It runs for the task duration of the server.
+    """
+
+    def __init__(self, done_at: float, root_url: str = None,
+                 max_pages: int = 0, created_on: int = 0):
+        self.done_at = done_at
+        self.root_url = root_url
+        self.max_pages = max_pages
+        self.created_on = created_on
+        self.pages: Dict[str, str] = {}
+
+
+class _Collection:
+    def __init__(self, description: Optional[str], public_read: Optional[bool]):
+        self.description = description
+        self.public_read = bool(public_read)
+        self.chat_attributes: Optional[ChatAttributes] = None
+        self.index = Bm25Index()
+        self.documents: Dict[str, DocumentMetadata] = {}
+        self.crawls: Dict[str, _Task] = {}
+        self.ingestions: Dict[str, _Task] = {}
+        self.periodic_ingests: Dict[str, PeriodicIngest] = {}
+
+
+# path -> (request model, FakeServer method, whether it only reads)
+_ROUTES: Dict[str, Tuple[type, str, bool]] = {
+    '/collections/create': (CreateCollectionRequest, '_create_collection', False),
+    '/collections/configure': (ConfigureCollectionRequest, '_configure_collection', False),
+    '/collections/list': (ListCollectionsRequest, '_list_collections', True),
+    '/collections/delete': (DeleteCollectionRequest, '_delete_collection', False),
+    '/collections/describe': (DescribeCollectionRequest, '_describe_collection', True),
+    '/docs/add': (AddDocRequest, '_add_doc', False),
+    '/docs/delete': (DeleteDocRequest, '_delete_doc', False),
+    '/docs/list': (ListDocsRequest, '_list_docs', True),
+    '/docs/search': (SearchRequest, '_search', True),
+    '/docs/ask': (AskRequest, '_ask', True),
+    '/docs/summary': (SummaryRequest, '_summary', True),
+    '/docs/get_outline_faq': (OutlineFAQRequest, '_outline_faq', True),
+    '/docs/configure_chat': (ConfigureChatRequest, '_configure_chat', False),
+    '/docs/create_crawl': (CreateCrawlRequest, '_create_crawl', False),
+    '/docs/get_crawl': (GetCrawlRequest, '_get_crawl', True),
+    '/docs/index_crawl': (IndexCrawlRequest, '_index_crawl', False),
+    '/docs/delete_crawl': (DeleteCrawlRequest, '_delete_crawl', False),
+    '/docs/create_ingestion': (CreateIngestionRequest, '_create_ingestion', False),
+    '/docs/get_ingestion': (GetIngestionRequest, '_get_ingestion', True),
+    '/docs/index_ingestion': (IndexIngestionRequest, '_noop', False),
+    '/docs/delete_ingestion': (DeleteIngestionRequest, '_noop', False),
+    '/docs/update_periodic_ingestion':
+        (UpdatePeriodicIngestionRequest, '_update_periodic_ingestion', False),
+    '/docs/delete_periodic_ingestion':
+        (DeletePeriodicIngestionRequest, '_delete_periodic_ingestion', False),
+    '/feedback/create_or_update':
+        (CreateOrUpdateFeedbackRequest, '_feedback', False),
+}
+
+
+class FakeServer:
+    """
+    Serves the ChatBees API from memory on a local port. Point the client at
+    it with Config.base_url = server.url.
+
+    Uploaded documents are split into pages and indexed with BM25. search()
+    returns the best pages, and ask() answers with the first sentence of the
+    best page. Crawls fetch from `web_pages`, a dict of URL to page text,
+    and crawls and ingestions finish `task_duration` seconds after they are
+    created.
+
+    Latency and failures can be injected to test client behaviour under
+    load. `latency` is the seconds added to every request, or a dict of
+    seconds by path. A `failure_rate` fraction of requests fail with
+    `failure_status`, drawn from a generator seeded with `seed` so runs are
+    repeatable. fail_next() fails an exact number of requests.
+
+    If `api_key` is set, requests must send it, except reads of collections
+    created with public_read.
+    """
+
+    def __init__(
+        self,
+        host: str = '127.0.0.1',
+        port: int = 0,
+        api_key: str = None,
+        latency: Union[float, Dict[str, float]] = 0.0,
+        failure_rate: float = 0.0,
+        failure_status: int = HTTPStatus.INTERNAL_SERVER_ERROR,
+        seed: int = 0,
+        web_pages: Dict[str, str] = None,
+        task_duration: float = 0.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.api_key = api_key
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.failure_status = failure_status
+        self.web_pages = dict(web_pages or {})
+        self.task_duration = task_duration
+        self.feedback: Dict[str, CreateOrUpdateFeedbackRequest] = {}
+        # path -> number of requests received
+        self.requests: Counter = Counter()
+        self._clock = clock
+        self._random = random.Random(seed)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        # (path or None, status) of the requests to fail next
+        self._fail_next: List[Tuple[Optional[str], int]] = []
+        # (namespace, collection name) -> collection
+        self._collections: Dict[Tuple[str, str], _Collection] = {}
+
+        handler = type('Handler', (_Handler,), {'fake': self})
+        self._httpd = ThreadingHTTPServer((host, port), handler)
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self) -> 'FakeServer':
+        """
+        Serves requests from a background thread.
+        """
+        # A short poll interval so stop() returns quickly
+        self._thread = threading.Thread(
+            target=self._httpd.serve_forever, args=(0.05,), daemon=True,
+            name='chatbees-fake-server')
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        self._httpd.serve_forever()
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def fail_next(self, count: int = 1, status: int = 500, path: str = None):
+        """
+        Fails the next `count` requests, or the next requests to `path`,
+        with `status`.
+        """
+        with self._lock:
+            self._fail_next.extend([(path, status)] * count)
+
+    def add_document(self, namespace: str, collection_name: str,
+                     doc_name: str, text: str):
+        """
+        Indexes a document directly, creating the collection if needed, e.g.
+        to preload a corpus.
+        """
+        with self._lock:
+            col = self._collections.setdefault(
+                (namespace, collection_name), _Collection(None, None))
+            self._index_document(col, doc_name, text, DocumentType.FILE)
+
+    def handle(self, path: str, body: bytes, content_type: str,
+               api_key: Optional[str]) -> Tuple[int, bytes]:
+        """
+        Serves one request, returns the status and the JSON body.
+        """
+        with self._lock:
+            self.requests[path] += 1
+            delay = self.latency.get(path, 0.0) \
+                if isinstance(self.latency, dict) else self.latency
+            status = self._injected_failure(path)
+        if delay:
+            time.sleep(delay)
+        if status is not None:
+            return status, _detail('Injected failure')
+
+        route = _ROUTES.get(path)
+        if route is None:
+            return HTTPStatus.NOT_FOUND, _detail(f'Not found: {path}')
+        model, method, read_only = route
+        try:
+            files = {}
+            if content_type.startswith('multipart/form-data'):
+                fields, files = _parse_multipart(body, content_type)
+                req = model.model_validate_json(fields.get('request', b''))
+            else:
+                req = model.model_validate_json(body)
+            with self._lock:
+                self._authorize(req, api_key, read_only)
+                resp = getattr(self, method)(req, **files)
+        except ValidationError as e:
+            return HTTPStatus.UNPROCESSABLE_ENTITY, json.dumps(
+                {'detail': json.loads(e.json())}).encode()
+        except _ApiError as e:
+            return e.status, _detail(e.detail)
+        out = b'{}' if resp is None else resp.model_dump_json().encode()
+        return HTTPStatus.OK, out
+
+    def _injected_failure(self, path: str) -> Optional[int]:
+        # Caller holds self._lock
+        for i, (fail_path, status) in enumerate(self._fail_next):
+            if fail_path is None or fail_path == path:
+                del self._fail_next[i]
+                return status
+        if self.failure_rate and self._random.random() < self.failure_rate:
+            return self.failure_status
+        return None
+
+    def _authorize(self, req: BaseModel, api_key: Optional[str],
+                   read_only: bool):
+        if self.api_key is None or api_key == self.api_key:
+            return
+        if read_only and getattr(req, 'collection_name', None) is not None:
+            col = self._collections.get(
+                (req.namespace_name, req.collection_name))
+            if col is not None and col.public_read:
+                return
+        raise _ApiError(HTTPStatus.UNAUTHORIZED, 'Invalid API key')
+
+    def _collection(self, req) -> _Collection:
+        col = self._collections.get((req.namespace_name, req.collection_name))
+        if col is None:
+            raise _ApiError(HTTPStatus.NOT_FOUND,
+                            f'Collection {req.collection_name} not found')
+        return col
+
+    def _new_id(self) -> str:
+        return f'{next(self._ids):08d}'
+
+    def _index_document(self, col: _Collection, doc_name: str, text: str,
+                        doc_type: DocumentType, url: str = None):
+        col.index.add(doc_name, text)
+        col.documents[doc_name] = DocumentMetadata(
+            name=doc_name, url=url, type=doc_type)
+
+    def _noop(self, req):
+        self._collection(req)
+
+    def _create_collection(self, req: CreateCollectionRequest):
+        key = (req.namespace_name, req.collection_name)
+        if key in self._collections:
+            raise _ApiError(HTTPStatus.CONFLICT,
+                            f'Collection {req.collection_name} already exists')
+        self._collections[key] = _Collection(req.description, req.public_read)
+
+    def _configure_collection(self, req: ConfigureCollectionRequest):
+        col = self._collection(req)
+        if req.description is not None:
+            col.description = req.description
+        if req.public_read is not None:
+            col.public_read = req.public_read
+
+    def _list_collections(self, req: ListCollectionsRequest):
+        return ListCollectionsResponse(names=sorted(
+            name for namespace, name in self._collections
+            if namespace == req.namespace_name))
+
+    def _delete_collection(self, req: DeleteCollectionRequest):
+        self._collection(req)
+        del self._collections[(req.namespace_name, req.collection_name)]
+
+    def _describe_collection(self, req: DescribeCollectionRequest):
+        col = self._collection(req)
+        return DescribeCollectionResponse(
+            description=col.description,
+            chat_attributes=col.chat_attributes,
+            public_read=col.public_read,
+            periodic_ingests=list(col.periodic_ingests.values()) or None)
+
+    def _add_doc(self, req: AddDocRequest, file=None):
+        col = self._collection(req)
+        if file is None:
+            raise _ApiError(HTTPStatus.UNPROCESSABLE_ENTITY, 'Missing file')
+        name, content = file
+        self._index_document(col, name, extract_text(name, content),
+                             DocumentType.FILE)
+
+    def _delete_doc(self, req: DeleteDocRequest):
+        col = self._collection(req)
+        if col.documents.pop(req.doc_name, None) is None:
+            raise _ApiError(HTTPStatus.NOT_FOUND,
+                            f'Document {req.doc_name} not found')
+        col.index.remove(req.doc_name)
+
+    def _list_docs(self, req: ListDocsRequest):
+        col = self._collection(req)
+        return ListDocsResponse(documents=list(col.documents.values()),
+                                doc_names=list(col.documents))
+
+    def _search(self, req: SearchRequest):
+        hits = self._collection(req).index.search(req.question, req.top_k or 10)
+        return SearchResponse(refs=[_reference(hit) for hit in hits])
+
+    def _ask(self, req: AskRequest):
+        col = self._collection(req)
+        if req.doc_name is not None and req.doc_name not in col.documents:
+            raise _ApiError(HTTPStatus.NOT_FOUND,
+                            f'Document {req.doc_name} not found')
+        hits = col.index.search(req.question, req.top_k or 5, req.doc_name)
+        if hits:
+            answer = _first_sentence(hits[0].text)
+        elif col.chat_attributes and col.chat_attributes.negative_response:
+            answer = col.chat_attributes.negative_response
+        else:
+            answer = NO_ANSWER
+        return AskResponse(
+            answer=answer,
+            refs=[_reference(hit) for hit in hits],
+            request_id=self._short_id(),
+            conversation_id=req.conversation_id or self._short_id())
+
+    def _short_id(self) -> str:
+        # Request ids are short UUIDs, e.g. for feedback
+        return shortuuid.encode(uuid.UUID(int=self._random.getrandbits(128)))
+
+    def _document_pages(self, req) -> List[str]:
+        col = self._collection(req)
+        if req.doc_name not in col.documents:
+            raise _ApiError(HTTPStatus.NOT_FOUND,
+                            f'Document {req.doc_name} not found')
+        return col.index.pages(req.doc_name)
+
+    def _summary(self, req: SummaryRequest):
+        words = ' '.join(self._document_pages(req)).split()
+        return SummaryResponse(summary=' '.join(words[:SUMMARY_WORDS]))
+
+    def _outline_faq(self, req: OutlineFAQRequest):
+        pages = self._document_pages(req)
+        return OutlineFAQResponse(
+            outlines=[_first_sentence(page) for page in pages], faqs=[])
+
+    def _configure_chat(self, req: ConfigureChatRequest):
+        self._collection(req).chat_attributes = req.chat_attributes
+
+    def _create_crawl(self, req: CreateCrawlRequest):
+        col = self._collection(req)
+        task = _Task(self._clock() + self.task_duration, req.root_url,
+                     req.max_urls_to_crawl, int(time.time()))
+        urls = sorted(url for url in self.web_pages
+                      if url.startswith(req.root_url))
+        task.pages = {url: self.web_pages[url]
+                      for url in urls[:req.max_urls_to_crawl]}
+        crawl_id = self._new_id()
+        col.crawls[crawl_id] = task
+        return CreateCrawlResponse(crawl_id=crawl_id)
+
+    def _crawl(self, req) -> _Task:
+        task = self._collection(req).crawls.get(req.crawl_id)
+        if task is None:
+            raise _ApiError(HTTPStatus.NOT_FOUND,
+                            f'Crawl {req.crawl_id} not found')
+        return task
+
+    def _get_crawl(self, req: GetCrawlRequest):
+        task = self._crawl(req)
+        resp = GetCrawlResponse(
+            root_url=task.root_url, created_on=task.created_on,
+            max_pages=task.max_pages, crawl_status=IngestionStatus.RUNNING)
+        if self._clock() < task.done_at:
+            return resp
+        if task.pages:
+            resp.crawl_status = IngestionStatus.SUCCEEDED
+            resp.crawl_result = {url: PageStats(char_count=len(text))
+                                 for url, text in task.pages.items()}
+        else:
+            resp.crawl_status = IngestionStatus.FAILED
+            resp.crawl_result = {task.root_url: PageStats(
+                char_count=0, error_code='404', error_msg='Not Found')}
+        return resp
+
+    def _index_crawl(self, req: IndexCrawlRequest):
+        col = self._collection(req)
+        for url, text in self._crawl(req).pages.items():
+            self._index_document(col, url, text, DocumentType.WEBSITE, url)
+
+    def _delete_crawl(self, req: DeleteCrawlRequest):
+        col = self._collection(req)
+        for name, doc in list(col.documents.items()):
+            if doc.type == DocumentType.WEBSITE and \
+                    name.startswith(req.root_url):
+                del col.documents[name]
+                col.index.remove(name)
+
+    def _create_ingestion(self, req: CreateIngestionRequest):
+        col = self._collection(req)
+        ingestion_id = self._new_id()
+        col.ingestions[ingestion_id] = _Task(
+            self._clock() + self.task_duration)
+        return CreateIngestionResponse(ingestion_id=ingestion_id)
+
+    def _get_ingestion(self, req: GetIngestionRequest):
+        task = self._collection(req).ingestions.get(req.ingestion_id)
+        if task is None:
+            raise _ApiError(HTTPStatus.NOT_FOUND,
+                            f'Ingestion {req.ingestion_id} not found')
+        status = IngestionStatus.RUNNING if self._clock() < task.done_at \
+            else IngestionStatus.SUCCEEDED
+        return GetIngestionResponse(ingestion_status=status)
+
+    def _update_periodic_ingestion(self, req: UpdatePeriodicIngestionRequest):
+        self._collection(req).periodic_ingests[req.type.value] = PeriodicIngest(
+            type=req.type, spec=req.spec, last_ingest_time=int(time.time()),
+            last_ingest_status=IngestionStatus.SUCCEEDED)
+
+    def _delete_periodic_ingestion(self, req: DeletePeriodicIngestionRequest):
+        self._collection(req).periodic_ingests.pop(req.type.value, None)
+
+    def _feedback(self, req: CreateOrUpdateFeedbackRequest):
+        self._collection(req)
+        self.feedback[req.request_id] = req
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # The headers and the body are written separately
+    disable_nagle_algorithm = True
+    fake: FakeServer = None
+
+    def log_message(self, *args):
+        pass
+
+    def do_HEAD(self):
+        # Connection warm-up
+        self.send_response(HTTPStatus.OK)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        encoding = self.headers.get('Content-Encoding')
+        if encoding == GZIP:
+            body = gzip.decompress(body)
+        elif encoding == ZSTD and zstd is not None:
+            body = zstd.decompress(body)
+        status, out = self.fake.handle(
+            self.path, body, self.headers.get('Content-Type', ''),
+            self.headers.get('api-key'))
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(out)))
+        self.end_headers()
+        self.wfile.write(out)
+
+
+def _detail(detail: str) -> bytes:
+    return json.dumps({'detail': detail}).encode()
+
+
+def _reference(hit: Hit) -> AnswerReference:
+    return AnswerReference(doc_name=hit.doc_name, page_num=hit.page_num,
+                           sample_text=hit.text[:500])
+
+
+def _first_sentence(text: str) -> str:
+    text = ' '.join(text.split())
+    end = text.find('. ')
+    return text if end < 0 else text[:end + 1]
+
+
+def _parse_multipart(
+    body: bytes, content_type: str,
+) -> Tuple[Dict[str, bytes], Dict[str, Tuple[str, bytes]]]:
+    """
+    Splits a multipart/form-data body into its fields and its files, by
+    form field name.
+    """
+    message = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(
+        b'Content-Type: ' + content_type.encode('latin-1') + b'\r\n\r\n' + body)
+    fields, files = {}, {}
+    for part in message.iter_parts():
+        name = part.get_param('name', header='content-disposition')
+        payload = part.get_payload(decode=True) or b''
+        filename = part.get_filename()
+        if filename is None:
+            fields[name] = payload
+        else:
+            files[name] = (filename, payload)
+    return fields, files
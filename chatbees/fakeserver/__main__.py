@@ -0,0 +1,76 @@
+"""
+Runs an in-memory stand-in for the ChatBees service. Point the client or
+the load generator at the printed URL, e.g.
+
+    python -m chatbees.fakeserver --port 8080 --docs ./corpus \\
+        --namespace public --collection docs --latency 0.05
+    python -m chatbees.loadtest --base-url http://127.0.0.1:8080 \\
+        --collection docs --questions q.txt
+"""
+import argparse
+import json
+import os
+import sys
+
+from chatbees.fakeserver import FakeServer
+from chatbees.fakeserver.index import extract_text
+from chatbees.utils.config import Config
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m chatbees.fakeserver',
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=0,
+                        help='0 picks a free port')
+    parser.add_argument('--api-key',
+                        help='Require this API key, any key if not set')
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='Seconds added to every request')
+    parser.add_argument('--latency-by-path',
+                        help='JSON object of seconds by path, e.g. '
+                             '\'{"/docs/ask": 0.5}\', overrides --latency')
+    parser.add_argument('--failure-rate', type=float, default=0.0,
+                        help='Fraction of requests that fail')
+    parser.add_argument('--failure-status', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--task-duration', type=float, default=0.0,
+                        help='Seconds until crawls and ingestions finish')
+    parser.add_argument('--docs',
+                        help='Preload the files of this directory into '
+                             '--collection')
+    parser.add_argument('--namespace', default=Config.PUBLIC_NAMESPACE)
+    parser.add_argument('--collection')
+    args = parser.parse_args(argv)
+
+    latency = args.latency
+    if args.latency_by_path:
+        latency = json.loads(args.latency_by_path)
+    server = FakeServer(
+        host=args.host, port=args.port, api_key=args.api_key,
+        latency=latency, failure_rate=args.failure_rate,
+        failure_status=args.failure_status, seed=args.seed,
+        task_duration=args.task_duration)
+    if args.docs:
+        if not args.collection:
+            parser.error('--docs requires --collection')
+        for name in sorted(os.listdir(args.docs)):
+            path = os.path.join(args.docs, name)
+            if os.path.isfile(path):
+                with open(path, 'rb') as f:
+                    server.add_document(args.namespace, args.collection,
+                                        name, extract_text(name, f.read()))
+
+    # The first line is the URL, for parent processes to read
+    print(server.url, flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,124 @@
+import math
+import re
+from collections import Counter, defaultdict
+from typing import Dict, List, NamedTuple, Tuple
+
+__all__ = ["Bm25Index", "Hit"]
+
+_TOKEN = re.compile(r"\w+")
+_TAG = re.compile(r"<[^>]*>")
+
+# Characters per page of documents without page breaks
+PAGE_CHARS = 2000
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN.findall(text.lower())
+
+
+def split_pages(text: str) -> List[str]:
+    """
+    Splits a document at form feeds, or into PAGE_CHARS pages at whitespace
+    if it has none.
+    """
+    if '\f' in text:
+        return [page for page in text.split('\f') if page.strip()]
+    pages = []
+    while len(text) > PAGE_CHARS:
+        cut = text.rfind(' ', 0, PAGE_CHARS)
+        if cut <= 0:
+            cut = PAGE_CHARS
+        pages.append(text[:cut])
+        text = text[cut:].lstrip()
+    if text.strip():
+        pages.append(text)
+    return pages
+
+
+def extract_text(name: str, content: bytes) -> str:
+    text = content.decode('utf-8', errors='replace')
+    if name.lower().endswith(('.html', '.htm')):
+        text = _TAG.sub(' ', text)
+    return text
+
+
+class Hit(NamedTuple):
+    doc_name: str
+    page_num: int
+    text: str
+    score: float
+
+
+class Bm25Index:
+    """
+    An in-memory inverted index over the pages of documents, ranked with
+    Okapi BM25. Not thread-safe, callers serialize access.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        # (doc_name, page_num) -> (text, token count)
+        self._pages: Dict[Tuple[str, int], Tuple[str, int]] = {}
+        # term -> {(doc_name, page_num): term frequency}
+        self._postings: Dict[str, Dict[Tuple[str, int], int]] = \
+            defaultdict(dict)
+        self._total_tokens = 0
+
+    def __len__(self) -> int:
+        return len(self._pages)
+
+    def add(self, doc_name: str, text: str):
+        """
+        Indexes a document, replacing a document with the same name.
+        """
+        self.remove(doc_name)
+        for page_num, page in enumerate(split_pages(text), start=1):
+            key = (doc_name, page_num)
+            tokens = tokenize(page)
+            self._pages[key] = (page, len(tokens))
+            self._total_tokens += len(tokens)
+            for term, tf in Counter(tokens).items():
+                self._postings[term][key] = tf
+
+    def remove(self, doc_name: str):
+        keys = [key for key in self._pages if key[0] == doc_name]
+        if not keys:
+            return
+        for key in keys:
+            page, length = self._pages.pop(key)
+            self._total_tokens -= length
+            for term in set(tokenize(page)):
+                postings = self._postings[term]
+                postings.pop(key, None)
+                if not postings:
+                    del self._postings[term]
+
+    def pages(self, doc_name: str) -> List[str]:
+        return [text for (name, _), (text, _) in sorted(self._pages.items())
+                if name == doc_name]
+
+    def search(self, query: str, top_k: int = 5, doc_name: str = None) -> List[Hit]:
+        """
+        The top_k pages by BM25 score, ties broken by document name and page
+        number so results are deterministic.
+        """
+        n = len(self._pages)
+        if n == 0:
+            return []
+        avg_len = self._total_tokens / n
+        scores: Dict[Tuple[str, int], float] = defaultdict(float)
+        for term in set(tokenize(query)):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            for key, tf in postings.items():
+                if doc_name is not None and key[0] != doc_name:
+                    continue
+                length = self._pages[key][1]
+                norm = self.k1 * (1 - self.b + self.b * length / avg_len)
+                scores[key] += idf * tf * (self.k1 + 1) / (tf + norm)
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return [Hit(key[0], key[1], self._pages[key][0], score)
+                for key, score in ranked[:top_k]]
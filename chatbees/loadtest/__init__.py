@@ -0,0 +1,196 @@
+"""
+Load generation for sizing ChatBees deployments. See `python -m
+chatbees.loadtest --help`.
+"""
+import asyncio
+import itertools
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List
+
+from chatbees.client_models.collection import Collection
+from chatbees.loadtest.histogram import LatencyHistogram
+from chatbees.utils import exceptions
+
+__all__ = [
+    "LatencyHistogram",
+    "LoadTestReport",
+    "run_open_loop",
+    "run_closed_loop",
+]
+
+
+class LoadTestReport:
+    """
+    Latencies, errors and throughput of a load test run.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.latency = LatencyHistogram()
+        self.errors: Counter = Counter()
+        self.elapsed = 0.0
+
+    @property
+    def requests(self) -> int:
+        return self.latency.count + sum(self.errors.values())
+
+    @property
+    def throughput(self) -> float:
+        """
+        Successful requests per second.
+        """
+        return self.latency.count / self.elapsed if self.elapsed > 0 else 0.0
+
+    def record_error(self, error: BaseException):
+        name = type(error).__name__
+        if getattr(exceptions, name, None) is not type(error):
+            # Not a ChatBees API error, e.g. a connection error
+            name = f"{type(error).__module__}.{name}"
+        self.errors[name] += 1
+
+    def to_dict(self) -> Dict:
+        return {
+            "name": self.name,
+            "elapsed_s": round(self.elapsed, 3),
+            "requests": self.requests,
+            "succeeded": self.latency.count,
+            "throughput_rps": round(self.throughput, 3),
+            "latency_ms": {
+                "min": (self.latency.min_us or 0) / 1000,
+                "mean": round(self.latency.mean() * 1000, 3),
+                **{f"p{p:g}": round(v * 1000, 3)
+                   for p, v in self.latency.percentiles()},
+                "max": self.latency.max_us / 1000,
+            },
+            "errors": dict(self.errors),
+        }
+
+    def format(self) -> str:
+        d = self.to_dict()
+        lines = [
+            f"{self.name}: {d['requests']} requests in {d['elapsed_s']}s, "
+            f"{d['succeeded']} succeeded, {d['throughput_rps']} req/s",
+            "latency ms: " + "  ".join(
+                f"{k}={v}" for k, v in d["latency_ms"].items()),
+        ]
+        if self.errors:
+            lines.append("errors:")
+            lines.extend(f"  {name}: {count}"
+                         for name, count in self.errors.most_common())
+        return "\n".join(lines)
+
+
+def _question_op(
+    collection_name: str, op: str, top_k: int,
+) -> Callable[[str], object]:
+    col = Collection(name=collection_name)
+    if op == "ask":
+        return lambda q: col.ask(q, top_k)
+    if op == "search":
+        return lambda q: col.search(q, top_k)
+    raise ValueError(f"Unsupported op {op}")
+
+
+def run_open_loop(
+    collection_name: str,
+    questions: List[str],
+    rate: float,
+    duration: float,
+    op: str = "ask",
+    top_k: int = 5,
+    max_in_flight: int = 256,
+) -> LoadTestReport:
+    """
+    Sends `rate` requests per second for `duration` seconds regardless of how
+    fast the service answers. Latency is measured from the scheduled send
+    time, so queueing behind `max_in_flight` outstanding requests counts
+    against the service instead of hiding it (no coordinated omission).
+    """
+    if rate <= 0:
+        raise ValueError("rate must be positive")
+    call = _question_op(collection_name, op, top_k)
+    report = LoadTestReport(f"open-loop {op} @ {rate:g} req/s")
+
+    async def timed(loop, executor, question: str, scheduled: float):
+        try:
+            await loop.run_in_executor(executor, call, question)
+        except Exception as e:
+            report.record_error(e)
+        else:
+            report.latency.record(time.monotonic() - scheduled)
+
+    async def main():
+        loop = asyncio.get_running_loop()
+        with ThreadPoolExecutor(max_in_flight,
+                                thread_name_prefix="chatbees-loadtest") as executor:
+            start = time.monotonic()
+            tasks = []
+            for i, question in enumerate(itertools.cycle(questions)):
+                if i / rate >= duration:
+                    break
+                scheduled = start + i / rate
+                delay = scheduled - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                tasks.append(asyncio.ensure_future(
+                    timed(loop, executor, question, scheduled)))
+            await asyncio.gather(*tasks)
+            report.elapsed = time.monotonic() - start
+
+    asyncio.run(main())
+    return report
+
+
+def run_closed_loop(
+    collection_name: str,
+    questions: List[str],
+    users: int,
+    duration: float,
+    turns: int = 3,
+    top_k: int = 5,
+    think_time: float = 0,
+) -> LoadTestReport:
+    """
+    Runs `users` virtual users for `duration` seconds. Every user holds a
+    multi-turn Chat of `turns` questions, then starts a new chat, and waits
+    `think_time` seconds between answers.
+    """
+    if users < 1:
+        raise ValueError("users must be at least 1")
+    report = LoadTestReport(f"closed-loop chat x {users} users")
+    col = Collection(name=collection_name)
+
+    async def user(loop, executor, index: int, deadline: float):
+        questions_iter = itertools.cycle(questions[index % len(questions):] +
+                                         questions[:index % len(questions)])
+        while time.monotonic() < deadline:
+            chat = col.chat()
+            for _ in range(turns):
+                if time.monotonic() >= deadline:
+                    return
+                start = time.monotonic()
+                try:
+                    await loop.run_in_executor(
+                        executor, chat.ask, next(questions_iter), top_k)
+                except Exception as e:
+                    report.record_error(e)
+                    # The conversation state is unknown, start over
+                    break
+                else:
+                    report.latency.record(time.monotonic() - start)
+                if think_time > 0:
+                    await asyncio.sleep(think_time)
+
+    async def main():
+        loop = asyncio.get_running_loop()
+        with ThreadPoolExecutor(users,
+                                thread_name_prefix="chatbees-loadtest") as executor:
+            start = time.monotonic()
+            await asyncio.gather(*[
+                user(loop, executor, i, start + duration) for i in range(users)])
+            report.elapsed = time.monotonic() - start
+
+    asyncio.run(main())
+    return report
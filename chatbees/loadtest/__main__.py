@@ -0,0 +1,87 @@
+"""
+Drives Collection.ask/search at a controlled rate and reports latency
+percentiles, errors and throughput.
+
+Open loop, a fixed arrival rate:
+    python -m chatbees.loadtest --collection docs --questions q.txt \\
+        --mode open --rate 20 --duration 60
+
+Closed loop, N virtual users holding multi-turn chats:
+    python -m chatbees.loadtest --collection docs --questions q.txt \\
+        --mode closed --users 16 --turns 3 --duration 60
+"""
+import argparse
+import json
+import os
+import sys
+
+import chatbees as cb
+from chatbees.loadtest import run_closed_loop, run_open_loop
+from chatbees.utils.config import Config
+
+
+def _read_questions(path: str):
+    with open(path, encoding='utf-8') as f:
+        questions = [line.strip() for line in f if line.strip()]
+    if not questions:
+        raise ValueError(f"No questions in {path}")
+    return questions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m chatbees.loadtest',
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--api-key', default=os.environ.get('CHATBEES_API_KEY'))
+    parser.add_argument('--account-id',
+                        default=os.environ.get('CHATBEES_ACCOUNT_ID', 'loadtest'))
+    parser.add_argument('--namespace', default=Config.PUBLIC_NAMESPACE)
+    parser.add_argument('--base-url',
+                        help='Target a local stand-in server, e.g. '
+                             'http://127.0.0.1:8080')
+    parser.add_argument('--collection', required=True)
+    parser.add_argument('--questions', required=True,
+                        help='A file with one question per line')
+    parser.add_argument('--mode', choices=['open', 'closed'], default='open')
+    parser.add_argument('--op', choices=['ask', 'search'], default='ask',
+                        help='Open loop only, closed loop always chats')
+    parser.add_argument('--rate', type=float, default=10,
+                        help='Open loop requests per second')
+    parser.add_argument('--max-in-flight', type=int, default=256,
+                        help='Open loop max outstanding requests')
+    parser.add_argument('--users', type=int, default=8,
+                        help='Closed loop virtual users')
+    parser.add_argument('--turns', type=int, default=3,
+                        help='Closed loop questions per chat')
+    parser.add_argument('--think-time', type=float, default=0)
+    parser.add_argument('--duration', type=float, default=30)
+    parser.add_argument('--top-k', type=int, default=5)
+    parser.add_argument('--json', action='store_true',
+                        help='Print the report as JSON')
+    args = parser.parse_args(argv)
+
+    cb.init(api_key=args.api_key, account_id=args.account_id,
+            namespace=args.namespace)
+    if args.base_url:
+        Config.base_url = args.base_url.rstrip('/')
+    questions = _read_questions(args.questions)
+
+    if args.mode == 'open':
+        report = run_open_loop(
+            args.collection, questions, args.rate, args.duration, op=args.op,
+            top_k=args.top_k, max_in_flight=args.max_in_flight)
+    else:
+        report = run_closed_loop(
+            args.collection, questions, args.users, args.duration,
+            turns=args.turns, top_k=args.top_k, think_time=args.think_time)
+
+    if args.json:
+        print(json.dumps(report.to_dict(), indent=2))
+    else:
+        print(report.format())
+    return 0 if not report.errors else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,73 @@
+from typing import Dict, Iterable, List, Tuple
+
+__all__ = ["LatencyHistogram"]
+
+
+class LatencyHistogram:
+    """
+    An HDR-style latency histogram. Latencies are recorded in microseconds
+    into log-linear buckets: every power of two is split into
+    2 ** (precision_bits - 1) linear buckets, so any recorded value is
+    reported within 2 ** -(precision_bits - 1) of its true value (<1% by
+    default) at a fixed memory cost regardless of the number of samples.
+    """
+
+    def __init__(self, precision_bits: int = 8):
+        self.precision_bits = precision_bits
+        self.count = 0
+        self.min_us = None
+        self.max_us = 0
+        self.total_us = 0
+        # (shift, value >> shift) -> count
+        self._counts: Dict[Tuple[int, int], int] = {}
+
+    def record(self, seconds: float):
+        value = max(0, int(seconds * 1_000_000))
+        shift = max(0, value.bit_length() - self.precision_bits)
+        key = (shift, value >> shift)
+        self._counts[key] = self._counts.get(key, 0) + 1
+        self.count += 1
+        self.total_us += value
+        self.max_us = max(self.max_us, value)
+        self.min_us = value if self.min_us is None else min(self.min_us, value)
+
+    def merge(self, other: 'LatencyHistogram'):
+        for key, count in other._counts.items():
+            self._counts[key] = self._counts.get(key, 0) + count
+        self.count += other.count
+        self.total_us += other.total_us
+        self.max_us = max(self.max_us, other.max_us)
+        if other.min_us is not None:
+            self.min_us = other.min_us if self.min_us is None else \
+                min(self.min_us, other.min_us)
+
+    def percentile(self, p: float) -> float:
+        """
+        Returns the latency in seconds below which p percent of the samples
+        fall.
+        """
+        if self.count == 0:
+            return 0.0
+        rank = max(1, round(p / 100 * self.count))
+        seen = 0
+        for value, count in self._buckets():
+            seen += count
+            if seen >= rank:
+                return min(value, self.max_us) / 1_000_000
+        return self.max_us / 1_000_000
+
+    def mean(self) -> float:
+        return self.total_us / self.count / 1_000_000 if self.count else 0.0
+
+    def percentiles(
+        self, ps: Iterable[float] = (50, 90, 99, 99.9),
+    ) -> List[Tuple[float, float]]:
+        return [(p, self.percentile(p)) for p in ps]
+
+    def _buckets(self) -> List[Tuple[int, int]]:
+        """
+        Returns (highest value in the bucket, count) in increasing order.
+        """
+        return sorted(
+            (((sub + 1) << shift) - 1, count)
+            for (shift, sub), count in self._counts.items())
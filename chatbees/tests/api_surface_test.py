@@ -14,6 +14,7 @@ from chatbees.server_models.doc_api import (
     SummaryResponse,
     ListDocsResponse,
 )
+from chatbees.server_models.search_api import SearchResponse
 from chatbees.server_models.ingestion_api import (
     CreateIngestionResponse,
 )
@@ -144,6 +145,36 @@ class APISurfaceTest(unittest.TestCase):
         assert resp.answer == '42'
         assert resp.request_id == 'id2'
 
+    @requests_mock.mock()
+    def test_search_and_ask_fast(self, mock):
+        refs = [AnswerReference(doc_name="doc", page_num=1, sample_text="text")]
+        mock.register_uri(
+            'POST',
+            f'{APISurfaceTest.API_ENDPOINT}/docs/search',
+            request_headers={'api-key': 'fakeapikey'},
+            text=SearchResponse(refs=refs).model_dump_json(),
+        )
+        mock.register_uri(
+            'POST',
+            f'{APISurfaceTest.API_ENDPOINT}/docs/ask',
+            request_headers={'api-key': 'fakeapikey'},
+            text=AskResponse(
+                answer='42', refs=refs, request_id='id1', conversation_id='c1',
+            ).model_dump_json(),
+        )
+        col = cb.collection('fakename')
+
+        records = col.search_fast("what is the meaning of life?", 3)
+        assert records == [cb.SearchRecord("doc", 1, "text")]
+        assert mock.last_request.json()['top_k'] == 3
+        assert records[0].to_model() == col.search("what is the meaning of life?")[0]
+
+        record = col.ask_fast("what is the meaning of life?", doc_name="doc")
+        assert record.answer == '42'
+        assert record.refs == (cb.SearchRecord("doc", 1, "text"),)
+        assert mock.last_request.json()['doc_name'] == 'doc'
+        assert record.to_model() == col.ask("what is the meaning of life?")
+
         @requests_mock.mock()
         def test_api_key_required(self, mock):
             # require API key for all APIs
@@ -373,3 +404,190 @@ class APISurfaceTest(unittest.TestCase):
 
         cb.collection('fakename').create_or_update_feedback(
             'id', True, 'text feedback')
+
+    @requests_mock.mock()
+    def test_request_compression(self, mock):
+        import gzip
+        from chatbees.server_models.search_api import SearchResponse
+
+        question = 'what is the meaning of life?' * 100
+
+        def match_compressed(request):
+            body = gzip.decompress(request.body)
+            return (request.headers.get('Content-Encoding') == 'gzip'
+                    and question in body.decode('utf-8'))
+
+        mock.register_uri(
+            'POST',
+            f'{APISurfaceTest.API_ENDPOINT}/docs/search',
+            additional_matcher=match_compressed,
+            text=SearchResponse(refs=[]).model_dump_json(),
+        )
+
+        cb.configure_compression('gzip', min_size=1024)
+        try:
+            assert cb.collection('fakename').search(question) == []
+        finally:
+            cb.configure_compression(None)
+
+        # small bodies are sent uncompressed
+        mock.register_uri(
+            'POST',
+            f'{APISurfaceTest.API_ENDPOINT}/docs/search',
+            additional_matcher=lambda r: 'Content-Encoding' not in r.headers,
+            text=SearchResponse(refs=[]).model_dump_json(),
+        )
+        assert cb.collection('fakename').search('short') == []
+
+    @requests_mock.mock()
+    def test_search_collections(self, mock):
+        from chatbees.server_models.search_api import SearchResponse
+
+        def refs(prefix, n):
+            return SearchResponse(refs=[
+                AnswerReference(doc_name=f'{prefix}{i}', page_num=i, sample_text='')
+                for i in range(n)
+            ]).model_dump_json()
+
+        def search_response(request, context):
+            name = request.json()['collection_name']
+            if name == 'broken':
+                context.status_code = 500
+                return '{"detail": "boom"}'
+            return refs(name, 3)
+
+        mock.register_uri(
+            'POST',
+            f'{APISurfaceTest.API_ENDPOINT}/docs/search',
+            text=search_response,
+        )
+
+        resp = cb.search_collections(['a', 'b', 'broken'], 'question', top_k=4)
+        assert [(r.collection_name, r.doc_name) for r in resp.refs] == [
+            ('a', 'a0'), ('b', 'b0'), ('a', 'a1'), ('b', 'b1')]
+        assert resp.refs[0].score > resp.refs[2].score
+        assert list(resp.failed_collections) == ['broken']
+
+    @requests_mock.mock()
+    def test_bulk_collections(self, mock):
+        import tempfile
+
+        existing = {'a', 'b'}
+
+        def handle(request, context):
+            name = request.json()['collection_name']
+            op = request.path.rsplit('/', 1)[-1]
+            if op == 'create':
+                if name in existing:
+                    context.status_code = 409
+                    return '{"detail": "exists"}'
+                existing.add(name)
+            elif name not in existing:
+                context.status_code = 404
+                return '{"detail": "not found"}'
+            elif op == 'delete':
+                existing.remove(name)
+            elif op == 'describe':
+                return DescribeCollectionResponse(
+                    description=name).model_dump_json()
+            return '{}'
+
+        for op in ['create', 'configure', 'delete', 'describe']:
+            mock.register_uri(
+                'POST', f'{APISurfaceTest.API_ENDPOINT}/collections/{op}',
+                text=handle)
+
+        out = cb.create_collections(
+            [cb.collection('b'), cb.collection('c')], max_concurrency=2)
+        assert list(out) == ['b', 'c']
+        assert isinstance(out['b'].error, cb.CollectionAlreadyExists)
+        assert out['c'].ok and out['c'].value.name == 'c'
+
+        out = cb.describe_collections(['c', 'x', 'a'])
+        assert list(out) == ['c', 'x', 'a']
+        assert out['a'].value.description == 'a'
+        assert isinstance(out['x'].error, cb.CollectionNotFound)
+
+        out = cb.configure_collections(['a', 'x'], public_read=True)
+        assert out['a'].ok and not out['x'].ok
+        assert mock.last_request.json()['public_read'] is True
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            journal = f'{tmpdir}/delete.journal'
+            out = cb.delete_collections(['a', 'x'], journal=journal)
+            assert out['a'].ok
+            assert isinstance(out['x'].error, cb.CollectionNotFound)
+
+            # Resuming skips the deleted collection and retries the failure
+            calls = mock.call_count
+            out = cb.delete_collections(['a', 'b', 'x'], journal=journal)
+            assert out['a'].ok and out['b'].ok and not out['x'].ok
+            assert mock.call_count == calls + 2
+            assert existing == {'c'}
+
+    @requests_mock.mock()
+    def test_extract_bulk(self, mock):
+        import io
+        from chatbees.server_models.doc_api import (
+            ExtractRelevantTextsResponse, ExtractType, ExtractedTable,
+        )
+
+        table = ExtractedTable(columns=['a'], rows=[[1]]).model_dump_json()
+
+        def extract_response(request, context):
+            req = request.json()
+            if req['doc_name'] == 'missing':
+                context.status_code = 404
+                return '{"detail": "not found"}'
+            texts = table if req['extract_type'] == 'EXTRACT_TABLE' else req['doc_name']
+            return ExtractRelevantTextsResponse(relevant_texts=texts).model_dump_json()
+
+        mock.register_uri(
+            'POST',
+            f'{APISurfaceTest.API_ENDPOINT}/docs/extract_relevant_texts',
+            text=extract_response,
+        )
+
+        queries = [(ExtractType.QUESTION, 'issuer?'),
+                   (ExtractType.EXTRACT_TABLE, 'securities')]
+        out = io.StringIO()
+        with cb.CsvExtractionSink(out) as sink:
+            results = list(cb.collection('fakename').extract_bulk(
+                iter(['doc1', 'doc2', 'missing']), queries, max_concurrency=2))
+            sink.write_all(results)
+
+        assert len(results) == 6
+        by_key = {(r.doc_name, r.extract_type): r for r in results}
+        assert by_key[('doc1', ExtractType.QUESTION)].relevant_texts == 'doc1'
+        assert by_key[('doc2', ExtractType.EXTRACT_TABLE)].table().rows == [[1]]
+        assert by_key[('missing', ExtractType.QUESTION)].error is not None
+        assert len(out.getvalue().strip().splitlines()) == 7
+
+    def test_parquet_extraction_sink(self):
+        import tempfile
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            self.skipTest("pyarrow is not installed")
+        from chatbees.client_models.extraction import COLUMNS
+        from chatbees.server_models.doc_api import ExtractType
+
+        results = [
+            cb.ExtractionResult(
+                doc_name=f'doc{i}', extract_type=ExtractType.QUESTION,
+                input_texts='issuer?', relevant_texts=f'answer{i}')
+            for i in range(5)
+        ] + [cb.ExtractionResult(
+            doc_name='missing', extract_type=ExtractType.EXTRACT_TABLE,
+            input_texts='securities', error='CollectionNotFound()')]
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = f'{tmpdir}/results.parquet'
+            # Row groups of 2 results, the last one written on close
+            with cb.ParquetExtractionSink(path, batch_size=2) as sink:
+                assert sink.write_all(results) == 6
+            parquet = pq.ParquetFile(path)
+            assert parquet.metadata.num_row_groups == 3
+            rows = parquet.read().to_pylist()
+        assert rows == [dict(zip(COLUMNS, r.row())) for r in results]
+        assert rows[-1]['relevant_texts'] is None
+        assert rows[-1]['extract_type'] == 'EXTRACT_TABLE'
@@ -0,0 +1,361 @@
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import unittest
+
+import requests_mock
+
+import chatbees as cb
+from chatbees.server_models.collection_api import (
+    ListCollectionsResponse, DescribeCollectionResponse,
+)
+from chatbees.server_models.doc_api import (
+    AnswerReference, AskResponse, FAQ, OutlineFAQResponse, SummaryResponse,
+)
+from chatbees.server_models.search_api import SearchResponse
+from chatbees.utils.cache import TTLCache
+from chatbees.utils.disk_cache import DiskCache
+from chatbees.utils.config import Config
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TTLCacheTest(unittest.TestCase):
+    def test_expire(self):
+        clock = FakeClock()
+        cache = TTLCache(ttl=10, clock=clock)
+        cache.put('k', 'v')
+        assert cache.get('k') == 'v'
+        clock.now = 11
+        assert cache.get('k') is None
+
+    def test_lru_eviction(self):
+        cache = TTLCache(ttl=10, max_size=2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        cache.get('a')
+        cache.put('c', 3)
+        assert cache.get('a') == 1
+        assert cache.get('b') is None
+        assert cache.get('c') == 3
+
+    def test_stale_while_refresh(self):
+        clock = FakeClock()
+        cache = TTLCache(ttl=10, stale_ttl=10, clock=clock)
+        assert cache.get_or_load('k', lambda: 'v1') == 'v1'
+
+        refreshed = threading.Event()
+
+        def reload():
+            refreshed.set()
+            return 'v2'
+
+        clock.now = 15
+        # the stale value is returned without blocking on the loader
+        assert cache.get_or_load('k', reload) == 'v1'
+        assert refreshed.wait(5)
+        for _ in range(100):
+            if cache.get('k') == 'v2':
+                break
+            threading.Event().wait(0.01)
+        assert cache.get('k') == 'v2'
+
+        # beyond ttl + stale_ttl the loader is called inline
+        clock.now = 100
+        assert cache.get_or_load('k', lambda: 'v3') == 'v3'
+
+
+    def test_invalidate_during_refresh(self):
+        clock = FakeClock()
+        cache = TTLCache(ttl=10, stale_ttl=10, clock=clock)
+        cache.put('k', 'old')
+        started = threading.Event()
+        release = threading.Event()
+
+        def reload():
+            started.set()
+            release.wait(5)
+            return 'loaded before the invalidation'
+
+        clock.now = 15
+        assert cache.get_or_load('k', reload) == 'old'
+        assert started.wait(5)
+        cache.invalidate('k')
+        release.set()
+        for _ in range(100):
+            if not cache._refreshing:
+                break
+            threading.Event().wait(0.01)
+        # The refresh that started before the invalidation is dropped
+        assert cache.get('k') is None
+        assert cache.get_or_load('k', lambda: 'new') == 'new'
+        assert cache._loading == {}
+
+
+class MetadataCacheTest(unittest.TestCase):
+    def setUp(self):
+        cb.init(api_key='fakeapikey', account_id='fakeaccountid',
+                namespace='fakenamespace')
+        cb.configure_metadata_cache(ttl=60)
+        self.endpoint = Config.get_base_url()
+
+    def tearDown(self):
+        cb.configure_metadata_cache(ttl=0)
+
+    @requests_mock.mock()
+    def test_describe_cached_and_invalidated(self, mock):
+        describe = mock.register_uri(
+            'POST',
+            f'{self.endpoint}/collections/describe',
+            text=DescribeCollectionResponse(public_read=True).model_dump_json(),
+        )
+        mock.register_uri('POST', f'{self.endpoint}/collections/configure')
+        mock.register_uri('POST', f'{self.endpoint}/docs/configure_chat')
+
+        col = cb.describe_collection('fakename')
+        assert col.public_read
+        cb.describe_collection('fakename')
+        assert describe.call_count == 1
+
+        cb.configure_collection('fakename', public_read=False)
+        cb.describe_collection('fakename')
+        assert describe.call_count == 2
+
+        col.configure_chat('persona')
+        cb.describe_collection('fakename')
+        assert describe.call_count == 3
+
+    @requests_mock.mock()
+    def test_list_cached_and_invalidated(self, mock):
+        lst = mock.register_uri(
+            'POST',
+            f'{self.endpoint}/collections/list',
+            text=ListCollectionsResponse(names=['a']).model_dump_json(),
+        )
+        mock.register_uri('POST', f'{self.endpoint}/collections/create')
+        mock.register_uri('POST', f'{self.endpoint}/collections/delete')
+
+        assert cb.list_collections() == ['a']
+        assert cb.list_collections() == ['a']
+        assert lst.call_count == 1
+
+        cb.create_collection(cb.Collection(name='b'))
+        cb.list_collections()
+        assert lst.call_count == 2
+
+        cb.delete_collection('b')
+        cb.list_collections()
+        assert lst.call_count == 3
+
+
+class DiskCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, 'cache.db')
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_shared_between_instances(self):
+        DiskCache(self.path).put('k', b'v', tag='t')
+        other = DiskCache(self.path)
+        assert other.get('k') == b'v'
+        other.delete_tag('t')
+        assert DiskCache(self.path).get('k') is None
+
+    def test_generation(self):
+        cache = DiskCache(self.path)
+        assert cache.generation('doc') == 0
+        assert cache.bump_generation('doc') == 1
+        assert DiskCache(self.path).generation('doc') == 1
+
+    def test_evict_least_recently_used(self):
+        cache = DiskCache(self.path, max_bytes=250, access_resolution=0)
+        cache.put('a', b'a' * 100)
+        cache.put('b', b'b' * 100)
+        cache.get('a')
+        cache.put('c', b'c' * 100)
+        assert cache.get('a') is not None
+        assert cache.get('b') is None
+        assert cache.size() == 200
+
+        # The size is kept up to date without scanning the entries
+        cache.put('a', b'a' * 50, tag='t')
+        assert cache.size() == 150
+        cache.delete_tag('t')
+        cache.delete('missing')
+        assert DiskCache(self.path).size() == 100
+        cache.clear()
+        assert cache.size() == 0
+
+    def test_reads_are_read_only(self):
+        cache = DiskCache(self.path)
+        cache.put('k', b'v')
+        other = DiskCache(self.path)
+        # Another process holds the write lock, reads still go through
+        with other._transaction():
+            assert cache.get('k') == b'v'
+
+
+class MemoryCacheTest(unittest.TestCase):
+    def test_lru_and_tags(self):
+        cache = cb.MemoryCache(max_bytes=250)
+        cache.put('a', b'a' * 100, tag='t')
+        cache.put('b', b'b' * 100)
+        cache.get('a')
+        cache.put('c', b'c' * 100, tag='t')
+        assert cache.get('b') is None
+        assert cache.size() == 200
+        cache.delete_tag('t')
+        assert cache.get('a') is None and cache.get('c') is None
+        assert cache.size() == 0
+        assert cache.bump_generation('col') == 1
+        assert cache.generation('col') == 1
+
+
+class ResponseCacheTest(unittest.TestCase):
+    def setUp(self):
+        cb.init(api_key='fakeapikey', account_id='fakeaccountid',
+                namespace='fakenamespace')
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, 'responses.db')
+        self.endpoint = Config.get_base_url()
+
+    def tearDown(self):
+        cb.configure_response_cache(None)
+        self.tmpdir.cleanup()
+
+    def register(self, mock):
+        ref = AnswerReference(doc_name='d', page_num=1, sample_text='t')
+        search = mock.register_uri(
+            'POST', f'{self.endpoint}/docs/search',
+            text=SearchResponse(refs=[ref]).model_dump_json())
+        ask = mock.register_uri(
+            'POST', f'{self.endpoint}/docs/ask',
+            text=AskResponse(answer='a', refs=[ref], request_id='r',
+                             conversation_id='c').model_dump_json())
+        mock.register_uri('POST', f'{self.endpoint}/docs/add')
+        mock.register_uri('POST', f'{self.endpoint}/collections/delete')
+        return search, ask
+
+    @requests_mock.mock()
+    def test_cached_and_invalidated(self, mock):
+        search, ask = self.register(mock)
+        for cache in [cb.MemoryCache(), DiskCache(self.path)]:
+            search.reset()
+            ask.reset()
+            cb.configure_response_cache(cache)
+            col = cb.collection('fakename')
+            assert col.ask('q').request_id == 'r'
+            for _ in range(2):
+                assert col.search('q')[0].doc_name == 'd'
+                resp = col.ask('q')
+                assert resp.answer == 'a'
+                # The IDs belong to the request that filled the cache
+                assert resp.request_id == resp.conversation_id == ''
+            assert search.call_count == 1 and ask.call_count == 1
+            # Other questions and collections are not served from the cache
+            col.ask('other question')
+            cb.collection('other').search('q')
+            assert search.call_count == 2 and ask.call_count == 2
+
+            fname = f'{os.path.dirname(os.path.abspath(__file__))}/data/text_file.txt'
+            col.upload_document(fname)
+            col.search('q')
+            col.ask('q')
+            assert search.call_count == 3 and ask.call_count == 3
+
+            cb.delete_collection('fakename')
+            col.ask('q')
+            assert ask.call_count == 4
+
+    @requests_mock.mock()
+    def test_ttl(self, mock):
+        search, _ = self.register(mock)
+        cb.configure_response_cache(cb.MemoryCache(), ttl=0)
+        col = cb.collection('fakename')
+        col.search('q')
+        col.search('q')
+        assert search.call_count == 2
+
+    @requests_mock.mock()
+    def test_shared_between_processes(self, mock):
+        search, _ = self.register(mock)
+        cb.configure_response_cache(DiskCache(self.path))
+        cb.collection('fakename').search('q')
+        assert search.call_count == 1
+
+        # Another process with the same cache file is served from the cache,
+        # and its invalidation is seen by this process
+        code = f"""
+import chatbees as cb
+from chatbees.utils.config import Config
+cb.init(api_key='fakeapikey', account_id='fakeaccountid',
+        namespace='fakenamespace')
+cb.configure_response_cache(cb.DiskCache({self.path!r}))
+Config.base_url = 'http://127.0.0.1:1'
+assert cb.collection('fakename').search('q')[0].doc_name == 'd'
+cb.invalidate_response_cache('fakename')
+"""
+        env = dict(os.environ, PYTHONPATH=os.path.dirname(
+            os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+        subprocess.run([sys.executable, '-c', code], env=env, check=True)
+        cb.collection('fakename').search('q')
+        assert search.call_count == 2
+
+
+class DocumentCacheTest(unittest.TestCase):
+    def setUp(self):
+        cb.init(api_key='fakeapikey', account_id='fakeaccountid',
+                namespace='fakenamespace')
+        self.tmpdir = tempfile.TemporaryDirectory()
+        cb.configure_document_cache(os.path.join(self.tmpdir.name, 'docs.db'))
+        self.endpoint = Config.get_base_url()
+
+    def tearDown(self):
+        cb.configure_document_cache(None)
+        self.tmpdir.cleanup()
+
+    @requests_mock.mock()
+    def test_summary_cached_and_invalidated(self, mock):
+        summary = mock.register_uri(
+            'POST', f'{self.endpoint}/docs/summary',
+            text=SummaryResponse(summary='s').model_dump_json())
+        mock.register_uri('POST', f'{self.endpoint}/docs/add')
+
+        col = cb.collection('fakename')
+        assert col.summarize_document('text_file.txt') == 's'
+        assert col.summarize_document('text_file.txt') == 's'
+        assert summary.call_count == 1
+
+        fname = f'{os.path.dirname(os.path.abspath(__file__))}/data/text_file.txt'
+        col.upload_document(fname)
+        col.summarize_document('text_file.txt')
+        assert summary.call_count == 2
+
+    @requests_mock.mock()
+    def test_warm_up(self, mock):
+        summary = mock.register_uri(
+            'POST', f'{self.endpoint}/docs/summary',
+            text=SummaryResponse(summary='s').model_dump_json())
+        outline = mock.register_uri(
+            'POST', f'{self.endpoint}/docs/get_outline_faq',
+            text=OutlineFAQResponse(
+                outlines=['o'], faqs=[FAQ(question='q', answer='a')],
+            ).model_dump_json())
+
+        col = cb.collection('fakename')
+        assert col.warm_document_cache(['d1', 'd2']) == {}
+        assert summary.call_count == 2 and outline.call_count == 2
+
+        assert col.get_document_outline_faq('d1').faqs[0].answer == 'a'
+        col.summarize_document('d2')
+        assert summary.call_count == 2 and outline.call_count == 2
@@ -0,0 +1,162 @@
+import unittest
+
+import requests
+import requests_mock
+
+import chatbees as cb
+from chatbees.server_models.doc_api import AnswerReference, AskResponse
+from chatbees.utils.circuit_breaker import CircuitBreaker
+from chatbees.utils.config import Config
+from chatbees.utils.instrumentation import metrics
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class CircuitBreakerTest(unittest.TestCase):
+    def setUp(self):
+        cb.init(api_key='fakeapikey', account_id='fakeaccountid',
+                namespace='fakenamespace')
+        self.clock = FakeClock()
+        self.events = []
+        cb.add_event_listener(self.events.append)
+        metrics.clear()
+
+    def tearDown(self):
+        cb.remove_event_listener(self.events.append)
+        cb.configure_circuit_breaker(None)
+
+    def use_breaker(self, **kwargs):
+        Config.circuit_breaker = CircuitBreaker(
+            failure_threshold=2, reset_timeout=10, clock=self.clock, **kwargs)
+        return Config.circuit_breaker
+
+    def answer(self, answer: str) -> str:
+        return AskResponse(
+            answer=answer,
+            refs=[AnswerReference(doc_name="doc", page_num=1, sample_text="")],
+            request_id='id', conversation_id='id',
+        ).model_dump_json()
+
+    @requests_mock.mock()
+    def test_open_half_open_close(self, mock):
+        breaker = self.use_breaker()
+        ask_url = f'{Config.get_base_url()}/docs/ask'
+        mock.register_uri('POST', ask_url, status_code=500, text='{"detail": "down"}')
+        mock.register_uri('POST', f'{Config.get_base_url()}/docs/list',
+                          text='{"doc_names": []}')
+        col = cb.collection('fakename')
+
+        for _ in range(2):
+            with self.assertRaises(cb.ServerError):
+                col.ask('q')
+        assert breaker.state('/docs/ask') == 'open'
+
+        # Fails fast without sending, other endpoints are not affected
+        calls = mock.call_count
+        with self.assertRaises(cb.CircuitOpen):
+            col.ask('q')
+        assert mock.call_count == calls
+        col.list_documents()
+        assert metrics.snapshot()['circuit_rejected'] == [
+            ({'endpoint': '/docs/ask'}, 1)]
+
+        # A failed probe opens the circuit again
+        self.clock.now = 10
+        assert breaker.state('/docs/ask') == 'half_open'
+        with self.assertRaises(cb.ServerError):
+            col.ask('q')
+        assert breaker.state('/docs/ask') == 'open'
+
+        # A successful probe closes it
+        self.clock.now = 20
+        mock.register_uri('POST', ask_url, text=self.answer('42'))
+        assert col.ask('q').answer == '42'
+        assert breaker.state('/docs/ask') == 'closed'
+
+        assert [(e.fields['previous'], e.fields['state']) for e in self.events] == [
+            ('closed', 'open'), ('open', 'half_open'), ('half_open', 'open'),
+            ('open', 'half_open'), ('half_open', 'closed')]
+        assert self.events[0].name == 'circuit_state_changed'
+        assert self.events[0].fields['endpoint'] == '/docs/ask'
+
+    @requests_mock.mock()
+    def test_client_errors_do_not_open(self, mock):
+        breaker = self.use_breaker()
+        mock.register_uri('POST', f'{Config.get_base_url()}/docs/ask',
+                          status_code=404, text='{"detail": "not found"}')
+        for _ in range(3):
+            with self.assertRaises(cb.CollectionNotFound):
+                cb.collection('fakename').ask('q')
+        assert breaker.state('/docs/ask') == 'closed'
+
+    @requests_mock.mock()
+    def test_caller_errors_do_not_open(self, mock):
+        breaker = self.use_breaker(half_open_probes=1)
+        url = f'{Config.get_base_url()}/docs/ask'
+
+        def fail(error):
+            def send():
+                raise error
+            with self.assertRaises(type(error)):
+                breaker.call(send, url)
+
+        for error in (ValueError('bad body'), KeyboardInterrupt()):
+            for _ in range(3):
+                fail(error)
+        assert breaker.state('/docs/ask') == 'closed'
+
+        for _ in range(2):
+            fail(requests.ConnectionError('refused'))
+        assert breaker.state('/docs/ask') == 'open'
+        self.clock.now += 10
+        # A probe that fails for another reason frees its slot
+        fail(TypeError('not serializable'))
+        assert breaker.state('/docs/ask') == 'half_open'
+        mock.register_uri('POST', url, text=self.answer('a'))
+        assert cb.collection('fakename').ask('q').answer == 'a'
+        assert breaker.state('/docs/ask') == 'closed'
+
+    @requests_mock.mock()
+    def test_per_collection_and_fallback(self, mock):
+        breaker = self.use_breaker(per_collection=True, fallback_ttl=60)
+
+        def ask(request, context):
+            if request.json()['collection_name'] == 'broken':
+                context.status_code = 503
+                return '{"detail": "unavailable"}'
+            return self.answer(request.json()['question'])
+
+        mock.register_uri('POST', f'{Config.get_base_url()}/docs/ask', text=ask)
+        broken = cb.collection('broken')
+        healthy = cb.collection('healthy')
+
+        assert healthy.ask('cached').answer == 'cached'
+        for _ in range(2):
+            with self.assertRaises(cb.APIError):
+                broken.ask('q')
+        assert breaker.state('/docs/ask', 'broken') == 'open'
+        assert breaker.state('/docs/ask', 'healthy') == 'closed'
+        with self.assertRaises(cb.CircuitOpen):
+            broken.ask('q')
+
+        # Open the healthy collection's circuit, its last good answer is
+        # served for the same question only
+        mock.register_uri('POST', f'{Config.get_base_url()}/docs/ask',
+                          status_code=500, text='{"detail": "down"}')
+        for _ in range(2):
+            with self.assertRaises(cb.ServerError):
+                healthy.ask('other')
+        calls = mock.call_count
+        resp = healthy.ask('cached')
+        assert resp.answer == 'cached'
+        assert resp.request_id == resp.conversation_id == ''
+        assert healthy.ask_fast('cached').request_id == ''
+        assert mock.call_count == calls
+        with self.assertRaises(cb.CircuitOpen):
+            healthy.ask('other')
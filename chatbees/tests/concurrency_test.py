@@ -0,0 +1,201 @@
+import threading
+import time
+import unittest
+
+import requests
+import requests_mock
+
+import chatbees as cb
+from chatbees.utils.adaptive_concurrency import AdaptiveLimiter
+from chatbees.utils.config import Config
+from chatbees.utils.concurrency import fan_out
+
+
+class FanOutTest(unittest.TestCase):
+    def test_bounded_concurrency(self):
+        lock = threading.Lock()
+        running = [0]
+        peak = [0]
+
+        def fn(i):
+            with lock:
+                running[0] += 1
+                peak[0] = max(peak[0], running[0])
+            time.sleep(0.01)
+            with lock:
+                running[0] -= 1
+            if i == 3:
+                raise ValueError(i)
+            return i * 2
+
+        outcomes = list(fan_out(fn, range(20), max_concurrency=4))
+        assert peak[0] <= 4
+        assert sorted(o.value for o in outcomes if o.ok) == [
+            i * 2 for i in range(20) if i != 3]
+        assert [o.item for o in outcomes if not o.ok] == [3]
+
+    def test_timeout(self):
+        release = threading.Event()
+
+        def fn(i):
+            if i == 0:
+                release.wait(5)
+            return i
+
+        start = time.monotonic()
+        outcomes = {o.item: o for o in fan_out(fn, range(3), 3, timeout=0.1)}
+        release.set()
+        assert time.monotonic() - start < 2
+        assert isinstance(outcomes[0].error, TimeoutError)
+        assert outcomes[1].value == 1 and outcomes[2].value == 2
+
+    def test_close_cancels_pending(self):
+        started = []
+
+        def fn(i):
+            started.append(i)
+            time.sleep(0.01)
+            return i
+
+        gen = fan_out(fn, range(100), max_concurrency=2)
+        next(gen)
+        gen.close()
+        time.sleep(0.05)
+        assert len(started) < 10
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class AdaptiveLimiterTest(unittest.TestCase):
+    def tearDown(self):
+        cb.configure_adaptive_concurrency(enabled=False)
+
+    def test_additive_increase_multiplicative_decrease(self):
+        clock = FakeClock()
+        limiter = AdaptiveLimiter(initial=4, max_limit=8, clock=clock)
+
+        def round_trip(latency, error=None, concurrent=None):
+            tokens = [limiter.try_acquire()
+                      for _ in range(concurrent or limiter.limit)]
+            clock.now += latency
+            for token in tokens:
+                limiter.release(token, error)
+
+        # Healthy rounds that use the limit raise it, up to max_limit
+        for _ in range(4):
+            round_trip(0.1)
+        assert limiter.limit > 4
+        for _ in range(20):
+            round_trip(0.1)
+        assert limiter.limit == 8
+        limiter = AdaptiveLimiter(initial=7, max_limit=8, clock=clock)
+        # Rounds that use little of the limit do not raise it
+        for _ in range(12):
+            round_trip(0.1, concurrent=2)
+        assert limiter.limit == 7
+        assert limiter.try_acquire() is not None and limiter.in_flight == 1
+        limiter.release(clock.now, cancelled=True)
+
+        # A burst of overload errors halves the limit once
+        round_trip(0.1, error=cb.LimitExceeded('limit'))
+        assert limiter.limit == 3
+        # A latency spike halves it too
+        round_trip(1.0)
+        assert limiter.limit == 1
+        # Other errors do not change it
+        round_trip(0.1, error=cb.CollectionNotFound('gone'))
+        assert limiter.limit == 1
+        assert cb.get_metrics()['concurrency_limit'][-1][1] == 1
+
+    @requests_mock.mock()
+    def test_overload_responses(self, mock):
+        cb.init(api_key='fakeapikey', account_id='fakeaccountid')
+        url = f'{Config.get_base_url()}/docs/add'
+        clock = FakeClock()
+        limiter = AdaptiveLimiter(initial=8, clock=clock)
+
+        def post(error):
+            clock.now += 1
+            with self.assertRaises(error):
+                limiter.call(Config.post, url)
+
+        # Bad requests do not change the limit
+        mock.register_uri('POST', url, status_code=400)
+        post(cb.APIError)
+        assert limiter.limit == 8
+        mock.register_uri('POST', url, status_code=429)
+        post(cb.APIError)
+        assert limiter.limit == 4
+        mock.register_uri('POST', url, status_code=503)
+        post(cb.APIError)
+        assert limiter.limit == 2
+        mock.register_uri('POST', url, exc=requests.ReadTimeout)
+        post(requests.ReadTimeout)
+        assert limiter.limit == 1
+
+    def test_caps_fan_out(self):
+        limiter = cb.configure_adaptive_concurrency(
+            initial=2, min_limit=1, max_limit=2)
+        lock = threading.Lock()
+        running = [0]
+        peak = [0]
+
+        def fn(i):
+            with lock:
+                running[0] += 1
+                peak[0] = max(peak[0], running[0])
+            time.sleep(0.01)
+            with lock:
+                running[0] -= 1
+            if i % 5 == 0:
+                raise cb.ServerError('busy')
+            return i
+
+        # Two fan-outs share the limit
+        results = []
+        threads = [threading.Thread(target=lambda: results.extend(
+            fan_out(fn, range(10), max_concurrency=8))) for _ in range(2)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert peak[0] <= 2
+        assert len(results) == 20
+        assert len([o for o in results if not o.ok]) == 4
+        assert limiter.in_flight == 0
+
+        gen = fan_out(fn, range(1, 100), max_concurrency=2)
+        next(gen)
+        gen.close()
+        # The calls that were running release their slots when they finish
+        for _ in range(100):
+            if limiter.in_flight == 0:
+                break
+            time.sleep(0.01)
+        assert limiter.in_flight == 0
+
+    def test_slow_consumer(self):
+        limiter = cb.configure_adaptive_concurrency(
+            initial=8, max_limit=8, latency_tolerance=2.0)
+
+        def fn(i):
+            time.sleep(0.01)
+            return i
+
+        # The time the consumer takes is not latency of the calls
+        for _ in fan_out(fn, range(40), max_concurrency=8):
+            time.sleep(0.03)
+        assert limiter.limit == 8
+
+        # A fan-out started while consuming one that holds every slot gets
+        # slots as the calls of the outer one complete
+        inner = []
+        for outcome in fan_out(fn, range(8), max_concurrency=8):
+            inner.extend(fan_out(fn, range(4), max_concurrency=4))
+        assert len(inner) == 32 and all(o.ok for o in inner)
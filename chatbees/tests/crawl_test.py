@@ -0,0 +1,113 @@
+import json
+import unittest
+
+import requests_mock
+
+import chatbees as cb
+from chatbees.client_models.crawl import CrawlPages
+from chatbees.server_models.doc_api import GetCrawlResponse, PageStats
+from chatbees.utils.config import Config
+
+
+def crawl_response(pages, root_url='https://example.com') -> str:
+    return GetCrawlResponse(
+        root_url=root_url,
+        created_on=1,
+        max_pages=100,
+        crawl_status=cb.CrawlStatus.SUCCEEDED,
+        crawl_result=pages,
+    ).model_dump_json()
+
+
+class CrawlPagesTest(unittest.TestCase):
+    def test_iterate(self):
+        pages = {
+            'https://example.com/a': PageStats(char_count=10),
+            'https://example.com/"quoted"{': PageStats(
+                char_count=0, error_code='404', error_msg='}{ not found'),
+        }
+        result = CrawlPages(crawl_response(pages))
+        assert result.root_url == 'https://example.com'
+        assert result.crawl_status == cb.CrawlStatus.SUCCEEDED
+        assert {page.url: page.to_model() for page in result} == pages
+        assert [page.url for page in result.failures()] == [
+            'https://example.com/"quoted"{']
+
+    def test_member_order_and_whitespace(self):
+        # The members are read in any order, with any whitespace
+        text = json.dumps({
+            'crawl_result': {'https://example.com/a': {'char_count': 3}},
+            'crawl_status': 2,
+            'root_url': 'https://example.com',
+            'max_pages': 10,
+            'created_on': 1,
+        }, indent=2)
+        result = CrawlPages(text)
+        assert result.crawl_status == cb.CrawlStatus(2)
+        assert list(result) == [cb.CrawlPage('https://example.com/a', 3)]
+
+        text = json.dumps({'root_url': 'r', 'created_on': 1, 'max_pages': 10,
+                           'crawl_status': 1, 'crawl_result': None})
+        assert list(CrawlPages(text)) == []
+
+    def test_summary_and_diff(self):
+        old = CrawlPages(crawl_response({
+            'https://example.com/blog/1': PageStats(char_count=10),
+            'https://example.com/blog/2': PageStats(
+                char_count=0, error_code='timeout'),
+            'https://example.com/docs/1': PageStats(char_count=5),
+            'https://example.com/old': PageStats(char_count=1),
+        })).summary()
+        new = CrawlPages(crawl_response({
+            'https://example.com/blog/1': PageStats(
+                char_count=0, error_code='404'),
+            'https://example.com/blog/2': PageStats(char_count=7),
+            'https://example.com/docs/1': PageStats(char_count=6),
+            'https://example.com/blog/3': PageStats(
+                char_count=0, error_code='404'),
+            'https://example.com/docs/2': PageStats(
+                char_count=0, error_code='timeout'),
+        })).summary()
+
+        assert (new.pages, new.failed, new.total_chars) == (5, 3, 13)
+        assert list(new.char_counts) == [0, 7, 6, 0, 0]
+        assert new.error_histogram() == {'404': 2, 'timeout': 1}
+        assert new.top_failing_prefixes(1) == [('https://example.com/blog', 2)]
+        assert new.top_failing_prefixes(depth=0) == [('https://example.com/', 3)]
+
+        diff = old.diff(new)
+        assert diff.added == ['https://example.com/blog/3',
+                              'https://example.com/docs/2']
+        assert diff.removed == ['https://example.com/old']
+        assert diff.newly_failed == ['https://example.com/blog/1']
+        assert diff.recovered == ['https://example.com/blog/2']
+        assert diff.char_count_changed == {
+            'https://example.com/blog/1': (10, 0),
+            'https://example.com/blog/2': (0, 7),
+            'https://example.com/docs/1': (5, 6),
+        }
+
+        other = CrawlPages(crawl_response({}, root_url='https://other.com'))
+        with self.assertRaises(ValueError):
+            old.diff(other.summary())
+
+    @requests_mock.mock()
+    def test_get_crawl_pages(self, mock):
+        cb.init(api_key='fakeapikey', account_id='fakeaccountid',
+                namespace='fakenamespace')
+
+        def get_crawl(request, context):
+            if request.json()['crawl_id'] == 'old':
+                return crawl_response({'https://example.com/a': PageStats(char_count=1)})
+            return crawl_response({'https://example.com/b': PageStats(char_count=2)})
+
+        mock.register_uri(
+            'POST', f'{Config.get_base_url()}/docs/get_crawl', text=get_crawl)
+
+        col = cb.collection('fakename')
+        pages = col.get_crawl_pages('new')
+        assert list(pages) == [cb.CrawlPage('https://example.com/b', 2)]
+
+        diff = col.diff_crawls('old', 'new')
+        assert diff.added == ['https://example.com/b']
+        assert diff.removed == ['https://example.com/a']
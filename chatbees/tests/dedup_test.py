@@ -0,0 +1,59 @@
+import os
+import tempfile
+import unittest
+
+import chatbees as cb
+from chatbees.fakeserver import FakeServer
+from chatbees.utils.config import Config
+
+
+class DedupTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.paths = {}
+        for name, content in [('policy.pdf', b'policy v1'),
+                              ('other.pdf', b'other doc'),
+                              ('copy/policy.pdf', b'policy v1'),
+                              ('policy-final.pdf', b'policy v1'),
+                              ('same-size.pdf', b'policy v2'),
+                              ('other-copy.pdf', b'other doc')]:
+            path = os.path.join(self.tmpdir.name, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as f:
+                f.write(content)
+            self.paths[name] = path
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_find_duplicate_files(self):
+        p = self.paths
+        paths = list(p.values()) + [p['other.pdf'], '/no/such/file.pdf']
+        assert cb.find_duplicate_files(paths, max_concurrency=2) == [
+            [p['policy.pdf'], p['copy/policy.pdf'], p['policy-final.pdf']],
+            [p['other.pdf'], p['other-copy.pdf']],
+        ]
+        assert cb.find_duplicate_files([p['policy.pdf']]) == []
+
+    def test_upload_documents_deduplicated(self):
+        p = self.paths
+        with FakeServer(api_key='fakeapikey') as server:
+            cb.init(api_key='fakeapikey', account_id='fakeaccountid',
+                    namespace='fakenamespace')
+            Config.base_url = server.url
+            try:
+                col = cb.create_collection(cb.Collection(name='docs'))
+                out = col.upload_documents(
+                    p.values(), deduplicate=True,
+                    canonical=lambda group: group[-1])
+                names = sorted(doc.name for doc in col.list_documents())
+            finally:
+                Config.base_url = None
+            assert server.requests['/docs/add'] == 3
+        assert names == ['other-copy.pdf', 'policy-final.pdf',
+                         'same-size.pdf']
+        assert all(outcome.ok for outcome in out.values())
+        assert out[p['policy.pdf']].value == p['policy-final.pdf']
+        assert out[p['copy/policy.pdf']].value == p['policy-final.pdf']
+        assert out[p['other.pdf']].value == p['other-copy.pdf']
+        assert out[p['policy-final.pdf']].value is None
@@ -0,0 +1,217 @@
+import io
+import os
+import subprocess
+import sys
+import time
+import unittest
+
+import chatbees as cb
+from chatbees.fakeserver import FakeServer
+from chatbees.fakeserver.index import Bm25Index
+from chatbees.server_models.ingestion_type import (
+    IngestionStatus, IngestionType, NotionSpec,
+)
+from chatbees.utils.config import Config
+
+
+class Bm25IndexTest(unittest.TestCase):
+    def test_rank(self):
+        index = Bm25Index()
+        index.add('bees.txt', 'Bees make honey. Honey is sweet.')
+        index.add('ants.txt', 'Ants build colonies underground.')
+        index.add('both.txt', 'Bees and ants are insects.')
+        hits = index.search('honey bees', top_k=2)
+        assert [hit.doc_name for hit in hits] == ['bees.txt', 'both.txt']
+        assert index.search('honey', doc_name='ants.txt') == []
+
+        index.remove('bees.txt')
+        assert [hit.doc_name for hit in index.search('honey bees')] == [
+            'both.txt']
+        assert len(index) == 2
+
+    def test_pages(self):
+        index = Bm25Index()
+        index.add('doc', 'first page\fsecond page about bees')
+        hit, = index.search('bees')
+        assert hit.page_num == 2
+        assert index.pages('doc') == ['first page', 'second page about bees']
+
+
+class FakeServerTest(unittest.TestCase):
+    def setUp(self):
+        self.server = FakeServer(api_key='fakeapikey').start()
+        cb.init(api_key='fakeapikey', account_id='fakeaccountid',
+                namespace='fakenamespace')
+        Config.base_url = self.server.url
+        self.fname = f'{os.path.dirname(os.path.abspath(__file__))}/data/text_file.txt'
+
+    def tearDown(self):
+        Config.base_url = None
+        self.server.stop()
+
+    def test_collections_and_documents(self):
+        col = cb.create_collection(cb.Collection(name='docs'))
+        with self.assertRaises(cb.CollectionAlreadyExists):
+            cb.create_collection(cb.Collection(name='docs'))
+        assert cb.list_collections() == ['docs']
+
+        col.upload_document(self.fname)
+        assert [doc.name for doc in col.list_documents()] == ['text_file.txt']
+        with open(self.fname) as f:
+            word = f.read().split()[0]
+        refs = col.search(word)
+        assert refs[0].doc_name == 'text_file.txt'
+        resp = col.ask(word)
+        assert resp.refs[0].doc_name == 'text_file.txt'
+        col.create_or_update_feedback(resp.request_id, True)
+        assert self.server.feedback[resp.request_id].thumb_down
+
+        col.configure_chat(negative_response='No idea')
+        assert col.ask('zzzzqqq').answer == 'No idea'
+        assert col.summarize_document('text_file.txt')
+
+        col.delete_document('text_file.txt')
+        assert col.search(word) == []
+        cb.delete_collection('docs')
+        with self.assertRaises(cb.CollectionNotFound):
+            col.list_documents()
+
+    def test_ask_documents(self):
+        for i in range(10):
+            self.server.add_document('fakenamespace', 'filings', f'{i}.txt',
+                                     f'Revenue was {i} million.')
+        self.server.latency = {'/docs/ask': 0.1}
+        col = cb.collection('filings')
+        start = time.monotonic()
+        outcomes = list(col.ask_documents(
+            'revenue', [f'{i}.txt' for i in range(10)] + ['missing.txt'],
+            max_concurrency=11))
+        assert time.monotonic() - start < 0.5
+        answers = {o.item: o.value.answer for o in outcomes if o.ok}
+        assert answers['3.txt'] == 'Revenue was 3 million.'
+        assert len(answers) == 10
+        failed, = [o for o in outcomes if not o.ok]
+        assert isinstance(failed.error, cb.CollectionNotFound)
+
+        # The asks that have not started are cancelled once one is found
+        self.server.requests.clear()
+        outcomes = list(col.ask_documents(
+            'revenue', [f'{i}.txt' for i in range(10)], max_concurrency=2,
+            stop_when=lambda doc, resp: 'million' in resp.answer))
+        assert len(outcomes) == 1 and outcomes[0].ok
+        time.sleep(0.2)
+        assert self.server.requests['/docs/ask'] <= 2
+
+    def test_upload_documents(self):
+        col = cb.create_collection(cb.Collection(name='docs'))
+        data = os.path.dirname(self.fname)
+        paths = [os.path.join(data, name) for name in os.listdir(data)
+                 if name.endswith('.txt')]
+        limiter = cb.configure_adaptive_concurrency(initial=2, max_limit=4)
+        try:
+            out = col.upload_documents(paths + ['/no/such/file.txt'])
+        finally:
+            cb.configure_adaptive_concurrency(enabled=False)
+        assert all(out[path].ok for path in paths)
+        assert not out['/no/such/file.txt'].ok
+        assert len(col.list_documents()) == len(paths)
+        assert limiter.in_flight == 0
+
+    def test_upload_bytes_and_fileobj(self):
+        class Unseekable:
+            def __init__(self, data):
+                self.stream = io.BytesIO(data)
+
+            def read(self, size=-1):
+                return self.stream.read(size)
+
+        col = cb.create_collection(cb.Collection(name='docs'))
+        col.upload_bytes('bytes.txt', b'Bees make honey.')
+        col.upload_bytes('view.txt', memoryview(b'xxAnts dig.')[2:])
+        stream = io.BytesIO(b'skipped Wasps sting.')
+        stream.seek(8)
+        col.upload_fileobj('stream.txt', stream)
+        col.upload_fileobj('unseekable.txt', Unseekable(b'Moths fly.'))
+        col.upload_fileobj('sized.txt', Unseekable(b'Flies buzz. Cut'), size=11)
+        assert sorted(doc.name for doc in col.list_documents()) == [
+            'bytes.txt', 'sized.txt', 'stream.txt', 'unseekable.txt',
+            'view.txt']
+        assert col.search('ants')[0].doc_name == 'view.txt'
+        assert col.search('wasps')[0].doc_name == 'stream.txt'
+        assert col.search('buzz')[0].doc_name == 'sized.txt'
+        assert col.search('skipped') == [] and col.search('cut') == []
+
+        # The size is checked without reading the stream
+        big = io.BytesIO(b'x' * 10_000_000)
+        with self.assertRaises(ValueError):
+            col.upload_fileobj('big.txt', big)
+        assert big.tell() == 0
+        with self.assertRaises(ValueError):
+            col.upload_fileobj('big.txt', Unseekable(b'x' * 10_000_000))
+        assert self.server.requests['/docs/add'] == 5
+        # A stream shorter than its size fails instead of sending a short body
+        with self.assertRaises(ValueError):
+            col.upload_fileobj('short.txt', Unseekable(b'short'), size=100)
+
+    def test_crawl_and_ingestion(self):
+        self.server.web_pages = {
+            'https://example.com/a': 'Pollination by bees.',
+            'https://example.com/b': 'Ant colonies.',
+        }
+        col = cb.create_collection(cb.Collection(name='web'))
+        crawl_id = col.create_crawl('https://example.com', 10)
+        status, pages = col.get_crawl(crawl_id)
+        assert status == IngestionStatus.SUCCEEDED and len(pages) == 2
+        col.index_crawl(crawl_id)
+        assert col.search('pollination')[0].doc_name == 'https://example.com/a'
+        col.delete_crawl('https://example.com')
+        assert col.list_documents() == []
+
+        ingestion_id = col.create_ingestion(
+            'connector', IngestionType.NOTION, NotionSpec())
+        assert col.get_ingestion(ingestion_id) == IngestionStatus.SUCCEEDED
+
+    def test_failure_injection_and_auth(self):
+        cb.create_collection(cb.Collection(name='docs'))
+        self.server.fail_next(1, status=500, path='/docs/list')
+        with self.assertRaises(cb.ServerError):
+            cb.collection('docs').list_documents()
+        cb.collection('docs').list_documents()
+        assert self.server.requests['/docs/list'] == 2
+
+        Config.api_key = 'wrong'
+        with self.assertRaises(cb.UnAuthorized):
+            cb.collection('docs').list_documents()
+
+    def test_deterministic_failure_rate(self):
+        def failures(seed):
+            with FakeServer(failure_rate=0.3, seed=seed) as server:
+                Config.base_url = server.url
+                server.add_document('fakenamespace', 'docs', 'd', 'bees')
+                out = []
+                for _ in range(20):
+                    try:
+                        cb.collection('docs').search('bees')
+                        out.append(False)
+                    except cb.ServerError:
+                        out.append(True)
+                return out
+
+        assert failures(1) == failures(1)
+        assert any(failures(1))
+
+    def test_subprocess(self):
+        proc = subprocess.Popen(
+            [sys.executable, '-m', 'chatbees.fakeserver',
+             '--docs', os.path.dirname(self.fname),
+             '--namespace', 'fakenamespace', '--collection', 'docs'],
+            stdout=subprocess.PIPE, text=True,
+            env=dict(os.environ, PYTHONPATH=os.path.dirname(os.path.dirname(
+                os.path.dirname(os.path.abspath(__file__))))))
+        try:
+            Config.base_url = proc.stdout.readline().strip()
+            names = [doc.name for doc in cb.collection('docs').list_documents()]
+            assert 'text_file.txt' in names
+        finally:
+            proc.terminate()
+            proc.wait()
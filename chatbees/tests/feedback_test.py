@@ -0,0 +1,84 @@
+import json
+import threading
+import unittest
+
+import requests_mock
+import shortuuid
+
+import chatbees as cb
+from chatbees.server_models.feedback_api import CreateOrUpdateFeedbackRequest
+from chatbees.utils.config import Config
+
+
+class FeedbackBufferTest(unittest.TestCase):
+    def setUp(self):
+        cb.init(api_key='fakeapikey', account_id='fakeaccountid',
+                namespace='fakenamespace')
+        self.url = f'{Config.get_base_url()}/feedback/create_or_update'
+
+    def tearDown(self):
+        cb.configure_feedback_buffer(enabled=False)
+
+    @staticmethod
+    def request(request_id):
+        return CreateOrUpdateFeedbackRequest(
+            namespace_name='fakenamespace', collection_name='fakename',
+            request_id=request_id)
+
+    @staticmethod
+    def sent(mock):
+        return [json.loads(r.text) for r in mock.request_history]
+
+    @requests_mock.mock()
+    def test_deduplicate_and_flush_on_close(self, mock):
+        mock.register_uri('POST', self.url, text='{}')
+        buffer = cb.configure_feedback_buffer(flush_interval=60)
+        col = cb.collection('fakename')
+        first, second = shortuuid.uuid(), shortuuid.uuid()
+        col.create_or_update_feedback(first, True)
+        col.create_or_update_feedback(second, True)
+        col.create_or_update_feedback(first, False, 'never mind')
+        # Nothing is sent before the interval or a full batch
+        assert mock.call_count == 0
+        assert buffer.pending == 2
+
+        cb.configure_feedback_buffer(enabled=False)
+        assert Config.feedback_buffer is None
+        sent = {r['request_id']: r for r in self.sent(mock)}
+        assert len(sent) == 2 and buffer.sent == 2
+        assert sent[first]['thumb_down'] is False
+        assert sent[first]['text_feedback'] == 'never mind'
+        with self.assertRaises(RuntimeError):
+            buffer.put(self.request(first))
+
+    @requests_mock.mock()
+    def test_batch_and_interval(self, mock):
+        sent = threading.Semaphore(0)
+
+        def reply(request, context):
+            sent.release()
+            return '{}'
+
+        mock.register_uri('POST', self.url, text=reply)
+        cb.configure_feedback_buffer(max_batch=3, flush_interval=60)
+        col = cb.collection('fakename')
+        for _ in range(3):
+            col.create_or_update_feedback(shortuuid.uuid(), True)
+        # A full batch is sent without waiting for the interval
+        for _ in range(3):
+            assert sent.acquire(timeout=10)
+
+        cb.configure_feedback_buffer(max_batch=100, flush_interval=0.05)
+        col.create_or_update_feedback(shortuuid.uuid(), True)
+        assert sent.acquire(timeout=10)
+
+    @requests_mock.mock()
+    def test_failures(self, mock):
+        mock.register_uri('POST', self.url, status_code=500,
+                          text='{"detail": "internal error"}')
+        request_id = shortuuid.uuid()
+        with cb.FeedbackBuffer() as buffer:
+            buffer.put(self.request(request_id))
+            assert buffer.flush(timeout=10)
+        assert buffer.sent == 0
+        assert [req.request_id for req, _ in buffer.failures] == [request_id]
@@ -0,0 +1,161 @@
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import NamedTuple
+
+import chatbees as cb
+from chatbees.server_models.doc_api import AnswerReference
+from chatbees.server_models.search_api import SearchResponse
+from chatbees.utils.config import Config
+from chatbees.utils.hedging import Hedger
+from chatbees.utils.instrumentation import metrics
+
+
+class Response(NamedTuple):
+    status_code: int
+    text: str = ''
+
+
+class HedgerTest(unittest.TestCase):
+    def setUp(self):
+        cb.init(api_key='fakeapikey', account_id='fakeaccountid',
+                namespace='fakenamespace')
+        metrics.clear()
+
+    def tearDown(self):
+        cb.configure_hedging(enabled=False)
+
+    def search_response(self, doc_name: str) -> str:
+        return SearchResponse(refs=[
+            AnswerReference(doc_name=doc_name, page_num=1, sample_text='')
+        ]).model_dump_json()
+
+    def test_hedge_wins(self):
+        # requests_mock serializes requests, use a real server
+        calls = []
+        lock = threading.Lock()
+        body = self.search_response
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers['Content-Length']))
+                with lock:
+                    calls.append(self.path)
+                    first = len(calls) == 1
+                if self.path != '/docs/search':
+                    out, status = b'{"detail": "down"}', 500
+                elif first:
+                    time.sleep(0.5)
+                    out, status = body('slow').encode(), 200
+                else:
+                    out, status = body('fast').encode(), 200
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(out)))
+                self.end_headers()
+                self.wfile.write(out)
+
+        server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        Config.base_url = f'http://127.0.0.1:{server.server_port}'
+        try:
+            hedger = cb.configure_hedging(delay=0.05, budget=1)
+            start = time.monotonic()
+            refs = cb.collection('fakename').search('q')
+            assert time.monotonic() - start < 0.4
+            assert refs[0].doc_name == 'fast'
+            assert len(calls) == 2
+            assert hedger.win_rate('/docs/search') == 1.0
+
+            # Writes and non-hedged reads are never duplicated
+            with self.assertRaises(cb.ServerError):
+                cb.collection('fakename').ask('q')
+            assert calls[2:] == ['/docs/ask']
+        finally:
+            Config.base_url = None
+            server.shutdown()
+            server.server_close()
+
+    def test_budget_and_errors(self):
+        hedger = Hedger(delay=0.01, budget=0.05)
+        calls = []
+
+        def slow_then_error():
+            calls.append(1)
+            if len(calls) % 2 == 1:
+                time.sleep(0.1)
+                return Response(200, 'primary')
+            raise ConnectionError('hedge failed')
+
+        # The failed hedge falls back to the primary response
+        assert hedger.call(slow_then_error, '/docs/search').text == 'primary'
+        assert len(calls) == 2
+
+        # The budget is spent, the next request is not hedged
+        calls.clear()
+        assert hedger.call(slow_then_error, '/docs/search').text == 'primary'
+        assert len(calls) == 1
+        assert hedger.win_rate('/docs/search') == 0.0
+        hedger.close()
+
+    def test_inline_without_hedge(self):
+        hedger = Hedger(min_samples=5, max_workers=1)
+        threads = []
+
+        def send():
+            threads.append(threading.current_thread())
+            return Response(200)
+
+        # Without a latency estimate no hedge can be sent, so the request is
+        # not handed to the hedge threads and is not limited by their number
+        results = []
+        callers = [threading.Thread(target=lambda: results.append(
+            hedger.call(send, '/docs/search'))) for _ in range(5)]
+        for caller in callers:
+            caller.start()
+        for caller in callers:
+            caller.join(10)
+        assert results == [Response(200)] * 5
+        assert set(threads) == set(callers)
+        assert hedger.hedge_delay('/docs/search') is not None
+        hedger.close()
+
+    def test_failed_response_loses(self):
+        hedger = Hedger(delay=0.01, budget=1, min_samples=1)
+        calls = []
+
+        def slow_then_unavailable():
+            calls.append(1)
+            if len(calls) == 1:
+                time.sleep(0.1)
+                return Response(200, 'primary')
+            return Response(503, 'hedge')
+
+        # The fast 503 of the hedge waits for the slow 200 of the primary
+        assert hedger.call(slow_then_unavailable, '/docs/search').text == \
+            'primary'
+        assert hedger.win_rate('/docs/search') == 0.0
+        # Only the successful response is a latency sample
+        samples = hedger._latencies['/docs/search'].samples
+        assert len(samples) == 1 and samples[0] >= 0.1
+
+        # A failed response is returned but not sampled
+        assert hedger.call(lambda: Response(503), '/docs/search') == \
+            Response(503)
+        assert len(samples) == 1
+        hedger.close()
+
+    def test_observed_percentile(self):
+        hedger = Hedger(min_samples=5, window=10)
+        assert hedger.hedge_delay('/docs/search') is None
+        for latency in [1, 2, 3, 4, 5, 6, 7, 8, 9, 10]:
+            hedger._record('/docs/search', latency)
+        assert hedger.hedge_delay('/docs/search') == 10
+        assert hedger.hedge_delay('/docs/list') is None
+        hedger.close()
@@ -0,0 +1,143 @@
+import os
+import queue
+import tempfile
+import threading
+import unittest
+
+import requests_mock
+
+import chatbees as cb
+from chatbees.utils.config import Config
+
+
+def record_uploads(mock, url):
+    """
+    Mocks the upload endpoint, returns the list the bodies of the uploads
+    are appended to. Uploads are streamed, so the body is read while the
+    file is open.
+    """
+    bodies = []
+
+    def add(request, context):
+        bodies.append(bytes(request.body.read()))
+        return '{}'
+
+    mock.register_uri('POST', url, text=add)
+    return bodies
+
+
+def uploaded_names(bodies):
+    return [body.decode().split('filename="')[1].split('"')[0]
+            for body in bodies]
+
+
+class IngestQueueTest(unittest.TestCase):
+    def setUp(self):
+        cb.init(api_key='fakeapikey', account_id='fakeaccountid',
+                namespace='fakenamespace')
+        self.url = f'{Config.get_base_url()}/docs/add'
+        self.fname = f'{os.path.dirname(os.path.abspath(__file__))}/data/text_file.txt'
+
+    @requests_mock.mock()
+    def test_upload_paths_and_bytes(self, mock):
+        bodies = record_uploads(mock, self.url)
+        with cb.IngestQueue('fakename', workers=2) as q:
+            q.put(self.fname)
+            q.put_bytes('generated.html', b'<html>hi</html>')
+            q.put_bytes('view.txt', memoryview(b'view'))
+            assert q.flush(timeout=10)
+            assert q.pending == 0
+        assert q.uploaded == 3
+        assert sorted(uploaded_names(bodies)) == [
+            'generated.html', 'text_file.txt', 'view.txt']
+        assert b'<html>hi</html>' in b''.join(bodies)
+
+        with self.assertRaises(RuntimeError):
+            q.put(self.fname)
+        with self.assertRaises(ValueError):
+            cb.IngestQueue('fakename').put_bytes('big', b'x' * 10_000_000)
+
+    @requests_mock.mock()
+    def test_backpressure_and_retries(self, mock):
+        release = threading.Event()
+        attempts = []
+
+        def add(request, context):
+            attempts.append(1)
+            release.wait(10)
+            if len(attempts) == 1:
+                context.status_code = 500
+                return '{"detail": "try again"}'
+            return '{}'
+
+        mock.register_uri('POST', self.url, text=add)
+        q = cb.IngestQueue('fakename', workers=1, max_pending=1,
+                           retry_backoff=0)
+        q.put_bytes('a', b'a')  # taken by the worker
+        q.put_bytes('b', b'b', timeout=5)  # fills the queue
+        with self.assertRaises(queue.Full):
+            q.put_bytes('c', b'c', timeout=0.1)
+        release.set()
+        assert q.close(timeout=10)
+        assert q.uploaded == 2 and q.failures == []
+        assert len(attempts) == 3
+
+    @requests_mock.mock()
+    def test_failures(self, mock):
+        mock.register_uri('POST', self.url, status_code=404,
+                          text='{"detail": "no such collection"}')
+        with cb.IngestQueue('fakename') as q:
+            q.put_bytes('a', b'a')
+        assert q.uploaded == 0
+        assert [name for name, _ in q.failures] == ['a']
+        assert isinstance(q.failures[0][1], cb.CollectionNotFound)
+
+    @requests_mock.mock()
+    def test_retries_transient_errors_only(self, mock):
+        for status, calls in [(400, 1), (413, 1), (429, 3), (503, 3)]:
+            add = mock.register_uri('POST', self.url, status_code=status,
+                                    text='{"detail": "error"}')
+            with cb.IngestQueue('fakename', max_retries=2,
+                                retry_backoff=0) as q:
+                q.put_bytes('a', b'a')
+            assert add.call_count == calls, status
+            assert q.failures[0][1].status_code == status
+
+    @requests_mock.mock()
+    def test_journal_recovery(self, mock):
+        bodies = record_uploads(mock, self.url)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            # The process "crashes" while the uploads are in flight
+            q = cb.IngestQueue('fakename', workers=1, journal_dir=tmpdir)
+            crashed = threading.Event()
+            q._upload = lambda item: crashed.wait()
+            q.put(self.fname)
+            q.put_bytes('in-memory.txt', b'in memory')
+            assert not q.close(timeout=0.1)
+            assert any(name.endswith('.bin') for name in os.listdir(tmpdir))
+            assert mock.call_count == 0
+
+            with cb.IngestQueue('fakename', journal_dir=tmpdir) as recovered:
+                assert recovered.flush(timeout=10)
+            # Both pending documents are uploaded, and the journal is empty
+            # once they are done
+            assert sorted(uploaded_names(bodies)) == [
+                'in-memory.txt', 'text_file.txt']
+            assert os.listdir(tmpdir) == ['journal.jsonl']
+            assert os.path.getsize(f'{tmpdir}/journal.jsonl') == 0
+
+    @requests_mock.mock()
+    def test_journal_compaction(self, mock):
+        record_uploads(mock, self.url)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            journal = f'{tmpdir}/journal.jsonl'
+            with cb.IngestQueue('fakename', workers=1, journal_dir=tmpdir,
+                                compact_every=3) as q:
+                for i in range(10):
+                    q.put_bytes(f'{i}.txt', b'text')
+                    assert q.flush(timeout=10)
+                # The records of the documents since the last compaction
+                with open(journal) as f:
+                    assert len(f.readlines()) == 2 * (10 % 3)
+            assert q.uploaded == 10
+            assert os.path.getsize(journal) == 0
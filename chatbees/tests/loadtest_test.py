@@ -0,0 +1,69 @@
+import random
+import unittest
+
+import requests_mock
+
+import chatbees as cb
+from chatbees.loadtest import LatencyHistogram, run_closed_loop, run_open_loop
+from chatbees.server_models.doc_api import AskResponse
+from chatbees.utils.config import Config
+
+
+class LatencyHistogramTest(unittest.TestCase):
+    def test_percentiles_within_precision(self):
+        rnd = random.Random(42)
+        values = sorted(rnd.uniform(0.001, 2.0) for _ in range(10_000))
+        hist = LatencyHistogram()
+        for v in values:
+            hist.record(v)
+        for p in (50, 90, 99, 99.9):
+            exact = values[round(p / 100 * len(values)) - 1]
+            assert abs(hist.percentile(p) - exact) / exact < 0.01, p
+        assert hist.percentile(100) == hist.max_us / 1_000_000
+
+    def test_merge(self):
+        a, b = LatencyHistogram(), LatencyHistogram()
+        a.record(0.010)
+        b.record(0.020)
+        a.merge(b)
+        assert a.count == 2
+        assert a.min_us == 10_000 and a.max_us == 20_000
+
+
+class LoadTestTest(unittest.TestCase):
+    def setUp(self):
+        cb.init(api_key='fakeapikey', account_id='fakeaccountid',
+                namespace='fakenamespace')
+
+    def _register_ask(self, mock):
+        calls = [0]
+
+        def ask_response(request, context):
+            calls[0] += 1
+            if calls[0] % 5 == 0:
+                context.status_code = 402
+                return '{"detail": "limit"}'
+            return AskResponse(answer='a', refs=[], request_id='r',
+                               conversation_id='c').model_dump_json()
+
+        return mock.register_uri(
+            'POST', f'{Config.get_base_url()}/docs/ask', text=ask_response)
+
+    @requests_mock.mock()
+    def test_open_loop(self, mock):
+        self._register_ask(mock)
+        report = run_open_loop('fakename', ['q1', 'q2'], rate=100, duration=0.3)
+        assert report.requests == 30
+        assert report.errors['LimitExceeded'] == 6
+        assert report.latency.count == 24
+        assert report.throughput > 0
+
+    @requests_mock.mock()
+    def test_closed_loop(self, mock):
+        ask = self._register_ask(mock)
+        report = run_closed_loop('fakename', ['q1', 'q2', 'q3'], users=4,
+                                 duration=0.2, turns=2)
+        assert report.requests == ask.call_count
+        assert report.requests > 0
+        assert set(report.errors) <= {'LimitExceeded'}
+        assert 'p99' in report.to_dict()['latency_ms']
@@ -0,0 +1,169 @@
+import threading
+import unittest
+from collections import Counter
+
+import requests_mock
+
+import chatbees as cb
+from chatbees.fakeserver import FakeServer
+from chatbees.server_models.doc_api import (
+    ExtractRelevantTextsResponse, ExtractType,
+)
+from chatbees.server_models.search_api import SearchResponse
+from chatbees.utils.config import Config
+from chatbees.utils.priority import Priority, PriorityScheduler
+
+
+class PrioritySchedulerTest(unittest.TestCase):
+    def start(self, scheduler, priority, release, running):
+        def send():
+            running.append(priority)
+            release.wait(10)
+
+        thread = threading.Thread(target=scheduler.call, args=(send, priority))
+        thread.start()
+        return thread
+
+    def wait_for(self, scheduler, priority, count):
+        for _ in range(1000):
+            if scheduler.in_flight(priority) == count:
+                return
+            threading.Event().wait(0.01)
+        raise AssertionError(f"{priority.name} never reached {count}")
+
+    def test_interactive_not_starved_by_bulk(self):
+        scheduler = PriorityScheduler(
+            max_concurrency=3, default_quota=2, bulk_quota=2)
+        release = threading.Event()
+        running = []
+        threads = [self.start(scheduler, Priority.BULK, release, running)
+                   for _ in range(4)]
+        self.wait_for(scheduler, Priority.BULK, 2)
+
+        # Bulk is held at its quota, interactive gets the free slot at once
+        threads.append(self.start(
+            scheduler, Priority.INTERACTIVE, release, running))
+        self.wait_for(scheduler, Priority.INTERACTIVE, 1)
+        assert running.count(Priority.BULK) == 2
+
+        release.set()
+        for thread in threads:
+            thread.join(10)
+        assert running.count(Priority.BULK) == 4
+        assert scheduler.in_flight(Priority.BULK) == 0
+
+    def test_interactive_not_starved_by_default_and_bulk(self):
+        scheduler = PriorityScheduler(
+            max_concurrency=4, default_quota=3, bulk_quota=2)
+        release = threading.Event()
+        running = []
+        threads = [self.start(scheduler, Priority.BULK, release, running)
+                   for _ in range(3)]
+        self.wait_for(scheduler, Priority.BULK, 2)
+        threads += [self.start(scheduler, Priority.DEFAULT, release, running)
+                    for _ in range(2)]
+        self.wait_for(scheduler, Priority.DEFAULT, 1)
+
+        # DEFAULT and BULK share their quota, the last slot is interactive
+        threads.append(self.start(
+            scheduler, Priority.INTERACTIVE, release, running))
+        self.wait_for(scheduler, Priority.INTERACTIVE, 1)
+        assert len(running) == 4
+
+        release.set()
+        for thread in threads:
+            thread.join(10)
+        assert len(running) == 6
+        with self.assertRaises(ValueError):
+            PriorityScheduler(max_concurrency=4, default_quota=4)
+
+    def test_higher_priority_waiter_goes_first(self):
+        scheduler = PriorityScheduler(
+            max_concurrency=2, default_quota=1, bulk_quota=1)
+        first = threading.Event()
+        running = []
+        threads = [self.start(scheduler, Priority.INTERACTIVE, first, running),
+                   self.start(scheduler, Priority.DEFAULT, first, running)]
+        self.wait_for(scheduler, Priority.INTERACTIVE, 1)
+        self.wait_for(scheduler, Priority.DEFAULT, 1)
+        rest = threading.Event()
+        rest.set()
+        threads.append(self.start(scheduler, Priority.BULK, rest, running))
+        threading.Event().wait(0.05)
+        threads.append(self.start(
+            scheduler, Priority.INTERACTIVE, rest, running))
+        threading.Event().wait(0.05)
+        first.set()
+        for thread in threads:
+            thread.join(10)
+        assert running[2:] == [Priority.INTERACTIVE, Priority.BULK]
+
+
+class RecordingScheduler(PriorityScheduler):
+    def __init__(self):
+        super().__init__()
+        self.priorities = []
+
+    def call(self, send, value):
+        self.priorities.append(value)
+        return super().call(send, value)
+
+
+class PriorityTest(unittest.TestCase):
+    def setUp(self):
+        cb.init(api_key='fakeapikey', account_id='fakeaccountid',
+                namespace='fakenamespace')
+        Config.scheduler = RecordingScheduler()
+
+    def tearDown(self):
+        cb.configure_priorities(enabled=False)
+        cb.configure_hedging(enabled=False)
+
+    def test_hedge_takes_a_slot(self):
+        with FakeServer(api_key='fakeapikey', latency=0.2) as server:
+            Config.base_url = server.url
+            try:
+                server.add_document('fakenamespace', 'docs', 'd', 'bees')
+                cb.configure_hedging(delay=0.05, budget=1)
+                cb.collection('docs').search('bees')
+            finally:
+                Config.base_url = None
+        assert server.requests['/docs/search'] == 2
+        assert Config.scheduler.priorities == [Priority.INTERACTIVE] * 2
+
+    @requests_mock.mock()
+    def test_request_priorities(self, mock):
+        base = Config.get_base_url()
+        mock.register_uri('POST', f'{base}/docs/search',
+                          text=SearchResponse(refs=[]).model_dump_json())
+        mock.register_uri('POST', f'{base}/collections/delete', text='{}')
+        col = cb.collection('fakename')
+        col.search('q')
+        cb.delete_collection('a')
+        # Bulk operations and the workers of their fan-out are BULK, unless
+        # the caller set a priority
+        cb.delete_collections(['b', 'c'])
+        with cb.priority(Priority.INTERACTIVE):
+            cb.delete_collections(['d'])
+        with cb.priority(Priority.BULK):
+            col.search('q')
+        assert Config.scheduler.priorities == [
+            Priority.INTERACTIVE, Priority.DEFAULT, Priority.BULK,
+            Priority.BULK, Priority.INTERACTIVE, Priority.BULK]
+
+    @requests_mock.mock()
+    def test_extract_bulk_priority(self, mock):
+        base = Config.get_base_url()
+        mock.register_uri(
+            'POST', f'{base}/docs/extract_relevant_texts',
+            text=ExtractRelevantTextsResponse(
+                relevant_texts='t').model_dump_json())
+        mock.register_uri('POST', f'{base}/docs/search',
+                          text=SearchResponse(refs=[]).model_dump_json())
+        col = cb.collection('fakename')
+        queries = [(ExtractType.QUESTION, 'q')]
+        for _ in col.extract_bulk(['a', 'b', 'c'], queries, max_concurrency=2):
+            # The consumer keeps its priority between the results
+            col.search('q')
+        assert Counter(Config.scheduler.priorities) == {
+            Priority.BULK: 3, Priority.INTERACTIVE: 3}
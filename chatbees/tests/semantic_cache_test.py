@@ -0,0 +1,134 @@
+import unittest
+
+import requests_mock
+
+import chatbees as cb
+from chatbees.server_models.doc_api import AskResponse, AnswerReference
+from chatbees.utils.config import Config
+from chatbees.utils.semantic_cache import SemanticCache, np
+
+VOCAB = ['reset', 'password', 'billing', 'invoice', 'delete', 'account']
+
+
+def embed(question: str):
+    # Bag of words over a tiny vocabulary
+    words = question.lower().replace('?', ' ').split()
+    return [sum(w.startswith(v) for w in words) for v in VOCAB]
+
+
+@unittest.skipIf(np is None, "numpy is not installed")
+class SemanticCacheTest(unittest.TestCase):
+    def test_similar_question_hits(self):
+        cache = SemanticCache(embed, threshold=0.9)
+        cache.put('col', 'how do I reset my password', 'answer')
+        assert cache.get('col', 'password reset?') == 'answer'
+        assert cache.get('col', 'where is my invoice?') is None
+        assert cache.get('other', 'password reset?') is None
+
+        stats = cache.stats()
+        assert stats.hits == 1
+        assert stats.misses == 2
+        assert stats.hit_rate == 1 / 3
+
+    def test_lru_eviction(self):
+        cache = SemanticCache(embed, threshold=0.9, max_entries=2)
+        cache.put('col', 'reset password', 1)
+        cache.put('col', 'billing invoice', 2)
+        assert cache.get('col', 'reset password') == 1
+        cache.put('col', 'delete account', 3)
+        assert cache.get('col', 'billing invoice') is None
+        assert cache.get('col', 'reset password') == 1
+        assert cache.get('col', 'delete account') == 3
+        assert cache.stats().evictions == 1
+
+    def test_lru_partition_eviction(self):
+        cache = SemanticCache(embed, threshold=0.9, max_partitions=2)
+        cache.put('a', 'reset password', 1)
+        cache.put('a', 'billing invoice', 2)
+        cache.put('b', 'reset password', 3)
+        assert cache.get('a', 'reset password') == 1
+        cache.put('c', 'reset password', 4)
+        assert cache.get('b', 'reset password') is None
+        assert cache.get('a', 'billing invoice') == 2
+        assert cache.get('c', 'reset password') == 4
+        stats = cache.stats()
+        assert stats.entries == 3
+        assert stats.evictions == 1
+        with self.assertRaises(ValueError):
+            SemanticCache(embed, max_partitions=0)
+
+    def test_invalidate_during_load(self):
+        cache = SemanticCache(embed, threshold=0.9)
+
+        def load():
+            cache.invalidate(lambda partition: partition == 'col')
+            return 'stale'
+
+        # A response loaded across an invalidation is returned, not cached
+        assert cache.get_or_load('col', 'reset password', load) == \
+            ('stale', False)
+        assert cache.get('col', 'reset password') is None
+        assert cache.get_or_load('col', 'reset password', lambda: 'fresh') == \
+            ('fresh', False)
+        assert cache.get_or_load('col', 'password reset?', load) == \
+            ('fresh', True)
+        assert cache.stats().entries == 1
+
+    def test_grow_and_invalidate(self):
+        cache = SemanticCache(lambda q: [1.0, float(len(q))], threshold=0.999999)
+        questions = ['q' * i for i in range(1, 40)]
+        for q in questions:
+            cache.put(('ns', 'col'), q, q)
+        assert cache.stats().entries == len(questions)
+        assert cache.get(('ns', 'col'), 'q' * 20) == 'q' * 20
+        cache.invalidate(lambda partition: partition[1] == 'col')
+        assert cache.stats().entries == 0
+        assert cache.get(('ns', 'col'), 'q' * 20) is None
+
+    @requests_mock.mock()
+    def test_collection_ask(self, mock):
+        cb.init(api_key='fakeapikey', account_id='fakeaccountid',
+                namespace='fakenamespace')
+        endpoint = Config.get_base_url()
+        ask = mock.register_uri(
+            'POST',
+            f'{endpoint}/docs/ask',
+            text=AskResponse(
+                answer='click forgot password',
+                refs=[AnswerReference(doc_name="doc", page_num=1, sample_text="")],
+                request_id='id1',
+                conversation_id='id1',
+            ).model_dump_json(),
+        )
+        mock.register_uri('POST', f'{endpoint}/docs/delete')
+        mock.register_uri('POST', f'{endpoint}/docs/index_crawl')
+        mock.register_uri('POST', f'{endpoint}/collections/delete')
+
+        cb.configure_semantic_cache(embed, threshold=0.9)
+        try:
+            col = cb.collection('fakename')
+            resp = col.ask('how do I reset my password')
+            assert resp.request_id == 'id1'
+            resp = col.ask('password reset?')
+            assert resp.answer == 'click forgot password'
+            assert resp.request_id == resp.conversation_id == ''
+            assert ask.call_count == 1
+
+            # different top_k is a different partition
+            col.ask('password reset?', top_k=3)
+            assert ask.call_count == 2
+
+            # document changes invalidate the collection
+            col.delete_document('doc')
+            col.ask('password reset?')
+            assert ask.call_count == 3
+
+            # and so do crawls and deleting the collection
+            col.index_crawl('crawl')
+            col.ask('password reset?')
+            assert ask.call_count == 4
+            cb.delete_collection('fakename')
+            col.ask('password reset?')
+            assert ask.call_count == 5
+        finally:
+            cb.configure_semantic_cache(None)
@@ -0,0 +1,91 @@
+import threading
+import unittest
+
+import chatbees as cb
+from chatbees.fakeserver import FakeServer
+from chatbees.utils.config import Config
+from chatbees.utils.slow_calls import SlowCallRecorder, phase, traced
+
+
+class SlowCallRecorderTest(unittest.TestCase):
+    def test_phases_and_ring_buffer(self):
+        recorder = SlowCallRecorder(threshold=0, capacity=2)
+        for i in range(3):
+            with traced(recorder, f'/call/{i}'):
+                with phase('serialize'):
+                    pass
+                # A nested trace is part of the outer call
+                with traced(recorder, '/nested'):
+                    with phase('network'):
+                        with phase('ttfb'):
+                            pass
+        calls = recorder.records()
+        assert [call.endpoint for call in calls] == ['/call/1', '/call/2']
+        call = calls[-1]
+        assert list(call.phases) == ['serialize', 'ttfb', 'network', 'other']
+        assert abs(sum(call.phases.values()) - call.duration) < 1e-6
+        assert 'test_phases_and_ring_buffer' in call.stack.splitlines()[-2]
+        assert call.profile is None
+
+        recorder.clear()
+        assert recorder.records() == []
+
+    def test_threshold_and_profile(self):
+        recorder = SlowCallRecorder(threshold=0.05, profile_rate=1.0)
+        with traced(recorder, '/fast'):
+            pass
+        with traced(recorder, '/slow'):
+            threading.Event().wait(0.06)
+        call, = recorder.records()
+        assert call.endpoint == '/slow'
+        assert 'wait' in call.profile
+        with self.assertRaises(ValueError):
+            SlowCallRecorder(profile_rate=2)
+
+
+class SlowAskTest(unittest.TestCase):
+    def setUp(self):
+        self.server = FakeServer(api_key='fakeapikey').start()
+        cb.init(api_key='fakeapikey', account_id='fakeaccountid',
+                namespace='fakenamespace')
+        Config.base_url = self.server.url
+        self.server.add_document('fakenamespace', 'docs', 'bees.txt',
+                                 'Bees make honey.')
+
+    def tearDown(self):
+        cb.configure_slow_call_recorder(enabled=False)
+        cb.configure_hedging(enabled=False)
+        Config.base_url = None
+        self.server.stop()
+
+    def test_slow_ask(self):
+        cb.configure_slow_call_recorder(threshold=0.1)
+        self.server.latency = {'/docs/ask': 0.2}
+        col = cb.collection('docs')
+        col.search('honey')
+        assert col.ask('honey').refs[0].doc_name == 'bees.txt'
+
+        call, = cb.get_slow_calls()
+        assert call.endpoint == '/docs/ask'
+        assert call.phases['ttfb'] >= 0.2
+        for name in ('serialize', 'send', 'network', 'validate', 'other'):
+            assert name in call.phases
+        # The connection of the search was reused
+        assert call.phases.get('connect', 0) < 0.05
+        assert call.duration >= 0.2
+
+        cb.configure_slow_call_recorder(enabled=False)
+        assert cb.get_slow_calls() == []
+
+    def test_slow_hedged_search(self):
+        cb.configure_slow_call_recorder(threshold=0.1)
+        cb.configure_hedging(delay=0.05, budget=1)
+        self.server.latency = {'/docs/search': 0.2}
+        assert cb.collection('docs').search('honey')[0].doc_name == 'bees.txt'
+
+        call, = cb.get_slow_calls()
+        assert call.endpoint == '/docs/search'
+        # Both copies of the request were sent from the hedge threads
+        assert call.phases['ttfb'] >= 0.2
+        for name in ('serialize', 'send', 'network', 'validate'):
+            assert name in call.phases
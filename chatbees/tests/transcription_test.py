@@ -0,0 +1,138 @@
+import io
+import os
+import tempfile
+import unittest
+import wave
+from array import array
+
+import requests_mock
+
+import chatbees as cb
+from chatbees.server_models.doc_api import TranscribeAudioResponse
+from chatbees.utils.audio import split_audio
+from chatbees.utils.config import Config
+
+RATE = 8000
+WORD_SECONDS = 1.0
+GAP_SECONDS = 0.5
+NUM_WORDS = 40
+
+
+def word_amplitude(k: int) -> int:
+    return 1000 + 100 * k
+
+
+def write_test_wav(path: str):
+    """
+    Writes NUM_WORDS one second "words" separated by silence. Word k is a
+    square wave of amplitude word_amplitude(k).
+    """
+    samples = array('h')
+    for k in range(NUM_WORDS):
+        amp = word_amplitude(k)
+        samples.extend([amp if i % 2 == 0 else -amp
+                        for i in range(int(WORD_SECONDS * RATE))])
+        samples.extend([0] * int(GAP_SECONDS * RATE))
+    with wave.open(path, 'wb') as out:
+        out.setnchannels(1)
+        out.setsampwidth(2)
+        out.setframerate(RATE)
+        out.writeframes(samples.tobytes())
+
+
+def transcribe(wav_bytes: bytes) -> str:
+    """
+    A stand-in for the transcription endpoint: emits "start - end: word<k>"
+    for every run of sound, decoding k from its amplitude.
+    """
+    with wave.open(io.BytesIO(wav_bytes), 'rb') as wav:
+        samples = array('h', wav.readframes(wav.getnframes()))
+    lines = []
+    step = RATE // 100
+    start = None
+    for i in range(0, len(samples) + step, step):
+        frame = samples[i:i + step]
+        loud = len(frame) > 0 and max(abs(s) for s in frame) > 0
+        if loud and start is None:
+            start, amp = i, max(abs(s) for s in frame)
+        elif not loud and start is not None:
+            k = (amp - 1000) // 100
+            lines.append(f"{start / RATE:.1f} - {i / RATE:.1f}: word{k}")
+            start = None
+    return ''.join(line + '\n' for line in lines)
+
+
+class SegmentedTranscriptionTest(unittest.TestCase):
+    def setUp(self):
+        cb.init(api_key='fakeapikey', account_id='fakeaccountid',
+                namespace='fakenamespace')
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, 'audio.wav')
+        write_test_wav(self.path)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_split_on_silence(self):
+        segments = split_audio(self.path, segment_seconds=10, overlap_seconds=2)
+        assert len(segments) > 5
+        for prev, seg in zip(segments, segments[1:]):
+            # segments overlap, and cuts land in the silence between words
+            assert seg.start < prev.end
+            offset = seg.start % (WORD_SECONDS + GAP_SECONDS)
+            assert offset >= WORD_SECONDS - 0.01, seg.start
+        for seg in segments:
+            assert seg.end - seg.start <= 10 + 1e-6
+        # Segments are read from the file when they are needed
+        assert all(seg.source == self.path for seg in segments)
+        with wave.open(io.BytesIO(segments[1].read()), 'rb') as wav:
+            assert wav.getnframes() == segments[1].nframes
+            assert abs(wav.getnframes() / RATE -
+                       (segments[1].end - segments[1].start)) < 1e-6
+
+    def register(self, mock, timestamps: bool = True):
+        def transcribe_response(request, context):
+            body = request.body
+            transcript = transcribe(body[body.index(b'RIFF'):])
+            if not timestamps:
+                # Plain sentences, e.g. "Word3 word4 word5."
+                words = [line.split(': ')[1]
+                         for line in transcript.splitlines()]
+                transcript = ' '.join(words).capitalize() + '.'
+            return TranscribeAudioResponse(
+                transcript=transcript).model_dump_json()
+
+        return mock.register_uri(
+            'POST',
+            f'{Config.get_base_url()}/docs/transcribe_audio',
+            text=transcribe_response,
+        )
+
+    @requests_mock.mock()
+    def test_transcribe_segmented(self, mock):
+        endpoint = self.register(mock)
+
+        resp = cb.collection('fakename').transcribe_audio_segmented(
+            self.path, 'en', segment_seconds=10, overlap_seconds=2)
+
+        words = [line.split(': ')[1] for line in resp.transcript.splitlines()]
+        assert words == [f'word{k}' for k in range(NUM_WORDS)]
+        assert endpoint.call_count == len(resp.segments)
+        # timestamps are in source audio time
+        last = resp.transcript.splitlines()[-1]
+        expected_start = (NUM_WORDS - 1) * (WORD_SECONDS + GAP_SECONDS)
+        assert abs(float(last.split(' - ')[0]) - expected_start) < 0.1
+        assert [s.index for s in resp.segments] == list(range(len(resp.segments)))
+
+    @requests_mock.mock()
+    def test_transcribe_segmented_without_timestamps(self, mock):
+        self.register(mock, timestamps=False)
+        resp = cb.collection('fakename').transcribe_audio_segmented(
+            self.path, 'en', segment_seconds=10, overlap_seconds=2)
+
+        # The words in the overlaps are kept once
+        lines = resp.transcript.splitlines()
+        assert len(lines) == len(resp.segments)
+        words = [word.strip('.').lower()
+                 for line in lines for word in line.split()]
+        assert words == [f'word{k}' for k in range(NUM_WORDS)]
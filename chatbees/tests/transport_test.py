@@ -0,0 +1,133 @@
+import json
+import os
+import socket
+import threading
+import time
+import unittest
+from unittest import mock
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import chatbees as cb
+from chatbees.server_models.doc_api import ListDocsResponse
+from chatbees.utils.config import Config
+from chatbees.utils.dns import DnsCache
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def do_HEAD(self):
+        self.server.requests.append((self.path, dict(self.headers), b''))
+        self.send_response(200)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        self.server.requests.append((self.path, dict(self.headers), body))
+        if self.path == '/docs/list':
+            out = ListDocsResponse(doc_names=['a']).model_dump_json().encode()
+            status = 200
+        elif self.path == '/docs/add':
+            out, status = b'{}', 200
+        else:
+            out, status = b'{"detail": "no such collection"}', 404
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(out)))
+        self.end_headers()
+        self.wfile.write(out)
+
+
+class TransportTest(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.requests = []
+        self.server.connections = 0
+        self.server.lock = threading.Lock()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        cb.init(api_key='fakeapikey', account_id='fakeaccountid',
+                namespace='fakenamespace')
+        Config.base_url = f'http://127.0.0.1:{self.server.server_port}'
+        self.default_transport = Config.transport
+
+    def tearDown(self):
+        cb.configure_transport(self.default_transport)
+        Config.base_url = None
+        self.server.shutdown()
+        self.server.server_close()
+
+    def check_transport(self):
+        col = cb.collection('fakename')
+        col.list_documents()
+        path, headers, body = self.server.requests[-1]
+        assert path == '/docs/list'
+        assert headers['api-key'] == 'fakeapikey'
+        assert json.loads(body)['collection_name'] == 'fakename'
+
+        fname = f'{os.path.dirname(os.path.abspath(__file__))}/data/text_file.txt'
+        col.upload_document(fname)
+        path, headers, body = self.server.requests[-1]
+        assert path == '/docs/add'
+        assert headers['Content-Type'].startswith('multipart/form-data')
+        assert b'text_file.txt' in body and b'"collection_name"' in body
+
+        with self.assertRaises(cb.CollectionNotFound):
+            col.summarize_document('doc')
+
+    def test_requests_transport(self):
+        cb.configure_transport(cb.RequestsTransport())
+        self.check_transport()
+
+    @unittest.skipIf(httpx is None, "httpx is not installed")
+    def test_httpx_transport(self):
+        # The stand-in server only speaks HTTP/1.1
+        cb.configure_transport(cb.HttpxTransport(http2=False))
+        self.check_transport()
+
+    def test_warm_up(self):
+        Config.base_url = f'http://localhost:{self.server.server_port}'
+        cb.configure_transport(cb.RequestsTransport(pool_maxsize=4))
+        assert cb.warm_up(connections=3, keep_alive_interval=0.05) == 3
+        assert Config.transport.dns_cache is not None
+        assert self.server.connections == 3
+
+        # Requests reuse the warm connections
+        col = cb.collection('fakename')
+        for _ in range(3):
+            col.list_documents()
+        assert self.server.connections == 3
+
+        # Idle connections are refreshed
+        heads = len([r for r in self.server.requests if r[0] == '/'])
+        time.sleep(0.3)
+        assert len([r for r in self.server.requests if r[0] == '/']) > heads
+        Config.transport.stop_keep_alive()
+
+    def test_dns_cache(self):
+        now = [0.0]
+        cache = DnsCache(ttl=10, clock=lambda: now[0])
+        with mock.patch('socket.getaddrinfo', wraps=socket.getaddrinfo) as lookup:
+            addresses = cache.resolve('localhost', 80)
+            assert all(sockaddr[1] == 80 for _, sockaddr in addresses)
+            cache.resolve('localhost', 80)
+            assert lookup.call_count == 1
+            now[0] = 11
+            cache.resolve('localhost', 80)
+            assert lookup.call_count == 2
+            cache.invalidate('localhost', 80)
+            cache.resolve('localhost', 80)
+            assert lookup.call_count == 3
@@ -0,0 +1,173 @@
+import threading
+import time
+from typing import Any, Callable, Optional
+
+import requests
+
+from chatbees.utils.circuit_breaker import is_failure
+from chatbees.utils.exceptions import (
+    APIError, CircuitOpen, LimitExceeded, ServerError,
+)
+from chatbees.utils.instrumentation import metrics
+
+__all__ = ["AdaptiveLimiter"]
+
+# Errors that mean the service is overloaded
+OVERLOAD_ERRORS = (LimitExceeded, ServerError, CircuitOpen, TimeoutError,
+                   requests.Timeout, requests.ConnectionError)
+
+
+def is_overload(error: BaseException) -> bool:
+    """
+    Whether a request failed because the service is overloaded, e.g. a 429
+    or 5xx response or a timeout, rather than because of the request.
+    """
+    if isinstance(error, APIError) and error.status_code is not None:
+        return is_failure(error.status_code)
+    return isinstance(error, OVERLOAD_ERRORS)
+
+
+class AdaptiveLimiter:
+    """
+    Limits the number of concurrent requests of the bulk operations, and
+    adapts the limit to the service with AIMD (additive increase,
+    multiplicative decrease).
+
+    While requests succeed at a healthy latency and at least half the limit
+    is in use, the limit grows by one per `limit` completed requests. A
+    429 or 5xx response, LimitExceeded, CircuitOpen, timeout or connection
+    error, or a latency above `latency_tolerance` times the baseline,
+    multiplies the limit by `backoff`. Requests that started before a
+    decrease do not decrease the limit again, so a burst of failures cuts
+    it once. The baseline is a moving average of the healthy latencies.
+
+    The current limit is the "concurrency_limit" gauge, see get_metrics.
+    """
+
+    def __init__(
+        self,
+        initial: int = 8,
+        min_limit: int = 1,
+        max_limit: int = 64,
+        backoff: float = 0.5,
+        latency_tolerance: float = 2.0,
+        min_samples: int = 10,
+        smoothing: float = 0.05,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if not 1 <= min_limit <= initial <= max_limit:
+            raise ValueError("Requires 1 <= min_limit <= initial <= max_limit")
+        if not 0 < backoff < 1:
+            raise ValueError("backoff must be between 0 and 1")
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff = backoff
+        self.latency_tolerance = latency_tolerance
+        self.min_samples = min_samples
+        self.smoothing = smoothing
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._released = threading.Condition(self._lock)
+        self._limit = float(initial)
+        self._in_flight = 0
+        self._baseline: Optional[float] = None
+        self._samples = 0
+        self._last_decrease = float('-inf')
+        metrics.set_gauge("concurrency_limit", initial)
+
+    @property
+    def limit(self) -> int:
+        with self._lock:
+            return int(self._limit)
+
+    @property
+    def in_flight(self) -> int:
+        with self._lock:
+            return self._in_flight
+
+    def try_acquire(self) -> Optional[float]:
+        """
+        Takes a slot if one is free.
+
+        :return: The token to pass to release(), None if no slot is free.
+        """
+        with self._lock:
+            if self._in_flight >= int(self._limit):
+                return None
+            self._in_flight += 1
+            return self._clock()
+
+    def acquire(self, timeout: float = None) -> Optional[float]:
+        """
+        Waits for a free slot.
+
+        :return: The token to pass to release(), None if the timeout expired.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._released:
+            while self._in_flight >= int(self._limit):
+                remaining = None
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return None
+                self._released.wait(remaining)
+            self._in_flight += 1
+            return self._clock()
+
+    def release(self, token: float, error: BaseException = None,
+                cancelled: bool = False):
+        """
+        Frees the slot of a completed request and adapts the limit to its
+        outcome. A cancelled request, or one that failed for a reason other
+        than load, does not change the limit.
+        """
+        now = self._clock()
+        with self._released:
+            # The limit only grows while it is in use
+            saturated = self._in_flight * 2 >= self._limit
+            self._in_flight -= 1
+            self._released.notify()
+            if cancelled:
+                return
+            if is_overload(error):
+                self._decrease(token, now)
+            elif error is None:
+                self._observe(token, now - token, saturated)
+            limit = int(self._limit)
+        metrics.set_gauge("concurrency_limit", limit)
+
+    def call(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Calls fn in a slot, waiting for one to be free.
+        """
+        token = self.acquire()
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            self.release(token, e)
+            raise
+        self.release(token)
+        return result
+
+    def _observe(self, started: float, latency: float, saturated: bool):
+        # Caller holds self._lock
+        self._samples += 1
+        if self._baseline is None:
+            self._baseline = latency
+        elif self._samples > self.min_samples and \
+                latency > self._baseline * self.latency_tolerance:
+            self._decrease(started, started + latency)
+            return
+        else:
+            self._baseline += self.smoothing * (latency - self._baseline)
+        if saturated:
+            self._limit = min(float(self.max_limit),
+                              self._limit + 1 / self._limit)
+
+    def _decrease(self, started: float, now: float):
+        # Caller holds self._lock
+        if started < self._last_decrease:
+            return
+        self._limit = max(float(self.min_limit), self._limit * self.backoff)
+        self._last_decrease = now
@@ -1,7 +1,8 @@
 from typing import List, Tuple
 
-from chatbees.server_models.doc_api import AskRequest, AskResponse, AnswerReference
+from chatbees.server_models.doc_api import AskRequest, AskResponse
 from chatbees.utils.config import Config
+from chatbees.utils.slow_calls import phase, traced
 
 
 def ask(
@@ -13,21 +14,42 @@ def ask(
     history_messages: List[Tuple[str, str]] = None,
     conversation_id: str = None,
 ) -> AskResponse:
+    with traced(Config.slow_call_recorder, '/docs/ask'):
+        resp = post_ask(namespace_name, collection_name, question, top_k,
+                        doc_name, history_messages, conversation_id)
+        with phase('validate'):
+            # Validate the raw body, skipping the intermediate python dicts
+            return AskResponse.model_validate_json(resp.content)
+
+
+def post_ask(
+    namespace_name: str,
+    collection_name: str,
+    question: str,
+    top_k: int = 5,
+    doc_name: str = None,
+    history_messages: List[Tuple[str, str]] = None,
+    conversation_id: str = None,
+):
+    """
+    Sends an ask request and returns the unparsed HTTP response.
+    """
     url = f'{Config.get_base_url()}/docs/ask'
 
-    req = AskRequest(
-        namespace_name=namespace_name,
-        collection_name=collection_name,
-        question=question,
-        top_k=top_k,
-        doc_name=doc_name,
-        history_messages=history_messages,
-        conversation_id=conversation_id,
-    )
+    with phase('serialize'):
+        req = AskRequest(
+            namespace_name=namespace_name,
+            collection_name=collection_name,
+            question=question,
+            top_k=top_k,
+            doc_name=doc_name,
+            history_messages=history_messages,
+            conversation_id=conversation_id,
+        )
+        data = req.model_dump_json()
 
-    resp = Config.post(
+    return Config.post(
         url=url,
-        data=req.model_dump_json(),
+        data=data,
         enforce_api_key=False
     )
-    return AskResponse.model_validate(resp.json())
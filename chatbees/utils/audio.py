@@ -0,0 +1,226 @@
+import contextlib
+import io
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import wave
+from array import array
+from typing import Iterator, List, NamedTuple, Optional
+
+from chatbees.utils.file_upload import MAX_FILE_BYTES
+
+# A transcript line, e.g. "0.0 - 4.0: text"
+_LINE = re.compile(r'^\s*(\d+(?:\.\d+)?)\s*-\s*(\d+(?:\.\d+)?):\s?(.*)$')
+
+# Characters ignored when matching the words of overlapping transcripts
+_PUNCTUATION = re.compile(r'\W+')
+
+# Silence is searched in windows of this many seconds
+_FRAME_SECONDS = 0.01
+
+
+class AudioSegment(NamedTuple):
+    index: int
+    # start and end of the segment in the source audio, in seconds
+    start: float
+    end: float
+    # the WAV file the segment is read from, and its frames in the file
+    source: str
+    first_frame: int
+    nframes: int
+
+    def read(self) -> bytes:
+        """
+        Returns the segment encoded as a WAV file. Segments are read when
+        they are needed, so only the segments being sent are in memory.
+        """
+        buf = io.BytesIO()
+        with wave.open(self.source, 'rb') as wav:
+            wav.setpos(self.first_frame)
+            with wave.open(buf, 'wb') as out:
+                out.setparams(wav.getparams())
+                out.writeframes(wav.readframes(self.nframes))
+        return buf.getvalue()
+
+
+@contextlib.contextmanager
+def wav_file(path: str) -> Iterator[str]:
+    """
+    Yields the path of `path` as a WAV file. Other formats are decoded to a
+    temporary WAV file, which is removed on exit.
+    """
+    if path.lower().endswith('.wav'):
+        yield path
+        return
+    # Decode other formats with ffmpeg, which is not a python dependency
+    if shutil.which('ffmpeg') is None:
+        raise ValueError(f"Segmented transcription of {path} requires a WAV "
+                         f"file, or ffmpeg on PATH to decode it")
+    with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as tmp:
+        tmp_path = tmp.name
+    try:
+        subprocess.run(
+            ['ffmpeg', '-nostdin', '-loglevel', 'error', '-y', '-i', path,
+             '-ac', '1', '-ar', '16000', '-sample_fmt', 's16', tmp_path],
+            check=True)
+        yield tmp_path
+    finally:
+        os.remove(tmp_path)
+
+
+def _frame_energy(frames: bytes, sample_width: int) -> float:
+    if sample_width == 2:
+        samples = array('h', frames)
+    elif sample_width == 4:
+        samples = array('i', frames)
+    else:
+        # 8-bit WAV samples are unsigned
+        samples = [b - 128 for b in frames]
+    if not samples:
+        return 0.0
+    return sum(s * s for s in samples) / len(samples)
+
+
+def _quietest_frame(
+    wav: wave.Wave_read, around: int, window: int,
+) -> int:
+    """
+    Returns the frame index of the quietest 10ms slice within `window`
+    frames of `around`.
+    """
+    rate = wav.getframerate()
+    step = max(1, int(rate * _FRAME_SECONDS))
+    lo = max(0, around - window)
+    hi = min(wav.getnframes(), around + window)
+    wav.setpos(lo)
+    data = wav.readframes(hi - lo)
+    width = wav.getsampwidth() * wav.getnchannels()
+    best, best_energy = around, None
+    for offset in range(0, hi - lo - step + 1, step):
+        chunk = data[offset * width:(offset + step) * width]
+        energy = _frame_energy(chunk, wav.getsampwidth())
+        if best_energy is None or energy < best_energy:
+            best, best_energy = lo + offset + step // 2, energy
+    return best
+
+
+def split_audio(
+    path: str,
+    segment_seconds: float = 120,
+    overlap_seconds: float = 2,
+    silence_window_seconds: Optional[float] = 5,
+) -> List[AudioSegment]:
+    """
+    Splits a WAV file into overlapping segments, see wav_file for other
+    formats. The segments are read from the file by AudioSegment.read().
+
+    Each boundary is moved to the quietest point within
+    `silence_window_seconds` of the fixed boundary, so words are rarely cut;
+    None splits at fixed boundaries. Segments are shortened if needed to
+    stay below the upload size limit.
+    """
+    if overlap_seconds >= segment_seconds:
+        raise ValueError("overlap_seconds must be less than segment_seconds")
+    with wave.open(path, 'rb') as wav:
+        rate = wav.getframerate()
+        nframes = wav.getnframes()
+        frame_bytes = wav.getsampwidth() * wav.getnchannels()
+        max_frames = (MAX_FILE_BYTES - 1024) // frame_bytes
+        seg_frames = min(int(segment_seconds * rate), max_frames)
+        overlap = int(overlap_seconds * rate)
+        window = 0
+        if silence_window_seconds is not None:
+            window = min(int(silence_window_seconds * rate),
+                         (seg_frames - overlap) // 3)
+        # A cut moves at most `window` frames past cuts[-1] + step, which
+        # keeps every segment within seg_frames including its overlap.
+        step = seg_frames - overlap - window
+
+        # cut points without overlap
+        cuts = [0]
+        while nframes - cuts[-1] > step + window:
+            cut = cuts[-1] + step
+            if window > 0:
+                cut = _quietest_frame(wav, cut, window)
+            cuts.append(cut)
+        cuts.append(nframes)
+
+        segments = []
+        for index in range(len(cuts) - 1):
+            start = cuts[index]
+            end = min(nframes, cuts[index + 1] + overlap)
+            segments.append(AudioSegment(
+                index, start / rate, end / rate, path, start, end - start))
+        return segments
+
+
+def stitch_transcripts(
+    segments: List[AudioSegment], transcripts: List[str],
+) -> str:
+    """
+    Joins the transcripts of overlapping segments in order. Timestamps are
+    shifted to the source audio, and a line in the overlap of two segments is
+    kept from only one of them: from the earlier segment if it starts before
+    the middle of the overlap, otherwise from the later one.
+
+    Text without timestamps can't be placed in time. Where two segments
+    overlap, the longest run of words that ends the earlier text and starts
+    the later one, ignoring case and punctuation, is kept only once.
+    """
+    lines = []
+    # The words of the lines without timestamps kept so far
+    words = []
+    for i, (segment, transcript) in enumerate(zip(segments, transcripts)):
+        # [keep_from, keep_until) in source time
+        keep_from = 0.0
+        if i > 0:
+            keep_from = (segment.start + segments[i - 1].end) / 2
+        keep_until = float('inf')
+        if i + 1 < len(segments):
+            keep_until = (segments[i + 1].start + segment.end) / 2
+        transcript_lines = transcript.splitlines()
+        # The number of leading words of the text that repeat the overlap
+        skip = 0
+        if i > 0 and segment.start < segments[i - 1].end:
+            skip = _overlap(words, [
+                word for line in transcript_lines
+                if _LINE.match(line) is None for word in line.split()])
+        for line in transcript_lines:
+            match = _LINE.match(line)
+            if match is None:
+                line_words = line.split()
+                if skip >= len(line_words):
+                    skip -= len(line_words)
+                    continue
+                if skip > 0:
+                    line_words = line_words[skip:]
+                    line = ' '.join(line_words)
+                    skip = 0
+                lines.append(line)
+                words.extend(line_words)
+                continue
+            start = float(match.group(1)) + segment.start
+            end = float(match.group(2)) + segment.start
+            if keep_from <= start < keep_until:
+                lines.append(f"{start:.1f} - {end:.1f}: {match.group(3)}")
+    return ''.join(line + '\n' for line in lines)
+
+
+def _overlap(previous: List[str], words: List[str]) -> int:
+    """
+    The length of the longest suffix of `previous` that is a prefix of
+    `words`, ignoring case and punctuation.
+    """
+    n = min(len(previous), len(words))
+    tail = [_normalize(word) for word in previous[len(previous) - n:]]
+    head = [_normalize(word) for word in words[:n]]
+    for length in range(n, 0, -1):
+        if tail[n - length:] == head[:length]:
+            return length
+    return 0
+
+
+def _normalize(word: str) -> str:
+    return _PUNCTUATION.sub('', word.lower())
@@ -0,0 +1,189 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+from chatbees.utils.config import Config
+
+__all__ = ["TTLCache"]
+
+
+class _Entry:
+    __slots__ = ("value", "stored_at")
+
+    def __init__(self, value: Any, stored_at: float):
+        self.value = value
+        self.stored_at = stored_at
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache whose entries expire `ttl` seconds after they were
+    stored.
+
+    If `stale_ttl` is set, an expired entry is still served for up to
+    `stale_ttl` more seconds while `get_or_load` refreshes it on a background
+    thread, so callers never block on a stale-but-valid entry.
+    """
+
+    def __init__(
+        self,
+        ttl: float,
+        stale_ttl: float = 0,
+        max_size: int = 1024,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if ttl <= 0:
+            raise ValueError("ttl must be positive")
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_size = max_size
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[Hashable, _Entry] = OrderedDict()
+        self._refreshing = set()
+        # key -> [generation, loads in flight] of the keys being loaded. An
+        # invalidation bumps the generation, and the loads started before it
+        # do not store their result.
+        self._loading: Dict[Hashable, List[int]] = {}
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Returns the cached value if it has not expired, otherwise `default`.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or self._age(entry) > self.ttl:
+                return default
+            self._entries.move_to_end(key)
+            return entry.value
+
+    def put(self, key: Hashable, value: Any):
+        with self._lock:
+            self._put(key, value)
+
+    def _put(self, key: Hashable, value: Any):
+        # Caller holds self._lock
+        self._entries[key] = _Entry(value, self._clock())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """
+        Returns the cached value for `key`, calling `loader` to fill the
+        cache on a miss. Stale entries within `stale_ttl` are returned
+        immediately and refreshed in the background.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                age = self._age(entry)
+                if age <= self.ttl:
+                    self._entries.move_to_end(key)
+                    return entry.value
+                if age <= self.ttl + self.stale_ttl:
+                    self._schedule_refresh(key, loader)
+                    return entry.value
+            generation = self._start_load(key)
+        return self._load(key, loader, generation)
+
+    def invalidate(self, key: Hashable):
+        with self._lock:
+            self._entries.pop(key, None)
+            state = self._loading.get(key)
+            if state is not None:
+                state[0] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            for state in self._loading.values():
+                state[0] += 1
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def _age(self, entry: _Entry) -> float:
+        return self._clock() - entry.stored_at
+
+    def _start_load(self, key: Hashable) -> int:
+        # Caller holds self._lock
+        state = self._loading.setdefault(key, [0, 0])
+        state[1] += 1
+        return state[0]
+
+    def _load(self, key: Hashable, loader: Callable[[], Any],
+              generation: int) -> Any:
+        """
+        Calls the loader and stores its value, unless the key was
+        invalidated since the load started.
+        """
+        value = None
+        loaded = False
+        try:
+            value = loader()
+            loaded = True
+            return value
+        finally:
+            with self._lock:
+                state = self._loading[key]
+                state[1] -= 1
+                if state[1] == 0:
+                    del self._loading[key]
+                if loaded and state[0] == generation:
+                    self._put(key, value)
+
+    def _schedule_refresh(self, key: Hashable, loader: Callable[[], Any]):
+        # Caller holds self._lock
+        if key in self._refreshing:
+            return
+        self._refreshing.add(key)
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=2, thread_name_prefix="chatbees-cache-refresh")
+        self._executor.submit(
+            self._refresh, key, loader, self._start_load(key))
+
+    def _refresh(self, key: Hashable, loader: Callable[[], Any],
+                 generation: int):
+        try:
+            self._load(key, loader, generation)
+        except Exception:
+            # Keep serving the stale entry until it ages out; the next
+            # foreground miss surfaces the error to the caller.
+            pass
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+
+def _scoped_key(*parts) -> tuple:
+    return (Config.account_id, Config.namespace) + parts
+
+
+def cached_metadata(key: tuple, loader: Callable[[], Any]) -> Any:
+    """
+    Loads collection/connector metadata through `Config.metadata_cache` if
+    the cache is enabled.
+    """
+    cache = Config.metadata_cache
+    if cache is None:
+        return loader()
+    return cache.get_or_load(_scoped_key(*key), loader)
+
+
+def invalidate_metadata(collection_name: str = None):
+    """
+    Drops the cached collection list, and the cached description of
+    `collection_name` if given.
+    """
+    cache = Config.metadata_cache
+    if cache is None:
+        return
+    cache.invalidate(_scoped_key("list_collections"))
+    if collection_name is not None:
+        cache.invalidate(_scoped_key("describe_collection", collection_name))
@@ -0,0 +1,314 @@
+import json
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+import requests
+
+from chatbees.utils.cache import TTLCache
+from chatbees.utils.exceptions import CircuitOpen
+from chatbees.utils.file_upload import MultipartBody
+from chatbees.utils.instrumentation import emit, metrics
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+__all__ = ["CircuitBreaker"]
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Read endpoints whose last good response may be served while the circuit
+# is open
+FALLBACK_ENDPOINTS = frozenset([
+    "/docs/ask",
+    "/docs/search",
+    "/docs/list",
+    "/docs/summary",
+    "/docs/get_outline_faq",
+    "/docs/get_crawl",
+    "/docs/get_ingestion",
+    "/collections/list",
+    "/collections/describe",
+    "/connectors/list",
+])
+
+# Errors of a send that mean the endpoint is degraded. Other errors, e.g.
+# from encoding the request or an interrupt, do not change the circuit.
+NETWORK_ERRORS = (requests.RequestException, OSError, TimeoutError)
+if httpx is not None:
+    NETWORK_ERRORS += (httpx.TransportError,)
+
+# Fields that identify the request a response answered. They are cleared
+# in the fallback, which answers other requests.
+REQUEST_ID_FIELDS = {
+    "/docs/ask": ("request_id", "conversation_id"),
+}
+
+_COLLECTION_NAME = re.compile(rb'"collection_name":\s*"((?:[^"\\]|\\.)*)"')
+
+
+def _collection_name(body: Any) -> Optional[str]:
+    if isinstance(body, MultipartBody):
+        body = body.fields
+    if isinstance(body, dict):
+        # Multipart uploads carry the JSON request as a form field
+        body = body.get('request')
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+    if not isinstance(body, bytes):
+        return None
+    m = _COLLECTION_NAME.search(body)
+    if m is None:
+        return None
+    return json.loads(b'"' + m.group(1) + b'"')
+
+
+class _FallbackResponse:
+    """
+    A good response with a rewritten body, served while the circuit is open.
+    """
+
+    def __init__(self, response, content: bytes):
+        self._response = response
+        self.content = content
+
+    @property
+    def text(self) -> str:
+        return self.content.decode('utf-8')
+
+    def json(self, **kwargs):
+        return json.loads(self.content, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._response, name)
+
+
+def _fallback_response(endpoint: str, resp):
+    fields = REQUEST_ID_FIELDS.get(endpoint)
+    if fields is None:
+        return resp
+    try:
+        value = json.loads(resp.content)
+    except ValueError:
+        return resp
+    if not isinstance(value, dict):
+        return resp
+    value.update((field, "") for field in fields if field in value)
+    return _FallbackResponse(resp, json.dumps(value).encode('utf-8'))
+
+
+def is_failure(status_code: int) -> bool:
+    """
+    Whether a response indicates a degraded service rather than a bad
+    request.
+    """
+    return status_code >= 500 or status_code == 429
+
+
+class _Circuit:
+    __slots__ = ("state", "failures", "opened_at", "probes")
+
+    def __init__(self):
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probes = 0
+
+
+class CircuitBreaker:
+    """
+    Fails requests fast while an endpoint is degraded, instead of letting
+    every caller wait for the full request time and retry.
+
+    A circuit opens after `failure_threshold` consecutive failures, i.e.
+    connection errors, timeouts, 5xx or 429 responses. Other errors of a
+    request, e.g. while encoding it, do not change the circuit. While it is open,
+    requests raise CircuitOpen without being sent. After `reset_timeout`
+    seconds the circuit is half-open and lets `half_open_probes` requests
+    through; it closes if they succeed and opens again if they fail.
+
+    Circuits are kept per endpoint, e.g. /docs/ask, and per collection if
+    `per_collection` is set. If `fallback_ttl` is set, the last good
+    response of read endpoints is served for up to `fallback_ttl` seconds
+    while the circuit is open. A served ask response has an empty
+    request_id and conversation_id.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30,
+        half_open_probes: int = 1,
+        per_collection: bool = False,
+        fallback_ttl: float = None,
+        fallback_max_size: int = 1024,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if failure_threshold < 1:
+            raise ValueError("failure_threshold must be at least 1")
+        if half_open_probes < 1:
+            raise ValueError("half_open_probes must be at least 1")
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_probes = half_open_probes
+        self.per_collection = per_collection
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._circuits: Dict[Tuple, _Circuit] = {}
+        # State changes to emit once self._lock is released
+        self._events = []
+        self._fallback = None
+        if fallback_ttl is not None:
+            self._fallback = TTLCache(
+                fallback_ttl, max_size=fallback_max_size, clock=clock)
+
+    def state(self, endpoint: str, collection_name: str = None) -> str:
+        """
+        The state of a circuit: closed, open or half_open.
+        """
+        with self._lock:
+            circuit = self._circuits.get((endpoint, collection_name))
+            if circuit is None:
+                return CLOSED
+            self._maybe_half_open((endpoint, collection_name), circuit)
+            state = circuit.state
+        self._emit_events()
+        return state
+
+    def reset(self):
+        with self._lock:
+            self._circuits.clear()
+        if self._fallback is not None:
+            self._fallback.clear()
+
+    def call(self, send: Callable[[], Any], url: str, body: Any = None):
+        """
+        Calls `send` to send a request to `url` through the circuit of its
+        endpoint, and returns the response.
+        """
+        endpoint = urlsplit(url).path
+        key = (endpoint,
+               _collection_name(body) if self.per_collection else None)
+        fallback_key = None
+        if self._fallback is not None and endpoint in FALLBACK_ENDPOINTS \
+                and (body is None or isinstance(body, bytes)):
+            fallback_key = (url, body)
+
+        try:
+            probe = self._acquire(key)
+        except CircuitOpen:
+            if fallback_key is not None:
+                resp = self._fallback.get(fallback_key)
+                if resp is not None:
+                    metrics.incr("circuit_fallbacks", endpoint=endpoint)
+                    return resp
+            raise
+
+        try:
+            resp = send()
+        except NETWORK_ERRORS:
+            self._record(key, False, probe)
+            raise
+        except BaseException:
+            if probe:
+                self._release_probe(key)
+            raise
+        ok = not is_failure(resp.status_code)
+        self._record(key, ok, probe)
+        if ok and fallback_key is not None and resp.status_code < 300:
+            self._fallback.put(fallback_key,
+                               _fallback_response(endpoint, resp))
+        return resp
+
+    def _acquire(self, key: Tuple) -> bool:
+        """
+        Admits a request, returns whether it is a half-open probe.
+        """
+        try:
+            return self._admit(key)
+        finally:
+            self._emit_events()
+
+    def _admit(self, key: Tuple) -> bool:
+        with self._lock:
+            circuit = self._circuits.get(key)
+            if circuit is None:
+                return False
+            self._maybe_half_open(key, circuit)
+            if circuit.state == CLOSED:
+                return False
+            if circuit.state == HALF_OPEN \
+                    and circuit.probes < self.half_open_probes:
+                circuit.probes += 1
+                return True
+            retry_after = max(
+                0.0, circuit.opened_at + self.reset_timeout - self._clock())
+        metrics.incr("circuit_rejected", endpoint=key[0])
+        collection = f" of collection {key[1]}" if key[1] is not None else ""
+        raise CircuitOpen(
+            f"Circuit of {key[0]}{collection} is open, retry in "
+            f"{retry_after:.1f}s")
+
+    def _record(self, key: Tuple, ok: bool, probe: bool):
+        with self._lock:
+            circuit = self._circuits.get(key)
+            if circuit is None:
+                if ok:
+                    return
+                circuit = self._circuits[key] = _Circuit()
+            if probe:
+                circuit.probes -= 1
+                if circuit.state == HALF_OPEN:
+                    if ok:
+                        circuit.failures = 0
+                        self._transition(key, circuit, CLOSED)
+                    else:
+                        self._open(key, circuit)
+            elif circuit.state == CLOSED:
+                if ok:
+                    circuit.failures = 0
+                else:
+                    circuit.failures += 1
+                    if circuit.failures >= self.failure_threshold:
+                        self._open(key, circuit)
+            # Calls admitted before the circuit opened do not change it
+        self._emit_events()
+
+    def _release_probe(self, key: Tuple):
+        # A probe that ended without an outcome frees its slot
+        with self._lock:
+            circuit = self._circuits.get(key)
+            if circuit is not None:
+                circuit.probes -= 1
+
+    def _open(self, key: Tuple, circuit: _Circuit):
+        circuit.opened_at = self._clock()
+        self._transition(key, circuit, OPEN)
+
+    def _maybe_half_open(self, key: Tuple, circuit: _Circuit):
+        if circuit.state == OPEN \
+                and self._clock() >= circuit.opened_at + self.reset_timeout:
+            self._transition(key, circuit, HALF_OPEN)
+
+    def _transition(self, key: Tuple, circuit: _Circuit, state: str):
+        # Caller holds self._lock
+        previous, circuit.state = circuit.state, state
+        if previous == state:
+            return
+        metrics.incr("circuit_transitions", endpoint=key[0], state=state)
+        self._events.append(dict(endpoint=key[0], collection_name=key[1],
+                                 previous=previous, state=state))
+
+    def _emit_events(self):
+        # Listeners run without the lock, so they may call back into the
+        # breaker
+        with self._lock:
+            events, self._events = self._events, []
+        for fields in events:
+            emit("circuit_state_changed", **fields)
@@ -0,0 +1,54 @@
+import gzip
+from typing import Optional, Tuple
+
+from urllib3.util.request import ACCEPT_ENCODING
+
+try:
+    from compression import zstd
+except ImportError:
+    try:
+        from backports import zstd
+    except ImportError:
+        zstd = None
+
+GZIP = 'gzip'
+ZSTD = 'zstd'
+
+# Encodings the HTTP stack can decode while streaming the response body,
+# e.g. "gzip,deflate,br,zstd" depending on the installed codecs.
+SUPPORTED_ACCEPT_ENCODING = ACCEPT_ENCODING
+
+
+def validate_encoding(encoding: Optional[str]):
+    if encoding is None or encoding == GZIP:
+        return
+    if encoding == ZSTD:
+        if zstd is None:
+            raise ValueError(
+                "zstd compression requires python>=3.14 or backports.zstd")
+        return
+    raise ValueError(f"Unsupported request compression {encoding}")
+
+
+def compress_body(
+    data: bytes, encoding: Optional[str], min_size: int,
+) -> Tuple[bytes, Optional[str]]:
+    """
+    Compresses a request body with the given content encoding.
+
+    :param data: the serialized request body
+    :param encoding: gzip, zstd or None to send uncompressed
+    :param min_size: bodies smaller than this are sent uncompressed
+    :return: A tuple
+        - body: the body to send
+        - content encoding: the Content-Encoding of the body, None if the
+                            body is not compressed
+    """
+    if encoding is None or len(data) < min_size:
+        return data, None
+    if encoding == GZIP:
+        # Level 6 costs a fraction of the network time saved on JSON bodies
+        return gzip.compress(data, compresslevel=6, mtime=0), GZIP
+    if encoding == ZSTD:
+        return zstd.compress(data), ZSTD
+    raise ValueError(f"Unsupported request compression {encoding}")
@@ -0,0 +1,107 @@
+import contextvars
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterable, Iterator, NamedTuple, Optional
+
+from chatbees.utils.config import Config
+
+__all__ = ["Outcome"]
+
+
+class Outcome(NamedTuple):
+    """
+    The result of calling a function on one item of a fan-out. Exactly one of
+    `value` and `error` is set.
+    """
+    item: Any
+    value: Any = None
+    error: Optional[BaseException] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def fan_out(
+    fn: Callable[[Any], Any],
+    items: Iterable[Any],
+    max_concurrency: int,
+    timeout: Optional[float] = None,
+) -> Iterator[Outcome]:
+    """
+    Calls `fn` on every item from worker threads, with at most
+    `max_concurrency` calls in flight, and yields the outcomes as they
+    complete. Items are pulled from `items` lazily, so it can be a generator
+    over a large input.
+
+    If configure_adaptive_concurrency() is used, calls also take a slot of
+    the shared AdaptiveLimiter while they run, so the calls in flight are at
+    most its current limit across all fan-outs. Workers wait for a slot,
+    never the consumer of the outcomes.
+
+    An item that has not completed `timeout` seconds after it was submitted,
+    including the wait for a slot, yields
+    an Outcome with a TimeoutError; its call is abandoned, not interrupted.
+    Closing the returned generator cancels the items that have not started.
+    """
+    if max_concurrency < 1:
+        raise ValueError("max_concurrency must be at least 1")
+    limiter = Config.concurrency_limiter
+    items = iter(items)
+    executor = ThreadPoolExecutor(
+        max_workers=max_concurrency, thread_name_prefix="chatbees-fan-out")
+    # future -> (item, deadline)
+    in_flight: Dict[Future, tuple] = {}
+    # timed out calls that still occupy a worker thread
+    abandoned = set()
+    exhausted = False
+
+    def call(item):
+        # The slot is taken and released on the worker thread, so it is only
+        # busy, and its latency only measured, while fn runs.
+        if limiter is None:
+            return fn(item)
+        return limiter.call(fn, item)
+
+    try:
+        while True:
+            abandoned = {f for f in abandoned if not f.done()}
+            while (not exhausted and
+                   len(in_flight) + len(abandoned) < max_concurrency):
+                try:
+                    item = next(items)
+                except StopIteration:
+                    exhausted = True
+                    break
+                deadline = None if timeout is None else time.monotonic() + timeout
+                # Calls run in the context of the caller, e.g. its priority
+                future = executor.submit(contextvars.copy_context().run, call, item)
+                in_flight[future] = (item, deadline)
+            if not in_flight and (exhausted or not abandoned):
+                return
+
+            wait_for = None
+            if in_flight and timeout is not None:
+                nearest = min(deadline for _, deadline in in_flight.values())
+                wait_for = max(0.0, nearest - time.monotonic())
+            done, _ = wait(set(in_flight) | abandoned, timeout=wait_for,
+                           return_when=FIRST_COMPLETED)
+            for future in done:
+                if future not in in_flight:
+                    continue
+                item, _ = in_flight.pop(future)
+                error = future.exception()
+                if error is None:
+                    yield Outcome(item, value=future.result())
+                else:
+                    yield Outcome(item, error=error)
+
+            now = time.monotonic()
+            for future, (item, deadline) in list(in_flight.items()):
+                if deadline is not None and deadline <= now and not future.done():
+                    del in_flight[future]
+                    abandoned.add(future)
+                    yield Outcome(item, error=TimeoutError(
+                        f"{item} did not complete in {timeout}s"))
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
@@ -1,7 +1,11 @@
-import requests
 import os
+from urllib.parse import urlsplit
 
+from .compression import SUPPORTED_ACCEPT_ENCODING, compress_body
 from .exceptions import raise_for_error
+from .priority import current_priority
+from .slow_calls import phase, traced
+from .transport import RequestsTransport, Transport
 
 ENV_TEST_BASE_URL = os.environ.get("ENV_TEST_BASE_URL", "")
 
@@ -10,6 +14,38 @@ class Config:
     account_id: str
     PUBLIC_NAMESPACE: str = "public"
     namespace: str = PUBLIC_NAMESPACE
+    # Overrides the service URL, e.g. to point at a local stand-in server
+    base_url: str = None
+    # TTLCache for collection and connector metadata, disabled if None
+    metadata_cache = None
+    # SemanticCache in front of Collection.ask and search, disabled if None
+    semantic_cache = None
+    # DiskCache for document summaries and outlines/FAQs, disabled if None
+    document_cache = None
+    # ResponseCache for search, ask and summaries, disabled if None
+    response_cache = None
+    # Seconds a cached search or ask response is used, forever if None
+    response_cache_ttl: float = None
+    # Content-Encoding of request bodies (gzip or zstd), None to disable
+    request_compression: str = None
+    # Request bodies smaller than this are always sent uncompressed
+    compression_min_size: int = 1024
+    # Response encodings to accept, None for no compression
+    accept_encoding: str = SUPPORTED_ACCEPT_ENCODING
+    # Sends every request of the client
+    transport: Transport = RequestsTransport()
+    # CircuitBreaker in front of the transport, disabled if None
+    circuit_breaker = None
+    # Hedger of idempotent read requests, disabled if None
+    hedger = None
+    # FeedbackBuffer that sends feedback in the background, disabled if None
+    feedback_buffer = None
+    # AdaptiveLimiter of the bulk operations, disabled if None
+    concurrency_limiter = None
+    # PriorityScheduler of the requests in flight, disabled if None
+    scheduler = None
+    # SlowCallRecorder of the calls above a latency threshold, disabled if None
+    slow_call_recorder = None
 
     @classmethod
     def validate_setup(cls):
@@ -18,6 +54,8 @@ class Config:
 
     @classmethod
     def get_base_url(cls):
+        if cls.base_url is not None:
+            return cls.base_url
         if ENV_TEST_BASE_URL == 'preprod':
             return f"https://{cls.account_id}.preprod.aws.chatbees.ai"
         if ENV_TEST_BASE_URL.find("localhost") >= 0:
@@ -25,14 +63,25 @@ class Config:
         return f"https://{cls.account_id}.us-west-2.aws.chatbees.ai"
 
     @classmethod
-    def post(cls, url, data=None, files=None, enforce_api_key=True):
+    def post(cls, url, data=None, files=None, enforce_api_key=True, timeout=None,
+             headers=None):
         if enforce_api_key and (cls.api_key is None or cls.api_key == ""):
             raise ValueError(f"API key is required for using ChatBees, current config {cls.api_key}")
-        # Encode data if it is a string
-        if data is not None and isinstance(data, str):
-            data = data.encode('utf-8')
-        resp = requests.post(
-            url, data=data, files=files, headers=cls._construct_header())
+        with traced(cls.slow_call_recorder, urlsplit(url).path):
+            headers = {**cls._construct_header(), **(headers or {})}
+            with phase('serialize'):
+                # Encode data if it is a string
+                if data is not None and isinstance(data, str):
+                    data = data.encode('utf-8')
+                # Multipart bodies carry already compressed documents, only
+                # compress the JSON requests.
+                body = data
+                if isinstance(data, bytes) and files is None:
+                    body, encoding = compress_body(
+                        data, cls.request_compression, cls.compression_min_size)
+                    if encoding is not None:
+                        headers['Content-Encoding'] = encoding
+            resp = cls._send('POST', url, data, body, files, headers, timeout)
         raise_for_error(resp)
         return resp
 
@@ -41,10 +90,56 @@ class Config:
         if cls.api_key is None or cls.api_key == "":
             raise ValueError("API key is required for using ChatBees")
 
-        resp = requests.get(url, headers=cls._construct_header())
+        with traced(cls.slow_call_recorder, urlsplit(url).path):
+            resp = cls._send('GET', url, headers=cls._construct_header())
         raise_for_error(resp)
         return resp
 
+    @classmethod
+    def _send(cls, method, url, data=None, body=None, files=None, headers=None,
+              timeout=None):
+        """
+        Sends a request through the transport. `data` is the request before
+        compression, `body` what is sent.
+        """
+        def send():
+            with phase('network'):
+                return cls.transport.send(
+                    method, url, body=body, files=files, headers=headers,
+                    timeout=timeout)
+
+        # Every transport send takes a slot, the hedge of a request too
+        scheduler = cls.scheduler
+        if scheduler is not None:
+            scheduled_send = send
+            value = current_priority(urlsplit(url).path)
+
+            def send():
+                return scheduler.call(scheduled_send, value)
+
+        hedger = cls.hedger
+        if hedger is not None:
+            endpoint = urlsplit(url).path
+            if endpoint in hedger.endpoints:
+                transport_send = send
+
+                def send():
+                    return hedger.call(transport_send, endpoint)
+
+        breaker = cls.circuit_breaker
+        if breaker is not None:
+            breaker_send = send
+
+            def send():
+                return breaker.call(breaker_send, url, data)
+
+        return send()
+
     @classmethod
     def _construct_header(cls):
-        return None if cls.api_key is None else {'api-key': cls.api_key}
+        headers = {
+            'Accept-Encoding': cls.accept_encoding or 'identity',
+        }
+        if cls.api_key is not None:
+            headers['api-key'] = cls.api_key
+        return headers
@@ -0,0 +1,68 @@
+import hashlib
+import os
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional
+
+__all__ = ["find_duplicate_files"]
+
+# The size of the chunks files are hashed in
+HASH_CHUNK_BYTES = 1024 * 1024
+
+
+def content_digest(path: str) -> Optional[str]:
+    """
+    Returns the SHA-256 of the content of a file, None if it can't be read.
+    """
+    digest = hashlib.sha256()
+    try:
+        with open(os.path.expanduser(path), 'rb') as f:
+            while chunk := f.read(HASH_CHUNK_BYTES):
+                digest.update(chunk)
+    except OSError:
+        return None
+    return digest.hexdigest()
+
+
+def find_duplicate_files(
+    paths: Iterable[str], max_concurrency: int = 8,
+) -> List[List[str]]:
+    """
+    Finds the local files with byte-identical content. Only files that share
+    their size with another file are read, and they are hashed concurrently.
+    Files that can't be read are left out.
+
+    :param paths: Local file paths.
+    :param max_concurrency: the max number of files hashed at once
+    :return: The groups of paths with the same content, each in the order of
+             `paths`, ordered by their first path. Unique files are not in
+             any group.
+    """
+    if max_concurrency < 1:
+        raise ValueError("max_concurrency must be at least 1")
+    order: Dict[str, int] = {}
+    by_size: Dict[int, List[str]] = defaultdict(list)
+    for path in paths:
+        if path in order:
+            continue
+        order[path] = len(order)
+        try:
+            by_size[os.path.getsize(os.path.expanduser(path))].append(path)
+        except OSError:
+            continue
+    candidates = [path for group in by_size.values() if len(group) > 1
+                  for path in group]
+    if not candidates:
+        return []
+
+    with ThreadPoolExecutor(
+            max_workers=min(max_concurrency, len(candidates)),
+            thread_name_prefix="chatbees-hash") as executor:
+        digests = list(executor.map(content_digest, candidates))
+    by_digest: Dict[str, List[str]] = defaultdict(list)
+    for path, digest in zip(candidates, digests):
+        if digest is not None:
+            by_digest[digest].append(path)
+    groups = [sorted(group, key=order.__getitem__)
+              for group in by_digest.values() if len(group) > 1]
+    return sorted(groups, key=lambda group: order[group[0]])
@@ -0,0 +1,180 @@
+import contextlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Iterator, Optional
+
+from chatbees.utils.response_cache import ResponseCache
+
+__all__ = ["DiskCache"]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    tag TEXT NOT NULL,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_tag ON entries (tag);
+CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access);
+CREATE TABLE IF NOT EXISTS generations (
+    name TEXT PRIMARY KEY,
+    generation INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO meta (name, value)
+    SELECT 'total_bytes', COALESCE(SUM(size), 0) FROM entries;
+"""
+
+
+class DiskCache(ResponseCache):
+    """
+    A size-bounded key-value cache in a SQLite file, shared safely by all
+    threads and processes on the host that open the same path, e.g. the
+    workers of a gunicorn server. Put it on a tmpfs such as /dev/shm to keep
+    it in memory.
+
+    Every entry has a tag, e.g. the collection it belongs to, so related
+    entries can be dropped together. Generations are counters that callers
+    fold into their keys: bumping a generation makes every key built from the
+    old value unreachable, even if another process is about to store a result
+    computed before the bump. When the cache exceeds `max_bytes`, the least
+    recently read entries are evicted.
+
+    Reads do not take the write lock of the file. The last access of an
+    entry is only written when it is more than `access_resolution` seconds
+    old, so recency is tracked to that resolution.
+    """
+
+    def __init__(self, path: str, max_bytes: int = 256 * 1024 * 1024,
+                 access_resolution: float = 60):
+        self.path = os.path.expanduser(path)
+        self.max_bytes = max_bytes
+        self.access_resolution = access_resolution
+        self._local = threading.local()
+        dirname = os.path.dirname(self.path)
+        if dirname:
+            os.makedirs(dirname, exist_ok=True)
+        conn = self._conn()
+        with conn:
+            conn.executescript(_SCHEMA)
+
+    def get(self, key: str) -> Optional[bytes]:
+        conn = self._conn()
+        row = conn.execute(
+            "SELECT value, last_access FROM entries WHERE key = ?",
+            (key,)).fetchone()
+        if row is None:
+            return None
+        now = time.time()
+        if now - row[1] > self.access_resolution:
+            with conn:
+                conn.execute(
+                    "UPDATE entries SET last_access = ? WHERE key = ?",
+                    (now, key))
+        return row[0]
+
+    def put(self, key: str, value: bytes, tag: str = ""):
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (key, tag, value, size, last_access) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, tag, value, len(value), time.time()))
+            self._add_bytes(conn, len(value) - (0 if row is None else row[0]))
+            self._evict(conn)
+
+    def delete(self, key: str):
+        with self._transaction() as conn:
+            self._delete(conn, "key = ?", key)
+
+    def delete_tag(self, tag: str):
+        with self._transaction() as conn:
+            self._delete(conn, "tag = ?", tag)
+
+    def clear(self):
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM entries")
+            conn.execute(
+                "UPDATE meta SET value = 0 WHERE name = 'total_bytes'")
+
+    def generation(self, name: str) -> int:
+        row = self._conn().execute(
+            "SELECT generation FROM generations WHERE name = ?",
+            (name,)).fetchone()
+        return 0 if row is None else row[0]
+
+    def bump_generation(self, name: str) -> int:
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                "INSERT INTO generations (name, generation) VALUES (?, 1) "
+                "ON CONFLICT (name) DO UPDATE SET generation = generation + 1",
+                (name,))
+            return conn.execute(
+                "SELECT generation FROM generations WHERE name = ?",
+                (name,)).fetchone()[0]
+
+    def size(self) -> int:
+        return self._total_bytes(self._conn())
+
+    @contextlib.contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        # Take the write lock up front, a transaction that reads before it
+        # writes could not upgrade its lock if another process wrote since
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            yield conn
+
+    @staticmethod
+    def _total_bytes(conn: sqlite3.Connection) -> int:
+        return conn.execute(
+            "SELECT value FROM meta WHERE name = 'total_bytes'").fetchone()[0]
+
+    @staticmethod
+    def _add_bytes(conn: sqlite3.Connection, nbytes: int):
+        conn.execute(
+            "UPDATE meta SET value = value + ? WHERE name = 'total_bytes'",
+            (nbytes,))
+
+    def _delete(self, conn: sqlite3.Connection, where: str, arg: str):
+        freed = conn.execute(
+            f"SELECT COALESCE(SUM(size), 0) FROM entries WHERE {where}",
+            (arg,)).fetchone()[0]
+        conn.execute(f"DELETE FROM entries WHERE {where}", (arg,))
+        self._add_bytes(conn, -freed)
+
+    def _evict(self, conn: sqlite3.Connection):
+        total = self._total_bytes(conn)
+        if total <= self.max_bytes:
+            return
+        freed = 0
+        victims = []
+        for key, size in conn.execute(
+                "SELECT key, size FROM entries ORDER BY last_access"):
+            victims.append((key,))
+            freed += size
+            if total - freed <= self.max_bytes:
+                break
+        conn.executemany("DELETE FROM entries WHERE key = ?", victims)
+        self._add_bytes(conn, -freed)
+
+    def _conn(self) -> sqlite3.Connection:
+        # sqlite3 connections cannot be shared between threads, and must not
+        # be inherited by forked worker processes.
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30)
+            # WAL lets readers proceed while another process writes
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
@@ -0,0 +1,74 @@
+import socket
+import threading
+import time
+from typing import Callable, Dict, List, Tuple
+
+__all__ = ["DnsCache"]
+
+
+class _Resolved:
+    __slots__ = ("addresses", "resolved_at", "start")
+
+    def __init__(self, addresses: List[Tuple], resolved_at: float):
+        self.addresses = addresses
+        self.resolved_at = resolved_at
+        self.start = 0
+
+    def rotate(self) -> List[Tuple]:
+        # Spreads new connections over the addresses of the host
+        start = self.start
+        self.start = (start + 1) % len(self.addresses)
+        return self.addresses[start:] + self.addresses[:start]
+
+
+class DnsCache:
+    """
+    Caches DNS resolutions for `ttl` seconds, so new connections to the
+    service do not pay for a DNS lookup every time.
+    """
+
+    def __init__(self, ttl: float = 300, clock: Callable[[], float] = time.monotonic):
+        if ttl <= 0:
+            raise ValueError("ttl must be positive")
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries: Dict[Tuple[str, int], _Resolved] = {}
+
+    def resolve(self, host: str, port: int) -> List[Tuple]:
+        """
+        Returns the (family, sockaddr) addresses of host and port, in the
+        order to try them. Raises socket.gaierror if the host cannot be
+        resolved.
+        """
+        key = (host, port)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None \
+                    and self._clock() - entry.resolved_at <= self.ttl:
+                return entry.rotate()
+        entry = self._lookup(host, port)
+        with self._lock:
+            self._entries[key] = entry
+            return entry.rotate()
+
+    def prefetch(self, host: str, port: int):
+        """
+        Resolves host and port ahead of the first connection.
+        """
+        entry = self._lookup(host, port)
+        with self._lock:
+            self._entries[(host, port)] = entry
+
+    def invalidate(self, host: str, port: int):
+        with self._lock:
+            self._entries.pop((host, port), None)
+
+    def _lookup(self, host: str, port: int) -> _Resolved:
+        infos = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        # Keep the resolver's order, without duplicates
+        addresses = list(dict.fromkeys(
+            (family, sockaddr) for family, _, _, _, sockaddr in infos))
+        if not addresses:
+            raise socket.gaierror(f"No addresses for {host}")
+        return _Resolved(addresses, self._clock())
@@ -11,6 +11,7 @@ __all__ = [
     "ServerError",
     "APIError",
     "Unimplemented",
+    "CircuitOpen",
 ]
 
 
@@ -35,13 +36,24 @@ class ServerError(Exception):
 
 
 class APIError(Exception):
-    pass
+    def __init__(self, message: str, status_code: int = None):
+        super().__init__(message)
+        # The HTTP status of the response, if the error is from a response
+        self.status_code = status_code
 
 
 class Unimplemented(Exception):
     pass
 
 
+class CircuitOpen(Exception):
+    """
+    The request was not sent because the circuit breaker of its endpoint is
+    open, see configure_circuit_breaker.
+    """
+    pass
+
+
 def _get_reason(response: requests.Response):
     try:
         reason = json.loads(response.content)
@@ -75,4 +87,4 @@ def raise_for_error(response: requests.Response):
             if response.status_code >= 400:
                 raise APIError(
                     f"{response.status_code}: {_get_reason(response)} "
-                    f"from {response.request.url}")
+                    f"from {response.request.url}", response.status_code)
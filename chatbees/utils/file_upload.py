@@ -1,8 +1,17 @@
 import contextlib
 import os
+from collections import deque
+from typing import Dict, Iterator, Optional
 from urllib import parse
 
 import requests
+from urllib3.fields import RequestField
+from urllib3.filepost import choose_boundary
+
+# The max size of an uploaded file
+MAX_FILE_BYTES = 9_500_000
+# The size of the chunks an upload body is read and sent in
+UPLOAD_CHUNK_BYTES = 64 * 1024
 
 
 def is_url(path):
@@ -14,13 +23,135 @@ def validate_url_file(url):
     with contextlib.suppress(Exception):
         resp = requests.request('HEAD', url)
         nbytes = int(resp.headers.get("Content-Length"))
-        if nbytes > 9_500_000:
+        if nbytes > MAX_FILE_BYTES:
             raise ValueError(f"File {url} exceeds size limit 9.5MB, "
                              f"actual size {nbytes} bytes")
 
 
 def validate_file(path: str):
     nbyte = os.path.getsize(path)
-    if nbyte > 9_500_000:
+    if nbyte > MAX_FILE_BYTES:
         raise ValueError(f"File {path} exceeds size limit 9.5MB, actual size "
-                         f"{nbyte} bytes")
\ No newline at end of file
+                         f"{nbyte} bytes")
+
+def validate_size(name: str, nbytes: int):
+    if nbytes > MAX_FILE_BYTES:
+        raise ValueError(f"Document {name} exceeds size limit 9.5MB, "
+                         f"actual size {nbytes} bytes")
+
+
+def stream_size(fileobj) -> Optional[int]:
+    """
+    Returns the bytes left in a seekable stream without reading them, None
+    if the stream is not seekable.
+    """
+    try:
+        if hasattr(fileobj, 'seekable') and not fileobj.seekable():
+            return None
+        position = fileobj.tell()
+        end = fileobj.seek(0, os.SEEK_END)
+        fileobj.seek(position)
+    except (AttributeError, OSError, ValueError):
+        return None
+    return max(0, end - position)
+
+
+def read_at_most(fileobj, limit: int) -> bytes:
+    """
+    Reads a stream to its end or to `limit` bytes, whichever comes first.
+    """
+    chunks = []
+    remaining = limit
+    while remaining > 0:
+        chunk = fileobj.read(min(remaining, UPLOAD_CHUNK_BYTES))
+        if not chunk:
+            break
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return b''.join(chunks)
+
+
+class MultipartBody:
+    """
+    A multipart/form-data request body of form fields and a file, read in
+    chunks while it is sent. The file content, bytes-like or a binary stream
+    of `size` bytes, is sent as it is instead of being copied into the body,
+    and streams are read one chunk at a time.
+
+    The body has a length, so it is sent with a Content-Length instead of
+    chunked. It can be sent once.
+    """
+
+    def __init__(self, fields: Dict[str, str], name: str, filename: str,
+                 content, size: int = None):
+        self.fields = fields
+        self.boundary = choose_boundary()
+        head = [self._part_header(RequestField(key, value)) +
+                value.encode('utf-8') + b'\r\n'
+                for key, value in fields.items()]
+        head.append(self._part_header(RequestField(name, b'', filename)))
+        tail = f'\r\n--{self.boundary}--\r\n'.encode('latin-1')
+        if isinstance(content, (bytes, bytearray, memoryview)):
+            content = memoryview(content).cast('B')
+            size = content.nbytes
+        elif size is None:
+            raise ValueError("The size of a streamed file is required")
+        self._filename = filename
+        self._remaining = size
+        head = memoryview(b''.join(head))
+        self._parts = deque([head, content, memoryview(tail)] if size
+                            else [head, memoryview(tail)])
+        self._length = len(head) + size + len(tail)
+
+    @property
+    def content_type(self) -> str:
+        return f'multipart/form-data; boundary={self.boundary}'
+
+    def _part_header(self, field: RequestField) -> bytes:
+        field.make_multipart()
+        return f'--{self.boundary}\r\n'.encode('latin-1') + \
+            field.render_headers().encode('utf-8')
+
+    def __len__(self) -> int:
+        return self._length
+
+    def read(self, size: int = -1):
+        """
+        Returns up to `size` bytes of the body, all of it if size < 0. A
+        chunk of a single part is returned as a memoryview of it.
+        """
+        if size is None or size < 0:
+            size = self._length
+        chunks = []
+        while size > 0 and self._parts:
+            part = self._parts[0]
+            if isinstance(part, memoryview):
+                chunk = part[:size]
+                if len(chunk) == len(part):
+                    self._parts.popleft()
+                else:
+                    self._parts[0] = part[len(chunk):]
+            else:
+                chunk = part.read(min(size, self._remaining))
+                if isinstance(chunk, str):
+                    raise TypeError(f"{self._filename} must be opened in "
+                                    f"binary mode")
+                if not chunk:
+                    raise ValueError(f"{self._filename} ended before its "
+                                     f"{self._remaining} remaining bytes")
+                self._remaining -= len(chunk)
+                if self._remaining == 0:
+                    self._parts.popleft()
+            if len(chunk):
+                chunks.append(chunk)
+                size -= len(chunk)
+        if len(chunks) == 1:
+            return chunks[0]
+        return b''.join(chunks)
+
+    def __iter__(self) -> Iterator[bytes]:
+        while True:
+            chunk = self.read(UPLOAD_CHUNK_BYTES)
+            if not chunk:
+                return
+            yield chunk
@@ -0,0 +1,190 @@
+import contextvars
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from chatbees.utils.circuit_breaker import is_failure
+from chatbees.utils.instrumentation import metrics
+
+__all__ = ["Hedger"]
+
+# Idempotent read endpoints that are safe to send twice
+HEDGED_ENDPOINTS = frozenset([
+    "/docs/search",
+    "/docs/list",
+    "/collections/describe",
+    "/docs/get_ingestion",
+    "/docs/get_crawl",
+])
+
+
+def _succeeded(future) -> bool:
+    return future.exception() is None and \
+        not is_failure(future.result().status_code)
+
+
+class _Latencies:
+    """
+    A window of the most recent latencies of an endpoint, with a cached
+    percentile that is recomputed every `refresh` samples.
+    """
+
+    def __init__(self, window: int, refresh: int):
+        self.samples = deque(maxlen=window)
+        self.refresh = refresh
+        self.since_refresh = 0
+        self.cached: Optional[float] = None
+
+    def add(self, latency: float):
+        self.samples.append(latency)
+        self.since_refresh += 1
+
+    def percentile(self, p: float, min_samples: int) -> Optional[float]:
+        if len(self.samples) < min_samples:
+            return None
+        if self.cached is None or self.since_refresh >= self.refresh:
+            ordered = sorted(self.samples)
+            self.cached = ordered[min(len(ordered) - 1,
+                                      int(len(ordered) * p / 100))]
+            self.since_refresh = 0
+        return self.cached
+
+
+class Hedger:
+    """
+    Sends a duplicate of a slow idempotent read request and returns
+    whichever response arrives first.
+
+    The duplicate is sent `delay` seconds after the original, or after the
+    observed `percentile` latency of the endpoint if `delay` is None. Every
+    request earns `budget` hedge tokens and every hedge spends one, so
+    hedges add at most `budget` times the read load. The first successful
+    response wins; an error or a 5xx or 429 response only wins if the other
+    copy fails too. The other request is abandoned: its response is
+    discarded when it arrives. A request that
+    can't be hedged, because the latency is not known yet or the budget is
+    spent, is sent on the calling thread.
+    """
+
+    def __init__(
+        self,
+        delay: float = None,
+        budget: float = 0.1,
+        percentile: float = 95,
+        endpoints: Iterable[str] = HEDGED_ENDPOINTS,
+        min_samples: int = 20,
+        window: int = 1000,
+        max_workers: int = 64,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if budget < 0:
+            raise ValueError("budget must not be negative")
+        self.delay = delay
+        self.budget = budget
+        self.percentile = percentile
+        self.endpoints = frozenset(endpoints)
+        self.min_samples = min_samples
+        self.window = window
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._latencies: Dict[str, _Latencies] = {}
+        # Hedges may burst up to the tokens earned by 10 requests
+        self._max_tokens = max(1.0, budget * 10)
+        self._tokens = self._max_tokens
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="chatbees-hedge")
+
+    def hedge_delay(self, endpoint: str) -> Optional[float]:
+        """
+        Seconds to wait before hedging a request, None if the endpoint has
+        not seen enough requests to estimate its latency yet.
+        """
+        if self.delay is not None:
+            return self.delay
+        with self._lock:
+            latencies = self._latencies.get(endpoint)
+            if latencies is None:
+                return None
+            return latencies.percentile(self.percentile, self.min_samples)
+
+    def win_rate(self, endpoint: str) -> float:
+        """
+        The fraction of hedges whose response arrived first.
+        """
+        snapshot = metrics.snapshot()
+
+        def count(name: str) -> float:
+            return sum(value for labels, value in snapshot.get(name, [])
+                       if labels.get("endpoint") == endpoint)
+
+        sent = count("hedges_sent")
+        return count("hedges_won") / sent if sent else 0.0
+
+    def call(self, send: Callable[[], Any], endpoint: str):
+        """
+        Calls `send`, and calls it a second time if the first call has not
+        returned after the hedge delay of `endpoint`.
+        """
+        delay = self.hedge_delay(endpoint)
+        with self._lock:
+            self._tokens = min(self._max_tokens, self._tokens + self.budget)
+            can_hedge = self._tokens >= 1
+        if delay is None or not can_hedge:
+            # No hedge can be sent, the request stays on the calling thread
+            return self._timed(send, endpoint)
+        primary = self._submit(send, endpoint)
+        done, _ = wait([primary], timeout=delay)
+        if done or not self._take_token():
+            return primary.result()
+
+        metrics.incr("hedges_sent", endpoint=endpoint)
+        hedge = self._submit(send, endpoint)
+        pending = {primary, hedge}
+        while True:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            # Prefer a successful response over a failure, and the primary
+            # on a tie
+            ok = [f for f in (primary, hedge) if f in done and _succeeded(f)]
+            if not ok and pending:
+                continue
+            winner = ok[0] if ok else primary
+            if winner is hedge:
+                metrics.incr("hedges_won", endpoint=endpoint)
+            for loser in pending:
+                loser.cancel()
+            return winner.result()
+
+    def _take_token(self) -> bool:
+        with self._lock:
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+    def _submit(self, send: Callable[[], Any], endpoint: str):
+        # The request runs in the context of the caller, e.g. its slow call
+        # trace
+        return self._executor.submit(
+            contextvars.copy_context().run, self._timed, send, endpoint)
+
+    def _timed(self, send: Callable[[], Any], endpoint: str):
+        # The latency starts when the request does, not when it is queued
+        start = self._clock()
+        resp = send()
+        # Failures may return early, only successful responses set the delay
+        if not is_failure(resp.status_code):
+            self._record(endpoint, self._clock() - start)
+        return resp
+
+    def _record(self, endpoint: str, latency: float):
+        with self._lock:
+            latencies = self._latencies.get(endpoint)
+            if latencies is None:
+                latencies = self._latencies[endpoint] = _Latencies(
+                    self.window, refresh=max(1, self.window // 20))
+            latencies.add(latency)
+
+    def close(self):
+        self._executor.shutdown(wait=False)
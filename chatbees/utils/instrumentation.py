@@ -0,0 +1,103 @@
+import threading
+import time
+from typing import Any, Callable, Dict, List, NamedTuple, Tuple
+
+__all__ = [
+    "Event",
+    "add_event_listener",
+    "remove_event_listener",
+    "get_metrics",
+]
+
+
+class Event(NamedTuple):
+    """
+    An event of the client, e.g. a circuit breaker changing state.
+    """
+    name: str
+    fields: Dict[str, Any]
+    time: float
+
+
+_listeners: List[Callable[[Event], None]] = []
+_listeners_lock = threading.Lock()
+
+
+def add_event_listener(listener: Callable[[Event], None]):
+    """
+    Calls `listener` with every Event of the client. Listeners are called
+    synchronously on the thread that emits the event and must be fast.
+    """
+    global _listeners
+    with _listeners_lock:
+        # Copy on write, emit() iterates without the lock
+        _listeners = _listeners + [listener]
+
+
+def remove_event_listener(listener: Callable[[Event], None]):
+    global _listeners
+    with _listeners_lock:
+        _listeners = [l for l in _listeners if l is not listener]
+
+
+def emit(name: str, **fields):
+    listeners = _listeners
+    if not listeners:
+        return
+    event = Event(name, fields, time.time())
+    for listener in listeners:
+        try:
+            listener(event)
+        except Exception:
+            # A broken listener must not fail the request that emitted
+            pass
+
+
+class _Metrics:
+    """
+    Counters and gauges of the client, keyed by name and label values.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[Tuple, float] = {}
+        self._gauges: Dict[Tuple, float] = {}
+
+    @staticmethod
+    def _key(name: str, labels: Dict[str, Any]) -> Tuple:
+        return (name,) + tuple(sorted(labels.items()))
+
+    def incr(self, name: str, value: float = 1, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set_gauge(self, name: str, value: float, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self._gauges[key] = value
+
+    def snapshot(self) -> Dict[str, List[Tuple[Dict[str, Any], float]]]:
+        with self._lock:
+            items = list(self._counters.items()) + list(self._gauges.items())
+        out = {}
+        for (name, *labels), value in items:
+            out.setdefault(name, []).append((dict(labels), value))
+        return out
+
+    def clear(self):
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+
+
+metrics = _Metrics()
+
+
+def get_metrics() -> Dict[str, List[Tuple[Dict[str, Any], float]]]:
+    """
+    Returns the current value of every client metric, as a dict of metric
+    names to (labels, value) pairs, e.g.
+    {"circuit_rejected": [({"endpoint": "/docs/ask"}, 3)]}.
+    """
+    return metrics.snapshot()
@@ -0,0 +1,62 @@
+import json
+import os
+import threading
+from typing import Dict, Iterable, Iterator
+
+__all__ = ["Journal"]
+
+
+class Journal:
+    """
+    An append-only file of JSON lines that records the progress of a long
+    running operation, so it can be resumed after the process is
+    interrupted. Every record is flushed and fsynced before append() returns.
+    """
+
+    def __init__(self, path: str):
+        self.path = os.path.expanduser(path)
+        self._lock = threading.Lock()
+
+    def records(self) -> Iterator[Dict]:
+        """
+        Yields the records in the order they were appended. A truncated last
+        line, e.g. from a crash in the middle of a write, is skipped.
+        """
+        try:
+            f = open(self.path, encoding='utf-8')
+        except FileNotFoundError:
+            return
+        with f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+
+    def append(self, record: Dict):
+        line = (json.dumps(record, separators=(',', ':')) + '\n').encode()
+        with self._lock:
+            with open(self.path, 'ab+') as f:
+                # Terminate a truncated last line so it does not corrupt
+                # this record
+                if f.seek(0, os.SEEK_END) > 0:
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b'\n':
+                        line = b'\n' + line
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+
+    def compact(self, records: Iterable[Dict]):
+        """
+        Atomically replaces the journal with `records`, e.g. to drop the
+        records of completed work.
+        """
+        tmp = f"{self.path}.tmp"
+        with self._lock:
+            with open(tmp, 'w', encoding='utf-8') as f:
+                for record in records:
+                    f.write(json.dumps(record, separators=(',', ':')) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
@@ -0,0 +1,151 @@
+import contextlib
+import contextvars
+import threading
+import time
+from enum import IntEnum
+from typing import Dict, Iterator, Optional
+
+from chatbees.utils.instrumentation import metrics
+from chatbees.utils.slow_calls import phase
+
+__all__ = ["Priority", "priority"]
+
+
+class Priority(IntEnum):
+    """
+    The priority of a request. Lower values are served first.
+    """
+    INTERACTIVE = 0
+    DEFAULT = 1
+    BULK = 2
+
+
+# The priority of requests of endpoints when priority() is not used
+ENDPOINT_PRIORITIES: Dict[str, Priority] = {
+    "/docs/ask": Priority.INTERACTIVE,
+    "/docs/search": Priority.INTERACTIVE,
+    "/docs/add": Priority.BULK,
+}
+
+_current: contextvars.ContextVar[Optional[Priority]] = \
+    contextvars.ContextVar("chatbees_priority", default=None)
+
+
+@contextlib.contextmanager
+def priority(value: Priority) -> Iterator[None]:
+    """
+    Sends the requests made in the block, including the requests of bulk
+    operations started in it, with the given priority, e.g.
+
+        with cb.priority(cb.Priority.BULK):
+            col.upload_documents(paths)
+    """
+    token = _current.set(Priority(value))
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+
+@contextlib.contextmanager
+def bulk_priority() -> Iterator[None]:
+    """
+    Sends the requests made in the block with BULK priority, unless the
+    caller set a priority.
+    """
+    if _current.get() is not None:
+        yield
+        return
+    with priority(Priority.BULK):
+        yield
+
+
+def current_priority(endpoint: str) -> Priority:
+    value = _current.get()
+    if value is not None:
+        return value
+    return ENDPOINT_PRIORITIES.get(endpoint, Priority.DEFAULT)
+
+
+class PriorityScheduler:
+    """
+    Limits the requests in flight to `max_concurrency`, the connections of
+    the transport pool, and hands free slots to the highest priority
+    waiting. DEFAULT and BULK requests together use at most `default_quota`
+    slots, and BULK requests at most `bulk_quota` of them, so
+    `max_concurrency - default_quota` slots stay free for INTERACTIVE
+    requests however much other work is queued.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 32,
+        default_quota: int = 24,
+        bulk_quota: int = 16,
+    ):
+        if not 1 <= bulk_quota <= default_quota < max_concurrency:
+            raise ValueError(
+                "Requires 1 <= bulk_quota <= default_quota < max_concurrency")
+        self.max_concurrency = max_concurrency
+        self.default_quota = default_quota
+        self.bulk_quota = bulk_quota
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._in_flight = {p: 0 for p in Priority}
+        self._waiting = {p: 0 for p in Priority}
+
+    def in_flight(self, value: Priority) -> int:
+        with self._lock:
+            return self._in_flight[value]
+
+    def call(self, send, value: Priority):
+        """
+        Calls send() once a slot is free for the priority.
+        """
+        with phase('queue'):
+            self._acquire(value)
+        try:
+            return send()
+        finally:
+            self._release(value)
+
+    def _acquire(self, value: Priority):
+        with self._changed:
+            if self._can_run(value):
+                self._in_flight[value] += 1
+                return
+            start = time.monotonic()
+            self._waiting[value] += 1
+            try:
+                while not self._can_run(value):
+                    self._changed.wait()
+            finally:
+                self._waiting[value] -= 1
+            self._in_flight[value] += 1
+        metrics.incr("priority_wait_seconds", time.monotonic() - start,
+                     priority=value.name)
+
+    def _can_run(self, value: Priority) -> bool:
+        # Caller holds self._lock
+        if not self._has_slot(value):
+            return False
+        # A higher priority that is waiting for a slot goes first
+        return not any(self._waiting[p] and self._has_slot(p)
+                       for p in Priority if p < value)
+
+    def _has_slot(self, value: Priority) -> bool:
+        # Caller holds self._lock
+        if sum(self._in_flight.values()) >= self.max_concurrency:
+            return False
+        if value == Priority.INTERACTIVE:
+            return True
+        if self._in_flight[Priority.DEFAULT] + \
+                self._in_flight[Priority.BULK] >= self.default_quota:
+            return False
+        return value != Priority.BULK or \
+            self._in_flight[Priority.BULK] < self.bulk_quota
+
+    def _release(self, value: Priority):
+        with self._changed:
+            self._in_flight[value] -= 1
+            self._changed.notify_all()
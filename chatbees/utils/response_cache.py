@@ -0,0 +1,116 @@
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+__all__ = ["ResponseCache", "MemoryCache"]
+
+
+class ResponseCache(ABC):
+    """
+    The interface of the caches of API responses, e.g. search results and
+    document summaries. Keys are strings and values are bytes.
+
+    Every entry has a tag, e.g. the collection it belongs to, so related
+    entries can be dropped together. Generations are counters that callers
+    fold into their keys: bumping a generation makes every key built from the
+    old value unreachable.
+    """
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[bytes]:
+        ...
+
+    @abstractmethod
+    def put(self, key: str, value: bytes, tag: str = ""):
+        ...
+
+    @abstractmethod
+    def delete(self, key: str):
+        ...
+
+    @abstractmethod
+    def delete_tag(self, tag: str):
+        ...
+
+    @abstractmethod
+    def clear(self):
+        ...
+
+    @abstractmethod
+    def generation(self, name: str) -> int:
+        ...
+
+    @abstractmethod
+    def bump_generation(self, name: str) -> int:
+        ...
+
+    @abstractmethod
+    def size(self) -> int:
+        """
+        The total bytes of the cached values.
+        """
+
+
+class MemoryCache(ResponseCache):
+    """
+    A size-bounded, in-process LRU cache. Use DiskCache instead to share one
+    cache between the worker processes of a host.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, Tuple[str, bytes]] = OrderedDict()
+        self._generations: Dict[str, int] = {}
+        self._size = 0
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key: str, value: bytes, tag: str = ""):
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (tag, value)
+            self._size += len(value)
+            while self._size > self.max_bytes and self._entries:
+                self._remove(next(iter(self._entries)))
+
+    def delete(self, key: str):
+        with self._lock:
+            self._remove(key)
+
+    def delete_tag(self, tag: str):
+        with self._lock:
+            for key in [k for k, (t, _) in self._entries.items() if t == tag]:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def generation(self, name: str) -> int:
+        with self._lock:
+            return self._generations.get(name, 0)
+
+    def bump_generation(self, name: str) -> int:
+        with self._lock:
+            generation = self._generations.get(name, 0) + 1
+            self._generations[name] = generation
+            return generation
+
+    def size(self) -> int:
+        with self._lock:
+            return self._size
+
+    def _remove(self, key: str):
+        # Caller holds self._lock
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._size -= len(entry[1])
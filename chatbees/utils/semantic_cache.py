@@ -0,0 +1,218 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import (
+    Any, Callable, Dict, Hashable, List, Optional, Sequence, Tuple,
+)
+
+from pydantic import BaseModel
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+__all__ = ["SemanticCache", "SemanticCacheStats"]
+
+
+class SemanticCacheStats(BaseModel):
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    entries: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups > 0 else 0.0
+
+
+class _Partition:
+    """
+    The cached questions of one collection (and one set of ask/search
+    parameters). Row i of `vectors` is the unit-length embedding of the
+    question whose response is values[i].
+    """
+
+    def __init__(self, dim: int, capacity: int):
+        self.vectors = np.zeros((capacity, dim), dtype=np.float32)
+        self.last_used = np.zeros(capacity, dtype=np.float64)
+        self.stored_at = np.zeros(capacity, dtype=np.float64)
+        self.values = [None] * capacity
+        self.size = 0
+
+    def grow(self, capacity: int):
+        vectors = np.zeros((capacity, self.vectors.shape[1]), dtype=np.float32)
+        vectors[:self.size] = self.vectors[:self.size]
+        self.vectors = vectors
+        self.last_used = np.concatenate(
+            [self.last_used, np.zeros(capacity - len(self.last_used))])
+        self.stored_at = np.concatenate(
+            [self.stored_at, np.zeros(capacity - len(self.stored_at))])
+        self.values.extend([None] * (capacity - len(self.values)))
+
+
+class SemanticCache:
+    """
+    Caches responses by question meaning rather than exact text. Questions
+    are embedded with a local `embed` function, and a lookup returns the
+    response of the most similar cached question if the cosine similarity
+    is at least `threshold`.
+
+    Each partition keeps its embeddings in one numpy matrix, so a lookup is
+    a single matrix-vector product. When a partition holds `max_entries`
+    questions, the least recently used one is evicted. When there are
+    `max_partitions` partitions, the least recently used partition is
+    evicted with all its questions.
+    """
+
+    def __init__(
+        self,
+        embed: Callable[[str], Sequence[float]],
+        threshold: float = 0.92,
+        max_entries: int = 1024,
+        max_partitions: int = 64,
+        ttl: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if np is None:
+            raise ImportError("SemanticCache requires numpy, please "
+                              "`pip install numpy`")
+        if max_entries < 1 or max_partitions < 1:
+            raise ValueError("max_entries and max_partitions must be at "
+                             "least 1")
+        self.embed = embed
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.max_partitions = max_partitions
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        # Least recently used first
+        self._partitions: "OrderedDict[Hashable, _Partition]" = OrderedDict()
+        # partition -> [generation, loads in flight] of the partitions being
+        # loaded. An invalidation bumps the generation, and the loads started
+        # before it are not cached.
+        self._loading: Dict[Hashable, List[int]] = {}
+        self._stats = SemanticCacheStats()
+
+    def get(self, partition: Hashable, question: str) -> Any:
+        """
+        Returns the response cached for the question most similar to
+        `question`, or None if no cached question is similar enough.
+        """
+        vector = self._embed(question)
+        with self._lock:
+            return self._lookup(partition, vector)
+
+    def put(self, partition: Hashable, question: str, value: Any):
+        vector = self._embed(question)
+        with self._lock:
+            self._store(partition, vector, value)
+
+    def get_or_load(
+        self, partition: Hashable, question: str, loader: Callable[[], Any],
+    ) -> Tuple[Any, bool]:
+        """
+        Returns the response cached for the question most similar to
+        `question`, or calls `loader` and caches the response it returns.
+        A response loaded while its partition was invalidated is returned
+        but not cached, since it may predate the invalidation.
+
+        :return: The response and whether it was served from the cache
+        """
+        vector = self._embed(question)
+        with self._lock:
+            value = self._lookup(partition, vector)
+            if value is not None:
+                return value, True
+            state = self._loading.setdefault(partition, [0, 0])
+            state[1] += 1
+            generation = state[0]
+        loaded = False
+        try:
+            value = loader()
+            loaded = True
+        finally:
+            with self._lock:
+                state = self._loading[partition]
+                state[1] -= 1
+                if state[1] == 0:
+                    del self._loading[partition]
+                if loaded and state[0] == generation:
+                    self._store(partition, vector, value)
+        return value, False
+
+    def invalidate(self, match: Callable[[Hashable], bool]):
+        """
+        Drops every partition for which `match(partition)` is true.
+        """
+        with self._lock:
+            for key in [k for k in self._partitions if match(k)]:
+                self._stats.entries -= self._partitions.pop(key).size
+            for key, state in self._loading.items():
+                if match(key):
+                    state[0] += 1
+
+    def clear(self):
+        with self._lock:
+            self._partitions.clear()
+            self._stats.entries = 0
+            for state in self._loading.values():
+                state[0] += 1
+
+    def stats(self) -> SemanticCacheStats:
+        with self._lock:
+            return self._stats.model_copy()
+
+    def _embed(self, question: str):
+        vector = np.asarray(self.embed(question), dtype=np.float32).ravel()
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def _lookup(self, partition: Hashable, vector) -> Any:
+        # Caller holds self._lock
+        now = self._clock()
+        part = self._partitions.get(partition)
+        if part is None or part.size == 0:
+            self._stats.misses += 1
+            return None
+        self._partitions.move_to_end(partition)
+        sims = part.vectors[:part.size] @ vector
+        if self.ttl is not None:
+            expired = part.stored_at[:part.size] < now - self.ttl
+            sims[expired] = -np.inf
+        best = int(np.argmax(sims))
+        if sims[best] < self.threshold:
+            self._stats.misses += 1
+            return None
+        part.last_used[best] = now
+        self._stats.hits += 1
+        return part.values[best]
+
+    def _store(self, partition: Hashable, vector, value: Any):
+        # Caller holds self._lock
+        now = self._clock()
+        part = self._partitions.get(partition)
+        if part is None:
+            if len(self._partitions) >= self.max_partitions:
+                _, evicted = self._partitions.popitem(last=False)
+                self._stats.entries -= evicted.size
+                self._stats.evictions += evicted.size
+            part = _Partition(len(vector), min(16, self.max_entries))
+            self._partitions[partition] = part
+        else:
+            self._partitions.move_to_end(partition)
+        if part.size < self.max_entries:
+            if part.size == len(part.values):
+                part.grow(min(part.size * 2, self.max_entries))
+            row = part.size
+            part.size += 1
+            self._stats.entries += 1
+        else:
+            row = int(np.argmin(part.last_used[:part.size]))
+            self._stats.evictions += 1
+        part.vectors[row] = vector
+        part.values[row] = value
+        part.last_used[row] = now
+        part.stored_at[row] = now
@@ -0,0 +1,207 @@
+import contextlib
+import contextvars
+import cProfile
+import io
+import pstats
+import random
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Dict, Iterator, List, NamedTuple, Optional
+
+from chatbees.utils.instrumentation import emit, metrics
+
+__all__ = ["SlowCall", "SlowCallRecorder"]
+
+# The phases of a call, in the order they happen
+PHASES = ("serialize", "queue", "connect", "send", "ttfb", "network",
+          "validate")
+
+# Files whose frames are left out of the recorded stacks
+_SKIPPED_FILES = (__file__, contextlib.__file__)
+
+
+class SlowCall(NamedTuple):
+    """
+    A call that took longer than the threshold of the SlowCallRecorder.
+
+    `phases` maps the phases of the call to their seconds:
+        serialize: building and compressing the request body
+        queue: waiting for a slot of the priority scheduler
+        connect: opening a connection, including TLS, zero if one was reused
+        send: writing the request
+        ttfb: waiting for the first byte of the response
+        network: the rest of the transport, mostly reading and decompressing
+                 the response body
+        validate: parsing and validating the response
+        other: the time not in any phase, e.g. caches and retries
+    Phases a call did not go through are missing. The phases of a hedged
+    request add up both copies of it.
+    """
+    endpoint: str
+    # time.time() the call started
+    started: float
+    duration: float
+    phases: Dict[str, float]
+    # The stack that made the call
+    stack: str
+    # pstats of the call if it was sampled for profiling, else None
+    profile: Optional[str]
+
+
+class _Trace:
+    __slots__ = ("endpoint", "started", "phases", "lock")
+
+    def __init__(self, endpoint: str):
+        self.endpoint = endpoint
+        self.started = time.time()
+        self.phases: Dict[str, float] = {}
+        # The hedges of a request add their phases from other threads
+        self.lock = threading.Lock()
+
+    def add(self, name: str, seconds: float):
+        with self.lock:
+            self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+
+_current: contextvars.ContextVar[Optional[_Trace]] = \
+    contextvars.ContextVar("chatbees_slow_call", default=None)
+# Seconds spent in the phases nested in the current phase
+_nested: contextvars.ContextVar[Optional[List[float]]] = \
+    contextvars.ContextVar("chatbees_slow_call_nested", default=None)
+
+
+@contextlib.contextmanager
+def phase(name: str) -> Iterator[None]:
+    """
+    Adds the time of the block to a phase of the call being recorded, if
+    any. The time of phases nested in the block is only counted in them.
+    """
+    trace = _current.get()
+    if trace is None:
+        yield
+        return
+    nested = [0.0]
+    token = _nested.set(nested)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        _nested.reset(token)
+        trace.add(name, elapsed - nested[0])
+        outer = _nested.get()
+        if outer is not None:
+            outer[0] += elapsed
+
+
+@contextlib.contextmanager
+def traced(recorder: Optional["SlowCallRecorder"],
+           endpoint: str) -> Iterator[None]:
+    """
+    Records the block as a call of `endpoint` if it takes longer than the
+    threshold of `recorder`. Blocks nested in a recorded call are part of
+    it.
+    """
+    if recorder is None or _current.get() is not None:
+        yield
+        return
+    with recorder._record(endpoint):
+        yield
+
+
+class SlowCallRecorder:
+    """
+    Keeps the last `capacity` calls that took longer than `threshold`
+    seconds, with the time spent in each phase of the call and the stack
+    that made it. A `profile_rate` fraction of the calls also run under
+    cProfile, and the profile is kept if the call is slow. Profiling slows
+    the call down, keep the rate low.
+
+    Every slow call is counted in the "slow_calls" metric and emitted as a
+    "slow_call" event, see add_event_listener.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 1.0,
+        capacity: int = 100,
+        profile_rate: float = 0.0,
+        seed: int = None,
+    ):
+        if not 0 <= profile_rate <= 1:
+            raise ValueError("profile_rate must be between 0 and 1")
+        self.threshold = threshold
+        self.profile_rate = profile_rate
+        self._lock = threading.Lock()
+        self._calls = deque(maxlen=capacity)
+        self._random = random.Random(seed)
+        # Only one profiler can be enabled at a time
+        self._profiling = threading.Lock()
+
+    def records(self) -> List[SlowCall]:
+        """
+        The recorded slow calls, oldest first.
+        """
+        with self._lock:
+            return list(self._calls)
+
+    def clear(self):
+        with self._lock:
+            self._calls.clear()
+
+    @contextlib.contextmanager
+    def _record(self, endpoint: str) -> Iterator[None]:
+        profiler = self._start_profiler()
+        trace = _Trace(endpoint)
+        token = _current.set(trace)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - start
+            _current.reset(token)
+            if profiler is not None:
+                profiler.disable()
+                self._profiling.release()
+            if duration >= self.threshold:
+                self._add(trace, duration, profiler)
+
+    def _start_profiler(self) -> Optional[cProfile.Profile]:
+        if not self.profile_rate or \
+                self._random.random() >= self.profile_rate:
+            return None
+        if not self._profiling.acquire(blocking=False):
+            return None
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiler, e.g. the application's, is enabled
+            self._profiling.release()
+            return None
+        return profiler
+
+    def _add(self, trace: _Trace, duration: float,
+             profiler: Optional[cProfile.Profile]):
+        phases = {name: trace.phases[name]
+                  for name in PHASES if name in trace.phases}
+        phases["other"] = max(0.0, duration - sum(phases.values()))
+        profile = None
+        if profiler is not None:
+            out = io.StringIO()
+            pstats.Stats(profiler, stream=out).sort_stats(
+                "cumulative").print_stats(30)
+            profile = out.getvalue()
+        # Drop the frames of the recorder and contextlib
+        frames = [frame for frame in traceback.extract_stack()
+                  if frame.filename not in _SKIPPED_FILES]
+        stack = "".join(traceback.format_list(frames))
+        call = SlowCall(trace.endpoint, trace.started, duration, phases,
+                        stack, profile)
+        with self._lock:
+            self._calls.append(call)
+        metrics.incr("slow_calls", endpoint=trace.endpoint)
+        emit("slow_call", endpoint=trace.endpoint, duration=duration,
+             phases=phases)
@@ -0,0 +1,328 @@
+import os
+import socket
+import threading
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import (
+    ConnectTimeoutError,
+    NameResolutionError,
+    NewConnectionError,
+)
+from urllib3.util.connection import create_connection
+
+from chatbees.utils.dns import DnsCache
+from chatbees.utils.slow_calls import phase
+
+__all__ = ["Transport", "RequestsTransport", "HttpxTransport"]
+
+
+class Transport(ABC):
+    """
+    Sends the HTTP requests of the client. All client calls go through
+    Config.transport, so a transport can pool, multiplex or instrument
+    requests for the whole client.
+
+    `send` returns a response with the `requests.Response` interface used by
+    the client: status_code, reason, headers, content, json() and
+    request.url.
+    """
+
+    # time.monotonic() of the last request, read by the keep-alive thread
+    last_used: float = 0.0
+    _keep_alive: Optional[threading.Event] = None
+
+    @abstractmethod
+    def send(
+        self,
+        method: str,
+        url: str,
+        body: Any = None,
+        files: Optional[Dict] = None,
+        headers: Optional[Dict[str, str]] = None,
+        timeout: Optional[float] = None,
+    ):
+        ...
+
+    def warm_up(self, url: str, connections: int, timeout: float = 10) -> int:
+        """
+        Opens up to `connections` pooled connections to the host of `url`
+        ahead of the first request, by sending concurrent HEAD requests.
+
+        :return: The number of requests that got a response.
+        """
+        def head(_):
+            try:
+                return self._warm_up_head(url, timeout)
+            except Exception:
+                return None
+
+        with ThreadPoolExecutor(
+                connections, thread_name_prefix="chatbees-warm-up") as executor:
+            responses = list(executor.map(head, range(connections)))
+        for resp in responses:
+            if resp is not None:
+                self._release(resp)
+        return sum(resp is not None for resp in responses)
+
+    def _warm_up_head(self, url: str, timeout: float):
+        """
+        Sends a warm-up HEAD request. Transports that pool connections hold
+        the connection until _release(), so the concurrent requests of
+        warm_up() each open a connection instead of reusing an early one.
+        """
+        return self.send('HEAD', url, timeout=timeout)
+
+    def _release(self, resp):
+        pass
+
+    def start_keep_alive(self, url: str, connections: int, interval: float):
+        """
+        Warms up the connections again whenever the transport was idle for
+        `interval` seconds, so the server does not close them.
+        """
+        self.stop_keep_alive()
+        stop = self._keep_alive = threading.Event()
+
+        def run():
+            while not stop.wait(interval):
+                if time.monotonic() - self.last_used >= interval:
+                    self.warm_up(url, connections)
+
+        threading.Thread(target=run, daemon=True,
+                         name="chatbees-keep-alive").start()
+
+    def stop_keep_alive(self):
+        if self._keep_alive is not None:
+            self._keep_alive.set()
+            self._keep_alive = None
+
+    def close(self):
+        self.stop_keep_alive()
+
+
+class _TimedConnection(HTTPConnection):
+    """
+    Times the connect, send and time to first byte of the requests recorded
+    by the slow call recorder.
+    """
+
+    def connect(self):
+        with phase('connect'):
+            super().connect()
+
+    def request(self, *args, **kwargs):
+        with phase('send'):
+            super().request(*args, **kwargs)
+
+    def getresponse(self, *args, **kwargs):
+        with phase('ttfb'):
+            return super().getresponse(*args, **kwargs)
+
+
+class _CachedDnsConnection(_TimedConnection):
+    """
+    Resolves the host through a DnsCache instead of on every connect.
+    """
+    dns_cache: DnsCache = None
+
+    def _new_conn(self) -> socket.socket:
+        try:
+            addresses = self.dns_cache.resolve(self.host, self.port)
+        except socket.gaierror as e:
+            raise NameResolutionError(self.host, self, e) from e
+        error = None
+        for _, sockaddr in addresses:
+            try:
+                return create_connection(
+                    sockaddr[:2],
+                    self.timeout,
+                    source_address=self.source_address,
+                    socket_options=self.socket_options,
+                )
+            except OSError as e:
+                error = e
+        # The addresses may be gone, resolve again on the next connect
+        self.dns_cache.invalidate(self.host, self.port)
+        if isinstance(error, socket.timeout):
+            raise ConnectTimeoutError(
+                self, f"Connection to {self.host} timed out. "
+                      f"(connect timeout={self.timeout})") from error
+        raise NewConnectionError(
+            self, f"Failed to establish a new connection: {error}") from error
+
+
+class _Adapter(HTTPAdapter):
+    """
+    Times the phases of requests, and resolves hosts through `dns_cache`
+    if set.
+    """
+
+    def __init__(self, dns_cache: Optional[DnsCache] = None, **kwargs):
+        self.dns_cache = dns_cache
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        attrs = {"dns_cache": self.dns_cache}
+        base = _TimedConnection if self.dns_cache is None \
+            else _CachedDnsConnection
+        http = type("HTTPConnection", (base,), attrs)
+        https = type("HTTPSConnection", (base, HTTPSConnection), attrs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": type("HTTPConnectionPool", (HTTPConnectionPool,),
+                         {"ConnectionCls": http}),
+            "https": type("HTTPSConnectionPool", (HTTPSConnectionPool,),
+                          {"ConnectionCls": https}),
+        }
+
+
+class RequestsTransport(Transport):
+    """
+    Sends requests with a pooled `requests` session, keeping up to
+    `pool_maxsize` idle HTTP/1.1 connections per host.
+
+    If `dns_ttl` is set, host names are resolved once per `dns_ttl` seconds
+    instead of for every new connection.
+    """
+
+    def __init__(self, pool_maxsize: int = 32, dns_ttl: float = None):
+        self.pool_maxsize = pool_maxsize
+        self.dns_cache = DnsCache(dns_ttl) if dns_ttl is not None else None
+        self._lock = threading.Lock()
+        self._session = None
+        self._pid = None
+
+    @property
+    def session(self) -> requests.Session:
+        # Connections must not be shared with forked worker processes
+        if self._session is None or self._pid != os.getpid():
+            with self._lock:
+                if self._session is None or self._pid != os.getpid():
+                    self._session = self._new_session()
+                    self._pid = os.getpid()
+        return self._session
+
+    def _new_session(self) -> requests.Session:
+        session = requests.Session()
+        adapter = _Adapter(self.dns_cache, pool_maxsize=self.pool_maxsize)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+
+    def send(self, method, url, body=None, files=None, headers=None,
+             timeout=None):
+        self.last_used = time.monotonic()
+        return self.session.request(
+            method, url, data=body, files=files, headers=headers,
+            timeout=timeout)
+
+    def _warm_up_head(self, url: str, timeout: float):
+        self.last_used = time.monotonic()
+        return self.session.head(url, stream=True, timeout=timeout)
+
+    def _release(self, resp):
+        # Reading the empty body returns the connection to the pool
+        resp.content
+
+    def warm_up(self, url: str, connections: int, timeout: float = 10) -> int:
+        if self.dns_cache is not None:
+            parts = urlsplit(url)
+            port = parts.port or (443 if parts.scheme == 'https' else 80)
+            try:
+                self.dns_cache.prefetch(parts.hostname, port)
+            except socket.gaierror:
+                pass
+        return super().warm_up(url, connections, timeout)
+
+    def close(self):
+        super().close()
+        with self._lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+
+
+class _HttpxResponse:
+    """
+    Adapts an httpx.Response to the requests.Response interface.
+    """
+
+    def __init__(self, response):
+        self._response = response
+
+    @property
+    def reason(self) -> str:
+        return self._response.reason_phrase
+
+    def __getattr__(self, name):
+        return getattr(self._response, name)
+
+
+class HttpxTransport(Transport):
+    """
+    Sends requests with httpx over HTTP/2, multiplexing concurrent requests
+    to the same host over a single connection instead of opening one socket
+    per in-flight request. Requires `pip install httpx[http2]`.
+
+    HTTP/2 is negotiated with TLS. Set http1=False to speak HTTP/2 to a
+    plain-http server, e.g. a local stand-in, with prior knowledge.
+    """
+
+    def __init__(
+        self, http2: bool = True, http1: bool = True, max_connections: int = 32,
+    ):
+        try:
+            import httpx
+        except ImportError:
+            raise ImportError("HttpxTransport requires httpx, please "
+                              "`pip install httpx[http2]`")
+        self._httpx = httpx
+        self.http2 = http2
+        self.http1 = http1
+        self.max_connections = max_connections
+        self._lock = threading.Lock()
+        self._client = None
+        self._pid = None
+
+    @property
+    def client(self):
+        if self._client is None or self._pid != os.getpid():
+            with self._lock:
+                if self._client is None or self._pid != os.getpid():
+                    self._client = self._httpx.Client(
+                        http2=self.http2,
+                        http1=self.http1,
+                        limits=self._httpx.Limits(
+                            max_connections=self.max_connections),
+                        timeout=None)
+                    self._pid = os.getpid()
+        return self._client
+
+    def send(self, method, url, body=None, files=None, headers=None,
+             timeout=None):
+        kwargs = {}
+        if files is not None or isinstance(body, dict):
+            kwargs['data'] = body
+            kwargs['files'] = files
+        else:
+            kwargs['content'] = body
+        if timeout is not None:
+            kwargs['timeout'] = timeout
+        self.last_used = time.monotonic()
+        resp = self.client.request(method, url, headers=headers, **kwargs)
+        return _HttpxResponse(resp)
+
+    def close(self):
+        super().close()
+        with self._lock:
+            if self._client is not None:
+                self._client.close()
+                self._client = None